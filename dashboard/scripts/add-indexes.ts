@@ -22,6 +22,13 @@ const indexes = [
        LOWER(TRIM(generic_name)) || '||' || LOWER(TRIM(COALESCE(dosage_form, ''))) || '||' || LOWER(TRIM(COALESCE(dosage_strength, '')))
      )`,
 
+  // Stored grouping key / id maintained by scripts/scrape_products.py
+  `CREATE INDEX IF NOT EXISTS idx_products_stored_group_key
+     ON import_permit_products(product_group_key)`,
+
+  `CREATE INDEX IF NOT EXISTS idx_products_group_id
+     ON import_permit_products(product_group_id)`,
+
   // Generic name for search / filtering
   `CREATE INDEX IF NOT EXISTS idx_products_generic_name
      ON import_permit_products(generic_name)`,
@@ -150,12 +150,35 @@ export interface AnalyticsFilters {
 // ─── Generic Product Grouping ──────────────────────────────────────────────
 // Products are grouped by: generic_name + dosage_form + dosage_strength
 // This groups all brands of the same drug/device formulation together.
-// Uses normalized columns when available, falling back to originals for
-// backwards compatibility with older Turso schemas.
+// Prefers the integer product_group_id written by scrape_products.py (the
+// key itself lives once in product_groups), then the normalized columns,
+// falling back to originals for backwards compatibility with older Turso
+// schemas.
+
+/** SQL for one grouping scheme */
+interface GroupSql {
+  /** Expression to GROUP BY / COUNT(DISTINCT ...) on */
+  group: string;
+  /** Expression producing the generic||form||strength key (for slugs) */
+  key: string;
+  /** Condition matching the rows of one key, bound to a single `?` */
+  match: string;
+}
+
+const STORED_GROUP_SQL: GroupSql = {
+  group: `p.product_group_id`,
+  key: `(SELECT g.group_key FROM product_groups g WHERE g.id = p.product_group_id)`,
+  match: `p.product_group_id = (SELECT g.id FROM product_groups g WHERE g.group_key = ?)`,
+};
 
 const NORM_GROUP_KEY_SQL = `LOWER(TRIM(COALESCE(p.norm_generic_name, p.generic_name))) || '||' || LOWER(TRIM(COALESCE(p.norm_dosage_form, p.dosage_form, ''))) || '||' || LOWER(TRIM(COALESCE(p.norm_dosage_strength, p.dosage_strength, '')))`;
 const ORIG_GROUP_KEY_SQL = `LOWER(TRIM(p.generic_name)) || '||' || LOWER(TRIM(COALESCE(p.dosage_form, ''))) || '||' || LOWER(TRIM(COALESCE(p.dosage_strength, '')))`;
 
+/** Grouping on a key computed per row */
+function computedGroupSql(keySql: string): GroupSql {
+  return { group: keySql, key: keySql, match: `${keySql} = ?` };
+}
+
 /** Cached result of column detection */
 let _normAvailable: boolean | null = null;
 
@@ -172,9 +195,27 @@ async function hasNormColumns(): Promise<boolean> {
   return _normAvailable;
 }
 
-/** SQL expression that produces the grouping key (auto-detects schema) */
-async function getGroupKeySql(): Promise<string> {
-  return (await hasNormColumns()) ? NORM_GROUP_KEY_SQL : ORIG_GROUP_KEY_SQL;
+/** Cached result of stored group id detection */
+let _storedGroupAvailable: boolean | null = null;
+
+/** Check once whether the indexed product_group_id column and product_groups exist in the remote DB */
+async function hasStoredGroups(): Promise<boolean> {
+  if (_storedGroupAvailable !== null) return _storedGroupAvailable;
+  try {
+    const db = getDb();
+    await db.execute({ sql: "SELECT product_group_id FROM import_permit_products LIMIT 1", args: [] });
+    await db.execute({ sql: "SELECT id, group_key FROM product_groups LIMIT 1", args: [] });
+    _storedGroupAvailable = true;
+  } catch {
+    _storedGroupAvailable = false;
+  }
+  return _storedGroupAvailable;
+}
+
+/** SQL that groups products by formulation (auto-detects schema) */
+async function getGroupSql(): Promise<GroupSql> {
+  if (await hasStoredGroups()) return STORED_GROUP_SQL;
+  return computedGroupSql((await hasNormColumns()) ? NORM_GROUP_KEY_SQL : ORIG_GROUP_KEY_SQL);
 }
 
 /** SQL fragments for display columns in aggregated queries */
@@ -191,6 +232,84 @@ async function getNormSelectFragments(): Promise<{ genericName: string; dosageFo
   };
 }
 
+// ─── Monthly Rollups ────────────────────────────────────────────────────────
+// scripts/build_rollups.py keeps rollup_monthly_* tables (month × type ×
+// dimension) that push-to-turso ships alongside the raw tables.  Queries
+// whose filters cover whole months read them instead of scanning permits and
+// product lines; a filter that cuts through a month falls back to the raw
+// tables.  Rollups only count permits with a requested_date.
+
+const ROLLUP_TABLES = [
+  "rollup_monthly_type",
+  "rollup_monthly_supplier",
+  "rollup_monthly_agent",
+  "rollup_monthly_manufacturer",
+  "rollup_monthly_product_group",
+  "rollup_monthly_dosage_form",
+];
+
+/** Cached result of rollup table detection */
+let _rollupsAvailable: boolean | null = null;
+
+/** Check once whether the rollup tables exist in the remote DB */
+async function hasRollups(): Promise<boolean> {
+  if (_rollupsAvailable !== null) return _rollupsAvailable;
+  try {
+    const db = getDb();
+    for (const table of ROLLUP_TABLES) {
+      await db.execute({ sql: `SELECT month FROM ${table} LIMIT 1`, args: [] });
+    }
+    _rollupsAvailable = true;
+  } catch {
+    _rollupsAvailable = false;
+  }
+  return _rollupsAvailable;
+}
+
+/** YYYY-MM of a YYYY-MM-DD date that starts (or, with `end`, ends) its month, else null */
+function wholeMonth(date: string, end: boolean): string | null {
+  const match = /^(\d{4})-(\d{2})-(\d{2})$/.exec(date);
+  if (!match) return null;
+  const [, year, month, day] = match;
+  const lastDay = new Date(Date.UTC(Number(year), Number(month), 0)).getUTCDate();
+  return Number(day) === (end ? lastDay : 1) ? `${year}-${month}` : null;
+}
+
+/**
+ * WHERE conditions on a rollup table (aliased `alias`) for the filters, or
+ * null when the rollups can't answer them exactly (missing tables or a date
+ * filter that cuts through a month).
+ */
+async function rollupFilter(
+  filters?: AnalyticsFilters,
+  alias = "r"
+): Promise<{ conditions: string[]; params: (string | number)[] } | null> {
+  if (!(await hasRollups())) return null;
+  const conditions: string[] = [];
+  const params: (string | number)[] = [];
+  if (filters?.dateFrom) {
+    const month = wholeMonth(filters.dateFrom, false);
+    if (month === null) return null;
+    conditions.push(`${alias}.month >= ?`);
+    params.push(month);
+  }
+  if (filters?.dateTo) {
+    const month = wholeMonth(filters.dateTo, true);
+    if (month === null) return null;
+    conditions.push(`${alias}.month <= ?`);
+    params.push(month);
+  }
+  if (filters?.type) {
+    conditions.push(`${alias}.type = ?`);
+    params.push(filters.type);
+  }
+  return { conditions, params };
+}
+
+function whereClause(conditions: string[]): string {
+  return conditions.length ? `WHERE ${conditions.join(" AND ")}` : "";
+}
+
 /** Build the same key from JS values (for URL encoding) */
 export function makeProductSlug(
   genericName: string,
@@ -337,6 +456,22 @@ export async function getImportsOverTime(): Promise<MonthlyData[]> {
 }
 
 export async function getMonthlyByType(filters?: AnalyticsFilters): Promise<MonthlyByType[]> {
+  const rollup = await rollupFilter(filters);
+  if (rollup) {
+    return queryAll<MonthlyByType>(
+      `SELECT
+        r.month as month,
+        SUM(CASE WHEN r.type = 'MDCN' THEN r.permit_count ELSE 0 END) as mdcn_count,
+        SUM(CASE WHEN r.type = 'MDCN' THEN r.total_value ELSE 0 END) as mdcn_value,
+        SUM(CASE WHEN r.type = 'MD' THEN r.permit_count ELSE 0 END) as md_count,
+        SUM(CASE WHEN r.type = 'MD' THEN r.total_value ELSE 0 END) as md_value
+      FROM rollup_monthly_type r
+      ${whereClause(rollup.conditions)}
+      GROUP BY r.month
+      ORDER BY r.month`,
+      rollup.params
+    );
+  }
   const conditions: string[] = ["requested_date IS NOT NULL"];
   const params: (string | number)[] = [];
   if (filters?.dateFrom) { conditions.push("requested_date >= ?"); params.push(filters.dateFrom); }
@@ -359,6 +494,19 @@ export async function getMonthlyByType(filters?: AnalyticsFilters): Promise<Mont
 }
 
 export async function getTopSuppliers(limit = 10): Promise<SupplierStat[]> {
+  if (await rollupFilter()) {
+    return queryAll<SupplierStat>(
+      `SELECT
+        r.supplier_name as name,
+        SUM(r.permit_count) as count,
+        SUM(r.total_value) as value
+      FROM rollup_monthly_supplier r
+      GROUP BY r.supplier_name
+      ORDER BY value DESC
+      LIMIT ?`,
+      [limit]
+    );
+  }
   return queryAll<SupplierStat>(
     `SELECT
       supplier_name as name,
@@ -523,7 +671,7 @@ export async function getAggregatedProducts(
   sortBy = "order_count",
   sortDir: "asc" | "desc" = "desc"
 ): Promise<PaginatedResult<AggregatedProductRow>> {
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const { genericName, dosageForm } = await getNormSelectFragments();
 
   const conditions: string[] = [
@@ -571,7 +719,7 @@ export async function getAggregatedProducts(
       SELECT 1 FROM import_permit_products p
       JOIN import_permits i ON p.import_permit_id = i.id
       ${where}
-      GROUP BY ${GROUP_KEY}
+      GROUP BY ${GROUP.group}
     )`,
     params
   );
@@ -580,7 +728,7 @@ export async function getAggregatedProducts(
   const offset = (page - 1) * pageSize;
   const data = await queryAll<Omit<AggregatedProductRow, "slug"> & { group_key: string }>(
     `SELECT
-      ${GROUP_KEY} as group_key,
+      ${GROUP.key} as group_key,
       ${genericName} as generic_name,
       ${dosageForm} as dosage_form,
       p.dosage_strength,
@@ -594,7 +742,7 @@ export async function getAggregatedProducts(
     FROM import_permit_products p
     JOIN import_permits i ON p.import_permit_id = i.id
     ${where}
-    GROUP BY ${GROUP_KEY}
+    GROUP BY ${GROUP.group}
     ORDER BY ${safeSort} ${safeDir}
     LIMIT ? OFFSET ?`,
     [...params, pageSize, offset]
@@ -624,6 +772,21 @@ export async function getAggregatedProducts(
 }
 
 export async function getTopManufacturers(limit = 10, filters?: AnalyticsFilters): Promise<ManufacturerStat[]> {
+  const rollup = await rollupFilter(filters);
+  if (rollup) {
+    return queryAll<ManufacturerStat>(
+      `SELECT
+        r.manufacturer_name as name,
+        SUM(r.line_count) as count,
+        SUM(r.total_value) as value
+      FROM rollup_monthly_manufacturer r
+      ${whereClause(rollup.conditions)}
+      GROUP BY r.manufacturer_name
+      ORDER BY count DESC
+      LIMIT ?`,
+      [...rollup.params, limit]
+    );
+  }
   const conditions: string[] = ["p.manufacturer_name IS NOT NULL", "p.manufacturer_name != ''"];
   const params: (string | number)[] = [];
   const needsJoin = !!(filters?.dateFrom || filters?.dateTo || filters?.type);
@@ -648,6 +811,21 @@ export async function getTopManufacturers(limit = 10, filters?: AnalyticsFilters
 }
 
 export async function getTopAgents(limit = 20, filters?: AnalyticsFilters): Promise<SupplierStat[]> {
+  const rollup = await rollupFilter(filters);
+  if (rollup) {
+    return queryAll<SupplierStat>(
+      `SELECT
+        r.agent_name as name,
+        SUM(r.permit_count) as count,
+        SUM(r.total_value) as value
+      FROM rollup_monthly_agent r
+      ${whereClause(rollup.conditions)}
+      GROUP BY r.agent_name
+      ORDER BY value DESC
+      LIMIT ?`,
+      [...rollup.params, limit]
+    );
+  }
   const conditions: string[] = ["agent_name IS NOT NULL", "agent_name != ''"];
   const params: (string | number)[] = [];
   if (filters?.dateFrom) { conditions.push("requested_date >= ?"); params.push(filters.dateFrom); }
@@ -713,7 +891,7 @@ export async function getPorts(): Promise<string[]> {
 // ─── Product Detail Queries (by group key) ──────────────────────────────────
 
 export async function getProductBySlug(slug: string): Promise<ProductInfo | null> {
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const groupKey = decodeProductSlug(slug);
   return queryOne<ProductInfo>(
     `SELECT
@@ -724,14 +902,14 @@ export async function getProductBySlug(slug: string): Promise<ProductInfo | null
       GROUP_CONCAT(DISTINCT p.product_name) as brand_names,
       GROUP_CONCAT(DISTINCT p.manufacturer_name) as manufacturer_names
     FROM import_permit_products p
-    WHERE ${GROUP_KEY} = ?
-    GROUP BY ${GROUP_KEY}`,
+    WHERE ${GROUP.match}
+    GROUP BY ${GROUP.group}`,
     [groupKey]
   );
 }
 
 export async function getProductStatsBySlug(slug: string): Promise<ProductStats> {
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const groupKey = decodeProductSlug(slug);
   const row = await queryOne<ProductStats>(
     `SELECT
@@ -746,16 +924,16 @@ export async function getProductStatsBySlug(slug: string): Promise<ProductStats>
       COUNT(DISTINCT p.product_id) as uniqueBrands
     FROM import_permit_products p
     JOIN import_permits i ON p.import_permit_id = i.id
-    WHERE ${GROUP_KEY} = ?`,
+    WHERE ${GROUP.match}`,
     [groupKey]
   );
   return row!;
 }
 
 export async function getProductPriceTrendBySlug(slug: string, filters?: AnalyticsFilters): Promise<ProductPriceTrend[]> {
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const groupKey = decodeProductSlug(slug);
-  const conditions: string[] = [`${GROUP_KEY} = ?`, "i.requested_date IS NOT NULL", "p.unit_price > 0"];
+  const conditions: string[] = [GROUP.match, "i.requested_date IS NOT NULL", "p.unit_price > 0"];
   const params: (string | number)[] = [groupKey];
   if (filters?.dateFrom) { conditions.push("i.requested_date >= ?"); params.push(filters.dateFrom); }
   if (filters?.dateTo) { conditions.push("i.requested_date < date(?, '+1 day')"); params.push(filters.dateTo); }
@@ -777,9 +955,9 @@ export async function getProductPriceTrendBySlug(slug: string, filters?: Analyti
 }
 
 export async function getProductMonthlyVolumeBySlug(slug: string, filters?: AnalyticsFilters): Promise<ProductMonthlyVolume[]> {
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const groupKey = decodeProductSlug(slug);
-  const conditions: string[] = [`${GROUP_KEY} = ?`, "i.requested_date IS NOT NULL"];
+  const conditions: string[] = [GROUP.match, "i.requested_date IS NOT NULL"];
   const params: (string | number)[] = [groupKey];
   if (filters?.dateFrom) { conditions.push("i.requested_date >= ?"); params.push(filters.dateFrom); }
   if (filters?.dateTo) { conditions.push("i.requested_date < date(?, '+1 day')"); params.push(filters.dateTo); }
@@ -799,7 +977,7 @@ export async function getProductMonthlyVolumeBySlug(slug: string, filters?: Anal
 }
 
 export async function getProductSupplierPricesBySlug(slug: string): Promise<ProductSupplierPrice[]> {
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const groupKey = decodeProductSlug(slug);
   return queryAll<ProductSupplierPrice>(
     `SELECT
@@ -809,7 +987,7 @@ export async function getProductSupplierPricesBySlug(slug: string): Promise<Prod
       COALESCE(SUM(p.amount), 0) as total_value
     FROM import_permit_products p
     JOIN import_permits i ON p.import_permit_id = i.id
-    WHERE ${GROUP_KEY} = ? AND i.supplier_name IS NOT NULL AND i.supplier_name != ''
+    WHERE ${GROUP.match} AND i.supplier_name IS NOT NULL AND i.supplier_name != ''
     GROUP BY i.supplier_name
     ORDER BY avg_price ASC`,
     [groupKey]
@@ -817,7 +995,7 @@ export async function getProductSupplierPricesBySlug(slug: string): Promise<Prod
 }
 
 export async function getProductTopImportersBySlug(slug: string, limit = 10): Promise<ProductImporterStat[]> {
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const groupKey = decodeProductSlug(slug);
   return queryAll<ProductImporterStat>(
     `SELECT
@@ -827,7 +1005,7 @@ export async function getProductTopImportersBySlug(slug: string, limit = 10): Pr
       COALESCE(SUM(p.quantity), 0) as total_quantity
     FROM import_permit_products p
     JOIN import_permits i ON p.import_permit_id = i.id
-    WHERE ${GROUP_KEY} = ? AND i.agent_name IS NOT NULL AND i.agent_name != ''
+    WHERE ${GROUP.match} AND i.agent_name IS NOT NULL AND i.agent_name != ''
     GROUP BY i.agent_name
     ORDER BY total_spend DESC
     LIMIT ?`,
@@ -836,7 +1014,7 @@ export async function getProductTopImportersBySlug(slug: string, limit = 10): Pr
 }
 
 export async function getProductMonthlySupplierBySlug(slug: string): Promise<ProductMonthlySupplier[]> {
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const groupKey = decodeProductSlug(slug);
   return queryAll<ProductMonthlySupplier>(
     `SELECT
@@ -847,7 +1025,7 @@ export async function getProductMonthlySupplierBySlug(slug: string): Promise<Pro
       COUNT(*) as order_count
     FROM import_permit_products p
     JOIN import_permits i ON p.import_permit_id = i.id
-    WHERE ${GROUP_KEY} = ? AND i.requested_date IS NOT NULL
+    WHERE ${GROUP.match} AND i.requested_date IS NOT NULL
       AND i.supplier_name IS NOT NULL AND i.supplier_name != ''
     GROUP BY month, i.supplier_name
     ORDER BY month`,
@@ -860,11 +1038,11 @@ export async function getProductOrderHistoryBySlug(
   page = 1,
   pageSize = 25
 ): Promise<PaginatedResult<ProductOrderRow>> {
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const groupKey = decodeProductSlug(slug);
 
   const countRow = await queryOne<{ count: number }>(
-    `SELECT COUNT(*) as count FROM import_permit_products p WHERE ${GROUP_KEY} = ?`,
+    `SELECT COUNT(*) as count FROM import_permit_products p WHERE ${GROUP.match}`,
     [groupKey]
   );
   const total = countRow?.count ?? 0;
@@ -877,7 +1055,7 @@ export async function getProductOrderHistoryBySlug(
       p.quantity, p.unit_price, p.amount
     FROM import_permit_products p
     JOIN import_permits i ON p.import_permit_id = i.id
-    WHERE ${GROUP_KEY} = ?
+    WHERE ${GROUP.match}
     ORDER BY i.requested_date DESC
     LIMIT ? OFFSET ?`,
     [groupKey, pageSize, offset]
@@ -908,7 +1086,7 @@ export interface ProductPriceSpread {
 
 /** Top products with the widest price variation — biggest negotiation opportunities */
 export async function getTopProductPriceSpreads(limit = 15, typeOrFilters?: string | AnalyticsFilters): Promise<ProductPriceSpread[]> {
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const { genericName, dosageForm } = await getNormSelectFragments();
   const filters: AnalyticsFilters | undefined = typeof typeOrFilters === "string" ? { type: typeOrFilters } : typeOrFilters;
   const conditions: string[] = ["p.generic_name IS NOT NULL", "p.generic_name != ''", "p.unit_price > 0"];
@@ -931,7 +1109,7 @@ export async function getTopProductPriceSpreads(limit = 15, typeOrFilters?: stri
     FROM import_permit_products p
     ${join}
     ${where}
-    GROUP BY ${GROUP_KEY}
+    GROUP BY ${GROUP.group}
     HAVING order_count >= 5 AND min_price < max_price
     ORDER BY (max_price - min_price) * 1.0 / avg_price DESC
     LIMIT ?`,
@@ -975,7 +1153,7 @@ export interface ProductGrowth {
 
 /** Products with the highest growth in import orders (recent 6 months vs prior 6 months) */
 export async function getProductVolumeGrowth(limit = 15, filters?: AnalyticsFilters): Promise<ProductGrowth[]> {
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const { genericName, dosageForm } = await getNormSelectFragments();
   const extraConditions: string[] = [];
   const extraParams: (string | number)[] = [];
@@ -1021,7 +1199,7 @@ export async function getProductVolumeGrowth(limit = 15, filters?: AnalyticsFilt
     WHERE p.generic_name IS NOT NULL AND p.generic_name != ''
       ${dateFilter}
       ${typeFilter}
-    GROUP BY ${GROUP_KEY}
+    GROUP BY ${GROUP.group}
     HAVING prior_orders >= 3 AND recent_orders >= 1
     ORDER BY (CAST(recent_orders AS REAL) / MAX(1, prior_orders)) DESC
     LIMIT ?`,
@@ -1035,7 +1213,7 @@ export async function getProductVolumeGrowth(limit = 15, filters?: AnalyticsFilt
 
 /** Products with the biggest decline in import orders (recent N months vs prior N months) */
 export async function getProductVolumeDecline(limit = 15, filters?: AnalyticsFilters): Promise<ProductGrowth[]> {
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const { genericName, dosageForm } = await getNormSelectFragments();
   const extraConditions: string[] = [];
   const extraParams: (string | number)[] = [];
@@ -1066,7 +1244,7 @@ export async function getProductVolumeDecline(limit = 15, filters?: AnalyticsFil
     WHERE p.generic_name IS NOT NULL AND p.generic_name != ''
       ${dateFilter}
       ${typeFilter}
-    GROUP BY ${GROUP_KEY}
+    GROUP BY ${GROUP.group}
     HAVING prior_orders >= ? AND recent_orders < prior_orders
     ORDER BY (CAST(recent_orders AS REAL) / MAX(1, prior_orders)) ASC
     LIMIT ?`,
@@ -1087,8 +1265,34 @@ export interface DosageFormMarket {
 
 /** Market breakdown by dosage form category */
 export async function getDosageFormMarketShare(filters?: AnalyticsFilters): Promise<DosageFormMarket[]> {
+  const rollup = await rollupFilter(filters, "d");
+  const groupRollup = await rollupFilter(filters, "r");
+  if (rollup && groupRollup) {
+    // Each permit falls in one month and type, so per-month distinct order
+    // counts add up.  Distinct product groups don't, so they are counted
+    // across the range from the product-group rollup; a group's dosage_form
+    // is the normalized form the dosage-form rollup uses.
+    const groupConditions = [...groupRollup.conditions, "g.dosage_form = d.dosage_form"];
+    return queryAll<DosageFormMarket>(
+      `SELECT
+        d.dosage_form as dosage_form,
+        SUM(d.order_count) as order_count,
+        SUM(d.total_value) as total_value,
+        (SELECT COUNT(DISTINCT r.product_group_id)
+          FROM rollup_monthly_product_group r
+          JOIN product_groups g ON g.id = r.product_group_id
+          ${whereClause(groupConditions)}) as product_count
+      FROM rollup_monthly_dosage_form d
+      ${whereClause(rollup.conditions)}
+      GROUP BY d.dosage_form
+      HAVING total_value > 0
+      ORDER BY total_value DESC
+      LIMIT 12`,
+      [...groupRollup.params, ...rollup.params]
+    );
+  }
   const { dosageForm } = await getNormSelectFragments();
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const conditions: string[] = [
     "p.generic_name IS NOT NULL", "p.generic_name != ''",
     "p.dosage_form IS NOT NULL", "p.dosage_form != ''",
@@ -1105,7 +1309,7 @@ export async function getDosageFormMarketShare(filters?: AnalyticsFilters): Prom
       ${dosageForm} as dosage_form,
       COUNT(DISTINCT p.import_permit_id) as order_count,
       COALESCE(SUM(p.amount), 0) as total_value,
-      COUNT(DISTINCT ${GROUP_KEY}) as product_count
+      COUNT(DISTINCT ${GROUP.group}) as product_count
     FROM import_permit_products p
     ${join}
     ${where}
@@ -1128,12 +1332,12 @@ export interface ProductSearchResult {
 }
 
 export async function searchProductsByName(query: string, limit = 20): Promise<ProductSearchResult[]> {
-  const GROUP_KEY = await getGroupKeySql();
+  const GROUP = await getGroupSql();
   const { genericName, dosageForm } = await getNormSelectFragments();
   const like = `%${query}%`;
   const rows = await queryAll<Omit<ProductSearchResult, "slug"> & { group_key: string }>(
     `SELECT
-      ${GROUP_KEY} as group_key,
+      ${GROUP.key} as group_key,
       ${genericName} as generic_name,
       ${dosageForm} as dosage_form,
       p.dosage_strength,
@@ -1141,7 +1345,7 @@ export async function searchProductsByName(query: string, limit = 20): Promise<P
     FROM import_permit_products p
     WHERE p.generic_name IS NOT NULL AND p.generic_name != ''
       AND p.generic_name LIKE ?
-    GROUP BY ${GROUP_KEY}
+    GROUP BY ${GROUP.group}
     HAVING order_count >= 2
     ORDER BY order_count DESC
     LIMIT ?`,
@@ -0,0 +1,97 @@
+"""
+Benchmark record-id hashing on real payloads.
+
+Compares `canonical_digest` (sorted-key canonical JSON + BLAKE2b) with the
+previous fallback, sha256 of `repr(sorted(payload.items()))`.  Payloads are
+the `raw_json` columns of a local database, or the raw API dumps when no
+database is given.  Besides throughput it reports how many payloads change
+id when their nested keys are reordered, which the old hash did not survive.
+
+Usage:
+    .venv/bin/python scripts/bench_record_id.py --db data/efda.sqlite3
+    .venv/bin/python scripts/bench_record_id.py data/raw/api_v2/all_imports.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import time
+from collections.abc import Callable
+from hashlib import sha256
+from pathlib import Path
+from typing import Any
+
+from efda_scraper.models import canonical_digest
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_SAMPLES = BASE_DIR / "data" / "raw" / "api_v2" / "all_imports.json"
+RAW_JSON_TABLES = ("imports", "import_permits", "import_permit_products", "imports_ui")
+
+
+def legacy_digest(payload: dict[str, Any]) -> str:
+    return sha256(repr(sorted(payload.items())).encode("utf-8")).hexdigest()
+
+
+def load_samples(db: Path | None, files: list[Path], limit: int) -> list[dict[str, Any]]:
+    samples: list[dict[str, Any]] = []
+    if db is not None:
+        conn = sqlite3.connect(str(db))
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in RAW_JSON_TABLES:
+            if table in tables:
+                for (raw_json,) in conn.execute(f"SELECT raw_json FROM {table} LIMIT ?", (limit,)):
+                    samples.append(json.loads(raw_json))
+        conn.close()
+    for path in files:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        samples.extend(item for item in (data if isinstance(data, list) else [data]) if isinstance(item, dict))
+    return [sample for sample in samples if isinstance(sample, dict)][:limit]
+
+
+def _reordered(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _reordered(value[key]) for key in reversed(list(value))}
+    if isinstance(value, list):
+        return [_reordered(item) for item in value]
+    return value
+
+
+def timed(fn: Callable[[dict[str, Any]], str], samples: list[dict[str, Any]], min_seconds: float) -> float:
+    """Mean microseconds per payload, looping over the samples for at least `min_seconds`."""
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        for sample in samples:
+            fn(sample)
+        calls += len(samples)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return elapsed / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="*", type=Path, help="JSON files holding a payload or a list of them")
+    parser.add_argument("--db", type=Path, default=None, help="SQLite database with raw_json columns")
+    parser.add_argument("--limit", type=int, default=20_000, help="Max payloads to load")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Minimum time per measurement")
+    args = parser.parse_args()
+
+    files = args.files or ([] if args.db else [DEFAULT_SAMPLES])
+    samples = load_samples(args.db, files, args.limit)
+    if not samples:
+        parser.error("no payloads found")
+    mean_bytes = sum(len(json.dumps(sample)) for sample in samples) / len(samples)
+    print(f"{len(samples)} payloads, {mean_bytes:,.0f} bytes of JSON on average")
+
+    for name, fn in (("legacy", legacy_digest), ("canonical", canonical_digest)):
+        micros = timed(fn, samples, args.seconds)
+        reordered = [_reordered(sample) for sample in samples]
+        unstable = sum(fn(a) != fn(b) for a, b in zip(samples, reordered))
+        print(f"{name:>10}: {micros:8.1f} us/payload, {unstable} of {len(samples)} ids change when keys are reordered")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark the imports write path: normalize portal records and upsert them.
+
+Compares the current path (`normalize_many` into slotted records, one
+`executemany` per page) with the previous one (a pydantic model per record,
+`json.dumps` of the raw payload and one `execute` per row).  The previous
+path is only measured when pydantic is installed.
+
+Usage:
+    .venv/bin/python scripts/bench_records.py                  # 50k records, pages of 100
+    .venv/bin/python scripts/bench_records.py --records 200000 --page-size 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from efda_scraper.models import stable_record_id
+from efda_scraper.pipeline import _safe_datetime, _safe_float, _safe_str, normalize_many
+from efda_scraper.storage import _UPSERT_IMPORT_SQL, SQLiteStore, _utc_now_iso, write_records
+
+
+def _pick(payload: dict[str, Any], keys: tuple[str, ...]) -> Any:
+    for key in keys:
+        value = payload.get(key)
+        if value is not None and value != "":
+            return value
+    return None
+
+
+def synthetic_records(count: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "id": i,
+            "permitNo": f"IP/{i:07d}/2024",
+            "importerName": f"Importer {i % 500}",
+            "productName": f"Product {i % 2000} 500mg Tablets",
+            "qty": str(100 + i % 900),
+            "uom": "box",
+            "country": ("India", "China", "Germany", "Kenya")[i % 4],
+            "status": ("Approved", "Submitted", "Rejected")[i % 3],
+            "date": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T08:30:00Z",
+            "last_updated": "2024-06-01T00:00:00",
+            "remark": None,
+            "amount": 1234.5 + i,
+        }
+        for i in range(count)
+    ]
+
+
+def _legacy_path() -> Callable[[sqlite3.Connection, list[dict[str, Any]]], int] | None:
+    try:
+        from pydantic import BaseModel, ConfigDict, Field
+    except ImportError:
+        return None
+
+    class LegacyRecord(BaseModel):
+        model_config = ConfigDict(extra="allow")
+
+        source_record_id: str = Field(description="Stable id from portal record")
+        permit_number: str | None = None
+        importer_name: str | None = None
+        product_name: str | None = None
+        quantity: float | None = None
+        quantity_unit: str | None = None
+        origin_country: str | None = None
+        status: str | None = None
+        imported_at: datetime | None = None
+        updated_at: datetime | None = None
+        raw: dict[str, Any]
+
+    def write_page(conn: sqlite3.Connection, page: list[dict[str, Any]]) -> int:
+        written = 0
+        for raw in page:
+            record = LegacyRecord(
+                source_record_id=stable_record_id(raw),
+                permit_number=_safe_str(_pick(raw, ("permit_number", "permitNo", "permit", "license_no"))),
+                importer_name=_safe_str(_pick(raw, ("importer_name", "importerName", "company_name", "importer"))),
+                product_name=_safe_str(_pick(raw, ("product_name", "medicine_name", "item_name", "productName"))),
+                quantity=_safe_float(_pick(raw, ("quantity", "qty", "approved_quantity"))),
+                quantity_unit=_safe_str(_pick(raw, ("quantity_unit", "uom", "unit"))),
+                origin_country=_safe_str(_pick(raw, ("origin_country", "country", "country_of_origin"))),
+                status=_safe_str(_pick(raw, ("status", "state", "approval_status"))),
+                imported_at=_safe_datetime(_pick(raw, ("imported_at", "import_date", "date"))),
+                updated_at=_safe_datetime(_pick(raw, ("updated_at", "last_updated", "modified_at"))),
+                raw=raw,
+            )
+            now = _utc_now_iso()
+            written += conn.execute(
+                _UPSERT_IMPORT_SQL,
+                (
+                    record.source_record_id,
+                    record.permit_number,
+                    record.importer_name,
+                    record.product_name,
+                    record.quantity,
+                    record.quantity_unit,
+                    record.origin_country,
+                    record.status,
+                    record.imported_at.isoformat() if record.imported_at else None,
+                    record.updated_at.isoformat() if record.updated_at else None,
+                    json.dumps(record.raw, ensure_ascii=True),
+                    now,
+                    now,
+                ),
+            ).rowcount
+        return written
+
+    return write_page
+
+
+def _current_path(conn: sqlite3.Connection, page: list[dict[str, Any]]) -> int:
+    return write_records(conn, normalize_many(page))
+
+
+def run(
+    name: str,
+    write_page: Callable[[sqlite3.Connection, list[dict[str, Any]]], int],
+    records: list[dict[str, Any]],
+    page_size: int,
+    workdir: Path,
+) -> None:
+    db_path = workdir / f"{name}.sqlite3"
+    SQLiteStore(db_path).init_schema()
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    pages = [records[i:i + page_size] for i in range(0, len(records), page_size)]
+
+    started = time.perf_counter()
+    written = 0
+    for page in pages:
+        written += write_page(conn, page)
+        conn.commit()
+    total_seconds = time.perf_counter() - started
+    conn.close()
+
+    print(f"{name:>8}: {written} rows in {total_seconds:.2f}s ({written / total_seconds:,.0f} rows/s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    records = synthetic_records(args.records)
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = _legacy_path()
+        if legacy is None:
+            print("  legacy: skipped (pydantic not installed)")
+        else:
+            run("legacy", legacy, records, args.page_size, Path(tmp))
+        run("current", _current_path, records, args.page_size, Path(tmp))
+
+
+if __name__ == "__main__":
+    main()
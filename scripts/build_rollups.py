@@ -0,0 +1,288 @@
+"""
+Maintain precomputed analytics rollups in the local EFDA SQLite database.
+
+Runs after scrape_products.py.  Aggregates are kept per month × permit type
+(× supplier / agent / manufacturer / product group / dosage form), so the
+dashboard and the Turso push work with small summary tables instead of
+scanning raw permits and product lines on every request.
+
+Only months touched by changelog entries since the "rollups" cursor are
+rebuilt (see efda_scraper.changelog).
+Month partitions are additive: permit counts, distinct-permit order counts,
+sums and min/max all combine correctly across any range of months.
+
+Usage:
+    cd /Users/t/Developer/personal/efda-scraper
+    .venv/bin/python scripts/build_rollups.py           # incremental
+    .venv/bin/python scripts/build_rollups.py --full    # rebuild every month
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sqlite3
+from pathlib import Path
+
+from efda_scraper.changelog import (
+    get_cursor,
+    head_seq,
+    install_changelog,
+    read_changes,
+    set_cursor,
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)s | %(message)s",
+)
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+DB_PATH = DATA_DIR / "efda.sqlite3"
+
+CHANGELOG_CONSUMER = "rollups"
+
+_PERMIT_MONTH = "strftime('%Y-%m', i.requested_date)"
+_PERMIT_TYPE = "COALESCE(i.submodule_type_code, '')"
+
+# table name → (DDL columns, SELECT producing rows for the months in _rollup_months)
+ROLLUPS: dict[str, tuple[str, str]] = {
+    "rollup_monthly_type": (
+        """
+        month TEXT NOT NULL,
+        type TEXT NOT NULL,
+        permit_count INTEGER NOT NULL,
+        total_value REAL NOT NULL,
+        priced_count INTEGER NOT NULL,
+        priced_value REAL NOT NULL,
+        PRIMARY KEY (month, type)
+        """,
+        f"""
+        SELECT {_PERMIT_MONTH}, {_PERMIT_TYPE},
+            COUNT(*),
+            COALESCE(SUM(i.amount), 0),
+            SUM(CASE WHEN i.amount > 0 THEN 1 ELSE 0 END),
+            COALESCE(SUM(CASE WHEN i.amount > 0 THEN i.amount END), 0)
+        FROM import_permits i
+        WHERE {_PERMIT_MONTH} IN (SELECT month FROM _rollup_months)
+        GROUP BY 1, 2
+        """,
+    ),
+    "rollup_monthly_supplier": (
+        """
+        month TEXT NOT NULL,
+        type TEXT NOT NULL,
+        supplier_name TEXT NOT NULL,
+        permit_count INTEGER NOT NULL,
+        total_value REAL NOT NULL,
+        PRIMARY KEY (month, type, supplier_name)
+        """,
+        f"""
+        SELECT {_PERMIT_MONTH}, {_PERMIT_TYPE}, i.supplier_name,
+            COUNT(*), COALESCE(SUM(i.amount), 0)
+        FROM import_permits i
+        WHERE {_PERMIT_MONTH} IN (SELECT month FROM _rollup_months)
+          AND i.supplier_name IS NOT NULL AND i.supplier_name != ''
+        GROUP BY 1, 2, 3
+        """,
+    ),
+    "rollup_monthly_agent": (
+        """
+        month TEXT NOT NULL,
+        type TEXT NOT NULL,
+        agent_name TEXT NOT NULL,
+        permit_count INTEGER NOT NULL,
+        total_value REAL NOT NULL,
+        PRIMARY KEY (month, type, agent_name)
+        """,
+        f"""
+        SELECT {_PERMIT_MONTH}, {_PERMIT_TYPE}, i.agent_name,
+            COUNT(*), COALESCE(SUM(i.amount), 0)
+        FROM import_permits i
+        WHERE {_PERMIT_MONTH} IN (SELECT month FROM _rollup_months)
+          AND i.agent_name IS NOT NULL AND i.agent_name != ''
+        GROUP BY 1, 2, 3
+        """,
+    ),
+    "rollup_monthly_manufacturer": (
+        """
+        month TEXT NOT NULL,
+        type TEXT NOT NULL,
+        manufacturer_name TEXT NOT NULL,
+        line_count INTEGER NOT NULL,
+        total_value REAL NOT NULL,
+        PRIMARY KEY (month, type, manufacturer_name)
+        """,
+        f"""
+        SELECT {_PERMIT_MONTH}, {_PERMIT_TYPE}, p.manufacturer_name,
+            COUNT(*), COALESCE(SUM(p.amount), 0)
+        FROM import_permit_products p
+        JOIN import_permits i ON p.import_permit_id = i.id
+        WHERE {_PERMIT_MONTH} IN (SELECT month FROM _rollup_months)
+          AND p.manufacturer_name IS NOT NULL AND p.manufacturer_name != ''
+        GROUP BY 1, 2, 3
+        """,
+    ),
+    "rollup_monthly_product_group": (
+        """
+        month TEXT NOT NULL,
+        type TEXT NOT NULL,
+        product_group_id INTEGER NOT NULL,
+        order_count INTEGER NOT NULL,
+        line_count INTEGER NOT NULL,
+        total_quantity REAL NOT NULL,
+        total_value REAL NOT NULL,
+        priced_count INTEGER NOT NULL,
+        price_sum REAL NOT NULL,
+        min_price REAL,
+        max_price REAL,
+        PRIMARY KEY (month, type, product_group_id)
+        """,
+        f"""
+        SELECT {_PERMIT_MONTH}, {_PERMIT_TYPE}, p.product_group_id,
+            COUNT(DISTINCT p.import_permit_id),
+            COUNT(*),
+            COALESCE(SUM(p.quantity), 0),
+            COALESCE(SUM(p.amount), 0),
+            SUM(CASE WHEN p.unit_price > 0 THEN 1 ELSE 0 END),
+            COALESCE(SUM(CASE WHEN p.unit_price > 0 THEN p.unit_price END), 0),
+            MIN(CASE WHEN p.unit_price > 0 THEN p.unit_price END),
+            MAX(CASE WHEN p.unit_price > 0 THEN p.unit_price END)
+        FROM import_permit_products p
+        JOIN import_permits i ON p.import_permit_id = i.id
+        WHERE {_PERMIT_MONTH} IN (SELECT month FROM _rollup_months)
+          AND p.product_group_id IS NOT NULL
+          AND p.generic_name IS NOT NULL AND p.generic_name != ''
+        GROUP BY 1, 2, 3
+        """,
+    ),
+    "rollup_monthly_dosage_form": (
+        """
+        month TEXT NOT NULL,
+        type TEXT NOT NULL,
+        dosage_form TEXT NOT NULL,
+        order_count INTEGER NOT NULL,
+        total_value REAL NOT NULL,
+        PRIMARY KEY (month, type, dosage_form)
+        """,
+        f"""
+        SELECT {_PERMIT_MONTH}, {_PERMIT_TYPE},
+            COALESCE(p.norm_dosage_form, p.dosage_form),
+            COUNT(DISTINCT p.import_permit_id),
+            COALESCE(SUM(p.amount), 0)
+        FROM import_permit_products p
+        JOIN import_permits i ON p.import_permit_id = i.id
+        WHERE {_PERMIT_MONTH} IN (SELECT month FROM _rollup_months)
+          AND p.generic_name IS NOT NULL AND p.generic_name != ''
+          AND p.dosage_form IS NOT NULL AND p.dosage_form != ''
+        GROUP BY 1, 2, 3
+        """,
+    ),
+}
+
+
+def init_rollup_tables(conn: sqlite3.Connection):
+    """Create the rollup tables if they don't exist."""
+    for table, (columns, _) in ROLLUPS.items():
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+    conn.commit()
+
+
+def all_months(conn: sqlite3.Connection) -> list[str]:
+    rows = conn.execute(
+        "SELECT DISTINCT strftime('%Y-%m', requested_date) FROM import_permits "
+        "WHERE requested_date IS NOT NULL"
+    ).fetchall()
+    return sorted(row[0] for row in rows if row[0])
+
+
+def touched_months(conn: sqlite3.Connection, after_seq: int, upto_seq: int) -> list[str]:
+    """Months (YYYY-MM) of permits whose rows or product lines changed in the window.
+
+    A deleted product line (scrape_products.py drops lines a refreshed permit
+    no longer lists) is placed by the permit id the changelog records with
+    it.  A deleted permit carries no date and can't be placed; no script
+    deletes permits, and --full covers the rest.
+    """
+    changes = read_changes(
+        conn, after_seq, upto_seq=upto_seq, tables=("import_permits", "import_permit_products")
+    )
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS _changed_ids (kind TEXT, id INTEGER)")
+    conn.execute("DELETE FROM _changed_ids")
+    conn.executemany(
+        "INSERT INTO _changed_ids (kind, id) VALUES (?, ?)",
+        [(change.table, int(change.pk)) for change in changes if change.op != "D"]
+        + [
+            ("import_permits", int(change.parent))
+            for change in changes
+            if change.op == "D" and change.table == "import_permit_products" and change.parent is not None
+        ],
+    )
+    rows = conn.execute(
+        """
+        SELECT strftime('%Y-%m', requested_date) FROM import_permits
+        WHERE id IN (SELECT id FROM _changed_ids WHERE kind = 'import_permits')
+          AND requested_date IS NOT NULL
+        UNION
+        SELECT strftime('%Y-%m', i.requested_date)
+        FROM import_permit_products p
+        JOIN import_permits i ON p.import_permit_id = i.id
+        WHERE p.id IN (SELECT id FROM _changed_ids WHERE kind = 'import_permit_products')
+          AND i.requested_date IS NOT NULL
+        """
+    ).fetchall()
+    return sorted(row[0] for row in rows if row[0])
+
+
+def rebuild_months(conn: sqlite3.Connection, months: list[str]):
+    """Replace every rollup partition for *months* with freshly aggregated rows."""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS _rollup_months (month TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM _rollup_months")
+    conn.executemany("INSERT INTO _rollup_months (month) VALUES (?)", [(m,) for m in months])
+    for table, (_, select_sql) in ROLLUPS.items():
+        conn.execute(f"DELETE FROM {table} WHERE month IN (SELECT month FROM _rollup_months)")
+        conn.execute(f"INSERT INTO {table} {select_sql}")
+        log.info("  %s rebuilt", table)
+
+
+def build_rollups(full: bool = False, db_path: Path = DB_PATH) -> list[str]:
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    install_changelog(conn)
+    init_rollup_tables(conn)
+
+    after_seq = None if full else get_cursor(conn, CHANGELOG_CONSUMER)
+    # Snapshot the head before reading, so changes written meanwhile are
+    # picked up by the next run rather than skipped.
+    upto_seq = head_seq(conn)
+
+    months = all_months(conn) if after_seq is None else touched_months(conn, after_seq, upto_seq)
+    if not months:
+        log.info("Rollups up to date (changelog seq=%d).", upto_seq)
+        set_cursor(conn, CHANGELOG_CONSUMER, upto_seq)
+        conn.close()
+        return []
+
+    log.info(
+        "Rebuilding rollups for %d months (%s .. %s), mode=%s",
+        len(months), months[0], months[-1], "full" if after_seq is None else "incremental",
+    )
+    with conn:
+        if after_seq is None:
+            for table in ROLLUPS:
+                conn.execute(f"DELETE FROM {table}")
+        rebuild_months(conn, months)
+    set_cursor(conn, CHANGELOG_CONSUMER, upto_seq)
+    conn.close()
+
+    log.info("Done! Rollups rebuilt for %d months. Changelog seq=%d", len(months), upto_seq)
+    return months
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build analytics rollup tables")
+    parser.add_argument("--full", action="store_true", help="Rebuild every month instead of only touched ones")
+    args = parser.parse_args()
+    build_rollups(full=args.full)
@@ -0,0 +1,82 @@
+"""
+Check that the SQLite writer really groups jobs into one transaction.
+
+Submits jobs to a writer with a large batch and a long commit interval and
+verifies from a second connection that none of their rows are visible
+until `flush()` commits the group, that a failing job is rolled back on
+its own while the rest of its group commits, and that the whole group
+took a single commit.  Exits non-zero on the first failed check.
+
+Usage:
+    .venv/bin/python scripts/check_sqlite_writer.py
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from efda_scraper.sqlite_writer import SQLiteWriter
+
+
+def _insert(conn: sqlite3.Connection, value: int) -> int:
+    return conn.execute("INSERT INTO items (value) VALUES (?)", (value,)).rowcount
+
+
+def _insert_then_fail(conn: sqlite3.Connection, value: int) -> int:
+    conn.execute("INSERT INTO items (value) VALUES (?)", (value,))
+    raise ValueError("job failed on purpose")
+
+
+def _wait_applied(writer: SQLiteWriter, jobs: int, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while writer.stats["jobs"] < jobs:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"writer applied {writer.stats['jobs']} of {jobs} jobs")
+        time.sleep(0.01)
+
+
+def check(ok: bool, message: str) -> None:
+    print(f"{'ok' if ok else 'FAIL'}: {message}")
+    if not ok:
+        sys.exit(1)
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "writer.sqlite3"
+        setup = sqlite3.connect(str(db_path))
+        setup.execute("PRAGMA journal_mode=WAL")
+        setup.execute("CREATE TABLE items (value INTEGER NOT NULL)")
+        setup.commit()
+        setup.close()
+
+        reader = sqlite3.connect(str(db_path))
+
+        def visible() -> int:
+            return reader.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+        writer = SQLiteWriter(db_path, batch_size=100, commit_seconds=10)
+        writer.submit(_insert, 1)
+        failing = writer.submit(_insert_then_fail, 2)
+        writer.submit(_insert, 3)
+        _wait_applied(writer, 3)
+        check(visible() == 0, f"rows invisible to another connection before the group commits (saw {visible()})")
+        check(writer.stats["commits"] == 0, "no commit before flush")
+
+        try:
+            writer.flush()
+        except ValueError:
+            pass
+        check(visible() == 2, f"group committed on flush without the failed job's row (saw {visible()})")
+        check(failing.exception() is not None, "failed job's future carries its error")
+        check(writer.stats["commits"] == 1, f"one commit for the group (got {writer.stats['commits']})")
+        writer.close()
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,10 @@ due to inconsistent casing, trailing dosage-form words, etc.
 from __future__ import annotations
 
 import re
+import sqlite3
+from collections import OrderedDict
+
+from efda_scraper.sqlite_writer import WriteListener
 
 # ── Dosage-form words to strip from the end of generic names ────────────────
 
@@ -221,3 +225,169 @@ def normalize_dosage_strength(strength: str | None) -> str:
     s = re.sub(r"\s+", " ", s).strip()
 
     return s
+
+
+# ── Versioned, persisted memo ──────────────────────────────────────────────
+
+# Bump the version of a normalizer whenever its output changes.  Cached
+# entries for that field are then recomputed; the other fields keep theirs.
+NORMALIZER_VERSIONS: dict[str, int] = {
+    "generic_name": 1,
+    "dosage_form": 1,
+    "dosage_strength": 1,
+}
+
+_NORMALIZERS = {
+    "generic_name": normalize_generic_name,
+    "dosage_form": normalize_dosage_form,
+    "dosage_strength": normalize_dosage_strength,
+}
+
+
+class NormalizationCache(WriteListener):
+    """Bounded LRU memo in front of the normalizers, persisted in SQLite.
+
+    Lookups go memory → ``normalization_cache`` table → normalizer.  Rows in
+    the table are tagged with the normalizer version that produced them, so a
+    version bump only invalidates the entries of the affected field.  Values
+    a writer job inserts stay staged until its group commits, so a rolled
+    back row is looked up (and written) again instead of assumed cached.
+
+    >>> cache = NormalizationCache(maxsize=2)
+    >>> cache.generic_name("IBUPROFEN TABLETS")
+    'ibuprofen'
+    >>> cache.generic_name("IBUPROFEN TABLETS")
+    'ibuprofen'
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+
+    def __init__(self, conn: sqlite3.Connection | None = None, maxsize: int = 50_000) -> None:
+        self._conn = conn
+        self._maxsize = maxsize
+        self._memo: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self._staged: dict[tuple[str, str], str] = {}
+        self._job_keys: list[tuple[str, str]] | None = None
+        self.hits = 0
+        self.misses = 0
+        if conn is not None:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS normalization_cache (
+                    field TEXT NOT NULL,
+                    raw TEXT NOT NULL,
+                    normalized TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    PRIMARY KEY (field, raw)
+                )
+                """
+            )
+
+    def normalize(self, field: str, raw: str | None) -> str | None:
+        """Return the normalized value for *raw*, or ``None`` for empty input."""
+        if not raw:
+            return None
+
+        key = (field, raw)
+        cached = self._memo.get(key)
+        if cached is not None:
+            self._memo.move_to_end(key)
+            self.hits += 1
+            return cached
+        cached = self._staged.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        version = NORMALIZER_VERSIONS[field]
+        value = None
+        if self._conn is not None:
+            row = self._conn.execute(
+                "SELECT normalized, version FROM normalization_cache WHERE field = ? AND raw = ?",
+                key,
+            ).fetchone()
+            if row is not None and row[1] == version:
+                value = row[0]
+
+        if value is None:
+            self.misses += 1
+            value = _NORMALIZERS[field](raw)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO normalization_cache (field, raw, normalized, version) "
+                    "VALUES (?, ?, ?, ?)",
+                    (field, raw, value, version),
+                )
+                if self._job_keys is not None:
+                    self._staged[key] = value
+                    self._job_keys.append(key)
+                    return value
+        else:
+            self.hits += 1
+
+        self._remember(key, value)
+        return value
+
+    def _remember(self, key: tuple[str, str], value: str) -> None:
+        self._memo[key] = value
+        if len(self._memo) > self._maxsize:
+            self._memo.popitem(last=False)
+
+    def job_started(self) -> None:
+        self._job_keys = []
+
+    def job_finished(self, ok: bool) -> None:
+        if not ok:
+            for key in self._job_keys or ():
+                self._staged.pop(key, None)
+        self._job_keys = None
+
+    def group_finished(self, ok: bool) -> None:
+        if ok:
+            for key, value in self._staged.items():
+                self._remember(key, value)
+        self._staged.clear()
+
+    def generic_name(self, raw: str | None) -> str | None:
+        return self.normalize("generic_name", raw)
+
+    def dosage_form(self, raw: str | None) -> str | None:
+        return self.normalize("dosage_form", raw)
+
+    def dosage_strength(self, raw: str | None) -> str | None:
+        return self.normalize("dosage_strength", raw)
+
+    def seed(self, table: str) -> None:
+        """Enter the raw values already normalized in *table*, once per field.
+
+        Rows normalized before the cache table existed are otherwise never
+        listed by `stale_values()`.  Seeded entries carry version 0, so they
+        are stale under any current version and re-normalized once.
+        """
+        if self._conn is None:
+            return
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS normalization_cache_seeded (field TEXT PRIMARY KEY)"
+        )
+        seeded = {row[0] for row in self._conn.execute("SELECT field FROM normalization_cache_seeded")}
+        for field in _NORMALIZERS:
+            if field in seeded:
+                continue
+            self._conn.execute(
+                f"INSERT OR IGNORE INTO normalization_cache (field, raw, normalized, version) "
+                f"SELECT ?, {field}, MIN(norm_{field}), 0 FROM {table} "
+                f"WHERE {field} != '' AND norm_{field} IS NOT NULL GROUP BY {field}",
+                (field,),
+            )
+            self._conn.execute("INSERT INTO normalization_cache_seeded (field) VALUES (?)", (field,))
+        self._conn.commit()
+
+    def stale_values(self, field: str) -> list[str]:
+        """Raw values of *field* whose cached entry predates the current version."""
+        if self._conn is None:
+            return []
+        rows = self._conn.execute(
+            "SELECT raw FROM normalization_cache WHERE field = ? AND version != ?",
+            (field, NORMALIZER_VERSIONS[field]),
+        ).fetchall()
+        return [row[0] for row in rows]
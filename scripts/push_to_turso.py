@@ -0,0 +1,370 @@
+"""
+Push the local SQLite database to Turso over the libSQL HTTP protocol.
+
+Rows are read with a cursor in bounded chunks and sent as multi-row
+``INSERT OR REPLACE`` statements, several statements pipelined per HTTP
+request (Hrana ``/v2/pipeline`` batch) inside one transaction.  For the
+large tables nothing is buffered beyond one chunk, so memory stays flat
+regardless of their size.
+
+The large tables are synced incrementally from the changelog (see
+efda_scraper.changelog): only rows inserted/updated since the "turso" cursor
+are re-sent and deleted rows are deleted remotely.  Small tables (rollups,
+scrape_log) are always replaced: re-sent into a staging copy in bounded
+requests and swapped in by one small transaction, so buckets removed
+locally are removed remotely.  Use --full to force a complete re-push.
+
+Works against a local ``sqld`` too:
+
+    sqld --http-listen-addr 127.0.0.1:8080 &
+    python scripts/push_to_turso.py --url http://127.0.0.1:8080 --full
+
+Usage:
+    cd /Users/t/Developer/personal/efda-scraper
+    TURSO_AUTH_TOKEN=... .venv/bin/python scripts/push_to_turso.py          # incremental
+    TURSO_AUTH_TOKEN=... .venv/bin/python scripts/push_to_turso.py --full   # full re-push
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import logging
+import os
+import re
+import sqlite3
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from efda_scraper.changelog import (
+    CDC_TABLES,
+    get_cursor,
+    head_seq,
+    install_changelog,
+    prune_changelog,
+    read_changes,
+    set_cursor,
+)
+from efda_scraper.http_client import create_client
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)s | %(message)s",
+)
+log = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = BASE_DIR / "data"
+DB_PATH = DATA_DIR / "efda.sqlite3"
+CHANGELOG_CONSUMER = "turso"
+
+DEFAULT_TURSO_URL = "libsql://efda-tettemqe.aws-eu-west-1.turso.io"
+
+# Tables to sync.  The ones in INCREMENTAL_TABLES follow the changelog; the
+# rest (the rollup_* summaries and scrape_log) are replaced in full each push.
+TABLES = [
+    "import_permits",
+    "import_permit_products",
+    "product_groups",
+    "rollup_monthly_type",
+    "rollup_monthly_supplier",
+    "rollup_monthly_agent",
+    "rollup_monthly_manufacturer",
+    "rollup_monthly_product_group",
+    "rollup_monthly_dosage_form",
+    "scrape_log",
+]
+INCREMENTAL_TABLES = {"import_permits", "import_permit_products", "product_groups"}
+
+# Skip raw_json (huge, not used by dashboard)
+SKIP_COLUMNS = {"raw_json"}
+
+READ_CHUNK_ROWS = 1000
+PK_CHUNK = 500
+ROWS_PER_STATEMENT = 100
+STATEMENTS_PER_REQUEST = 10
+MAX_SQL_VARIABLES = 32766
+
+
+def _http_url(url: str) -> str:
+    """libsql://host → https://host; http(s) URLs (e.g. local sqld) pass through."""
+    if url.startswith("libsql://"):
+        return "https://" + url[len("libsql://"):]
+    return url.rstrip("/")
+
+
+def _encode_value(value: Any) -> dict[str, Any]:
+    if value is None:
+        return {"type": "null"}
+    if isinstance(value, bool):
+        return {"type": "integer", "value": str(int(value))}
+    if isinstance(value, int):
+        return {"type": "integer", "value": str(value)}
+    if isinstance(value, float):
+        return {"type": "float", "value": value}
+    if isinstance(value, bytes):
+        return {"type": "blob", "base64": base64.b64encode(value).decode("ascii")}
+    return {"type": "text", "value": str(value)}
+
+
+class LibsqlHttpClient:
+    """Minimal Hrana-over-HTTP client: one pipeline request per call."""
+
+    def __init__(self, url: str, auth_token: str | None, client: httpx.Client) -> None:
+        self._endpoint = f"{_http_url(url)}/v2/pipeline"
+        self._headers = {"Authorization": f"Bearer {auth_token}"} if auth_token else {}
+        self._client = client
+
+    def pipeline(self, statements: list[tuple[str, list[Any]]]) -> list[dict[str, Any]]:
+        """Execute *statements* in order on a fresh stream; raise on the first error."""
+        requests = [
+            {
+                "type": "execute",
+                "stmt": {"sql": sql, "args": [_encode_value(arg) for arg in args]},
+            }
+            for sql, args in statements
+        ]
+        requests.append({"type": "close"})
+        resp = self._client.post(self._endpoint, json={"requests": requests}, headers=self._headers)
+        resp.raise_for_status()
+        results = resp.json().get("results", [])
+        for (sql, _), result in zip(statements, results):
+            if result.get("type") == "error":
+                message = (result.get("error") or {}).get("message", "unknown error")
+                raise RuntimeError(f"libSQL error: {message} (sql={sql[:80]!r})")
+        return results
+
+    def execute(self, sql: str, args: list[Any] | None = None) -> dict[str, Any]:
+        return self.pipeline([(sql, args or [])])[0]
+
+    def transaction(self, statements: list[tuple[str, list[Any]]]) -> None:
+        """Run *statements* atomically as one Hrana batch (BEGIN … COMMIT / ROLLBACK)."""
+        steps: list[dict[str, Any]] = [{"stmt": {"sql": "BEGIN"}}]
+        for sql, args in statements:
+            steps.append(
+                {
+                    "stmt": {"sql": sql, "args": [_encode_value(arg) for arg in args]},
+                    "condition": {"type": "ok", "step": len(steps) - 1},
+                }
+            )
+        commit_step = len(steps)
+        steps.append({"stmt": {"sql": "COMMIT"}, "condition": {"type": "ok", "step": commit_step - 1}})
+        steps.append(
+            {
+                "stmt": {"sql": "ROLLBACK"},
+                "condition": {"type": "not", "cond": {"type": "ok", "step": commit_step}},
+            }
+        )
+        resp = self._client.post(
+            self._endpoint,
+            json={"requests": [{"type": "batch", "batch": {"steps": steps}}, {"type": "close"}]},
+            headers=self._headers,
+        )
+        resp.raise_for_status()
+        result = resp.json()["results"][0]
+        if result.get("type") == "error":
+            raise RuntimeError(f"libSQL error: {(result.get('error') or {}).get('message')}")
+        step_errors = result["response"]["result"].get("step_errors") or []
+        for step_error in step_errors:
+            if step_error:
+                raise RuntimeError(f"libSQL batch failed: {step_error.get('message')}")
+
+
+def local_tables(conn: sqlite3.Connection) -> list[str]:
+    existing = {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }
+    return [table for table in TABLES if table in existing]
+
+
+def push_schema(conn: sqlite3.Connection, remote: LibsqlHttpClient, tables: list[str]):
+    """Create tables remotely, add columns added locally since, then create indexes."""
+    placeholders = ", ".join("?" for _ in tables)
+    rows = conn.execute(
+        f"SELECT type, sql FROM sqlite_master "
+        f"WHERE tbl_name IN ({placeholders}) AND type IN ('table', 'index') AND sql IS NOT NULL",
+        tables,
+    ).fetchall()
+
+    def create(sql: str):
+        sql = re.sub(r"^CREATE (TABLE|(?:UNIQUE )?INDEX) ", r"CREATE \1 IF NOT EXISTS ", sql.strip())
+        try:
+            remote.execute(sql)
+            log.info("  OK: %s...", " ".join(sql.split())[:80])
+        except RuntimeError as exc:
+            log.info("  SKIP: %s", str(exc)[:100])
+
+    for kind, sql in rows:
+        if kind == "table":
+            create(sql)
+
+    for table in tables:
+        result = remote.execute(f"PRAGMA table_info({table})")["response"]["result"]
+        remote_cols = {row[1]["value"] for row in result["rows"]}
+        for _, name, col_type, *_ in conn.execute(f"PRAGMA table_info({table})"):
+            if name in remote_cols:
+                continue
+            remote.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type or 'TEXT'}")
+            log.info("  Added column %s.%s", table, name)
+
+    for kind, sql in rows:
+        if kind == "index":
+            create(sql)
+
+
+def _send_rows(
+    remote: LibsqlHttpClient,
+    table: str,
+    cols: list[str],
+    chunks: Iterable[list[tuple[Any, ...]]],
+) -> int:
+    """Upsert *chunks* into *table*, STATEMENTS_PER_REQUEST statements per request."""
+    col_list = ", ".join(cols)
+    rows_per_stmt = max(1, min(ROWS_PER_STATEMENT, MAX_SQL_VARIABLES // len(cols)))
+    row_placeholder = "(" + ", ".join("?" for _ in cols) + ")"
+
+    statements: list[tuple[str, list[Any]]] = []
+    pushed = 0
+    for chunk in chunks:
+        for start in range(0, len(chunk), rows_per_stmt):
+            group = chunk[start:start + rows_per_stmt]
+            sql = (
+                f"INSERT OR REPLACE INTO {table} ({col_list}) VALUES "
+                + ", ".join(row_placeholder for _ in group)
+            )
+            statements.append((sql, [value for row in group for value in row]))
+            if len(statements) >= STATEMENTS_PER_REQUEST:
+                remote.transaction(statements)
+                statements = []
+        pushed += len(chunk)
+        log.info("  %d rows", pushed)
+    if statements:
+        remote.transaction(statements)
+    return pushed
+
+
+def _replace_rows(
+    remote: LibsqlHttpClient,
+    table: str,
+    cols: list[str],
+    chunks: Iterable[list[tuple[Any, ...]]],
+) -> int:
+    """Replace the remote *table* with *chunks*, so rows gone locally go remotely too.
+
+    The rows are uploaded in bounded requests into a staging copy, then
+    swapped in by one small transaction, so no request carries the whole
+    table and readers never see it half-filled.
+    """
+    col_list = ", ".join(cols)
+    staging = f"{table}__staging"
+    remote.execute(f"DROP TABLE IF EXISTS {staging}")
+    remote.execute(f"CREATE TABLE {staging} AS SELECT {col_list} FROM {table} WHERE 0")
+    pushed = _send_rows(remote, staging, cols, chunks)
+    remote.transaction(
+        [
+            (f"DELETE FROM {table}", []),
+            (f"INSERT INTO {table} ({col_list}) SELECT {col_list} FROM {staging}", []),
+            (f"DROP TABLE {staging}", []),
+        ]
+    )
+    return pushed
+
+
+def _full_chunks(conn: sqlite3.Connection, table: str, cols: list[str]):
+    cursor = conn.execute(f"SELECT {', '.join(cols)} FROM {table}")
+    while chunk := cursor.fetchmany(READ_CHUNK_ROWS):
+        yield chunk
+
+
+def _pk_chunks(conn: sqlite3.Connection, table: str, cols: list[str], pks: list[str]):
+    pk_column = CDC_TABLES[table]
+    for start in range(0, len(pks), PK_CHUNK):
+        batch = pks[start:start + PK_CHUNK]
+        chunk = conn.execute(
+            f"SELECT {', '.join(cols)} FROM {table} "
+            f"WHERE {pk_column} IN ({', '.join('?' for _ in batch)})",
+            batch,
+        ).fetchall()
+        if chunk:
+            yield chunk
+
+
+def push_table(
+    conn: sqlite3.Connection,
+    remote: LibsqlHttpClient,
+    table: str,
+    after_seq: int | None,
+    upto_seq: int,
+) -> int:
+    """Push *table*: everything when after_seq is None, else only changelog rows."""
+    cols = [
+        row[1] for row in conn.execute(f"PRAGMA table_info({table})") if row[1] not in SKIP_COLUMNS
+    ]
+    if table not in INCREMENTAL_TABLES:
+        return _replace_rows(remote, table, cols, _full_chunks(conn, table, cols))
+    if after_seq is None:
+        return _send_rows(remote, table, cols, _full_chunks(conn, table, cols))
+
+    changes = read_changes(conn, after_seq, upto_seq=upto_seq, tables=(table,))
+    upserts = [change.pk for change in changes if change.op != "D"]
+    deletes = [change.pk for change in changes if change.op == "D"]
+    log.info("  Changes: %d upserts, %d deletes", len(upserts), len(deletes))
+
+    pk_column = CDC_TABLES[table]
+    for start in range(0, len(deletes), PK_CHUNK):
+        batch = deletes[start:start + PK_CHUNK]
+        remote.transaction(
+            [(f"DELETE FROM {table} WHERE {pk_column} IN ({', '.join('?' for _ in batch)})", batch)]
+        )
+    return _send_rows(remote, table, cols, _pk_chunks(conn, table, cols, upserts))
+
+
+def push_to_turso(url: str, auth_token: str | None, full: bool = False, db_path: Path = DB_PATH):
+    conn = sqlite3.connect(str(db_path))
+    install_changelog(conn)
+    after_seq = None if full else get_cursor(conn, CHANGELOG_CONSUMER)
+    # Snapshot the head first so changes written during the push go out next time.
+    upto_seq = head_seq(conn)
+    log.info("Pushing to %s", url)
+    log.info(
+        "Mode: %s",
+        f"incremental (changelog seq {after_seq}..{upto_seq})" if after_seq is not None else "full",
+    )
+
+    counts: dict[str, int] = {}
+    with create_client(timeout=120.0) as http:
+        remote = LibsqlHttpClient(url, auth_token, http)
+        tables = local_tables(conn)
+
+        log.info("--- Creating schema ---")
+        push_schema(conn, remote, tables)
+
+        for table in tables:
+            log.info("--- Pushing %s ---", table)
+            counts[table] = push_table(conn, remote, table, after_seq, upto_seq)
+            log.info("  Done: %d rows pushed", counts[table])
+
+    set_cursor(conn, CHANGELOG_CONSUMER, upto_seq)
+    prune_changelog(conn)
+    conn.close()
+    log.info("All done! Sync counts: %s", counts)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Push local SQLite data to Turso")
+    parser.add_argument("--full", action="store_true", help="Force a complete re-push")
+    parser.add_argument(
+        "--url",
+        default=os.environ.get("TURSO_DATABASE_URL") or DEFAULT_TURSO_URL,
+        help="libsql:// or http(s):// URL (e.g. a local sqld)",
+    )
+    args = parser.parse_args()
+
+    token = os.environ.get("TURSO_AUTH_TOKEN")
+    if not token and args.url.startswith("libsql://"):
+        parser.error("Set TURSO_AUTH_TOKEN env var")
+    push_to_turso(args.url, token, full=args.full)
@@ -0,0 +1,287 @@
+"""
+Freshness scheduler for import-permit product details.
+
+Every permit whose details have been fetched gets a row in `detail_refresh`
+with a next-refresh time.  The interval starts from a per-status base
+(pending permits still get amended and approved, decided ones rarely
+change), grows with the permit's age and shrinks or grows with the change
+rate observed on earlier refreshes.  `plan()` returns brand-new permits
+first, then the most overdue refreshes within a refresh budget.  A failed
+fetch is retried after an exponential backoff instead of staying overdue.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
+
+# Base refresh interval in days per import_permits.status_code.  Anything
+# not listed (submitted, under review, returned, ...) is still in flight.
+STATUS_BASE_DAYS = {
+    "APR": 30.0,
+    "REJ": 90.0,
+}
+DEFAULT_BASE_DAYS = 1.0
+
+# The interval doubles for every AGE_DOUBLING_DAYS since the request date.
+AGE_DOUBLING_DAYS = 180.0
+# Change rate assumed before any refresh has been observed; a permit that
+# changes at exactly this rate keeps the base interval.
+PRIOR_CHANGE_RATE = 0.5
+MIN_INTERVAL_DAYS = 0.5
+MAX_INTERVAL_DAYS = 120.0
+# Retry delay after the first failed fetch; doubles per consecutive failure.
+FAILURE_BACKOFF_HOURS = 6.0
+MAX_FAILURE_BACKOFF_DAYS = 30.0
+
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+@dataclass(slots=True)
+class PlannedFetch:
+    import_id: int
+    import_number: str
+    is_refresh: bool
+
+
+def details_hash(details: list) -> str:
+    """Order-insensitive fingerprint of a permit's details payload."""
+    canonical = sorted(json.dumps(item, sort_keys=True, default=str) for item in details)
+    return hashlib.sha256("\n".join(canonical).encode("utf-8")).hexdigest()
+
+
+def _parse_date(value: str | None) -> date | None:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
+
+
+def refresh_interval(
+    status_code: str | None,
+    requested_date: str | None,
+    fetches: int,
+    changes: int,
+    now: datetime,
+) -> timedelta:
+    base = STATUS_BASE_DAYS.get((status_code or "").upper(), DEFAULT_BASE_DAYS)
+    requested = _parse_date(requested_date)
+    age_days = max((now.date() - requested).days, 0) if requested else 0
+    age_factor = 2 ** (age_days / AGE_DOUBLING_DAYS)
+    # Laplace-smoothed share of refreshes that found a different payload;
+    # the first fetch is not a refresh, so it does not count.
+    refreshes = max(fetches - 1, 0)
+    change_rate = (changes + 1) / (refreshes + 2)
+    days = base * age_factor * (PRIOR_CHANGE_RATE / change_rate)
+    return timedelta(days=min(max(days, MIN_INTERVAL_DAYS), MAX_INTERVAL_DAYS))
+
+
+def failure_backoff(failures: int) -> timedelta:
+    hours = FAILURE_BACKOFF_HOURS * 2 ** max(failures - 1, 0)
+    return timedelta(hours=min(hours, MAX_FAILURE_BACKOFF_DAYS * 24))
+
+
+class RefreshScheduler:
+    def __init__(self, conn: sqlite3.Connection, *, date_cutoff: str = "2023-01-01") -> None:
+        self.conn = conn
+        self.date_cutoff = date_cutoff
+        self.changed = 0
+        self.unchanged = 0
+        self.failed = 0
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS detail_refresh (
+                import_permit_id INTEGER PRIMARY KEY,
+                status_code TEXT,
+                details_hash TEXT,
+                fetch_count INTEGER NOT NULL DEFAULT 0,
+                change_count INTEGER NOT NULL DEFAULT 0,
+                failure_count INTEGER NOT NULL DEFAULT 0,
+                last_fetched_at TEXT,
+                next_refresh_at TEXT
+            )
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(detail_refresh)")}
+        if "failure_count" not in columns:
+            conn.execute("ALTER TABLE detail_refresh ADD COLUMN failure_count INTEGER NOT NULL DEFAULT 0")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_detail_refresh_next ON detail_refresh(next_refresh_at)"
+        )
+        conn.commit()
+        self._seed()
+
+    def _seed(self) -> None:
+        """Schedule permits scraped before the scheduler existed.
+
+        They get no hash and a fetch count of 0, so their first refresh only
+        records a baseline instead of counting as a change.
+        """
+        rows = self.conn.execute(
+            """
+            SELECT p.import_permit_id, ip.status_code, ip.requested_date, MAX(p.scraped_at)
+            FROM import_permit_products p
+            JOIN import_permits ip ON ip.id = p.import_permit_id
+            LEFT JOIN detail_refresh r ON r.import_permit_id = p.import_permit_id
+            WHERE r.import_permit_id IS NULL
+            GROUP BY p.import_permit_id
+            """
+        ).fetchall()
+        if not rows:
+            return
+        now = datetime.now(UTC)
+        seeded = []
+        for import_id, status_code, requested_date, scraped_at in rows:
+            try:
+                fetched = datetime.strptime(scraped_at, _TIMESTAMP_FORMAT).replace(tzinfo=UTC)
+            except (TypeError, ValueError):
+                fetched = now
+            next_at = fetched + refresh_interval(status_code, requested_date, 1, 0, now)
+            seeded.append(
+                (
+                    import_id,
+                    status_code,
+                    fetched.strftime(_TIMESTAMP_FORMAT),
+                    next_at.strftime(_TIMESTAMP_FORMAT),
+                )
+            )
+        self.conn.executemany(
+            """
+            INSERT INTO detail_refresh (import_permit_id, status_code, fetch_count, last_fetched_at, next_refresh_at)
+            VALUES (?, ?, 0, ?, ?)
+            """,
+            seeded,
+        )
+        self.conn.commit()
+
+    def plan(self, budget: int | None, *, limit: int | None = None) -> list[PlannedFetch]:
+        """New permits (newest first), then due refreshes (most overdue first).
+
+        `budget` caps only the refreshes; new permits are always planned.
+        `limit` caps the whole plan (for test runs).
+        """
+        new = [
+            PlannedFetch(import_id, number, False)
+            for import_id, number in self.conn.execute(
+                """
+                SELECT ip.id, ip.import_permit_number
+                FROM import_permits ip
+                LEFT JOIN detail_refresh r ON r.import_permit_id = ip.id
+                WHERE r.import_permit_id IS NULL AND ip.requested_date >= ?
+                ORDER BY ip.id DESC
+                LIMIT ?
+                """,
+                (self.date_cutoff, -1 if limit is None else max(limit, 0)),
+            )
+        ]
+        caps = [cap for cap in (budget, None if limit is None else limit - len(new)) if cap is not None]
+        remaining = max(min(caps), 0) if caps else -1
+        if remaining == 0:
+            return new
+        now = datetime.now(UTC).strftime(_TIMESTAMP_FORMAT)
+        due = [
+            PlannedFetch(import_id, number, True)
+            for import_id, number in self.conn.execute(
+                """
+                SELECT ip.id, ip.import_permit_number
+                FROM detail_refresh r
+                JOIN import_permits ip ON ip.id = r.import_permit_id
+                WHERE r.next_refresh_at <= ?
+                ORDER BY r.next_refresh_at
+                LIMIT ?
+                """,
+                (now, remaining),
+            )
+        ]
+        return new + due
+
+    def due_count(self) -> int:
+        now = datetime.now(UTC).strftime(_TIMESTAMP_FORMAT)
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM detail_refresh WHERE next_refresh_at <= ?", (now,)
+        ).fetchone()[0]
+
+    def record(self, import_id: int, new_hash: str) -> bool:
+        """Store the outcome of a successful fetch and reschedule.
+
+        `new_hash` is the `details_hash()` of the fetched payload.  Returns
+        True when the stored line items may be out of date: the payload
+        changed, or this is the first hashed fetch of a seeded permit.
+        """
+        status_code, requested_date = self.conn.execute(
+            "SELECT status_code, requested_date FROM import_permits WHERE id = ?", (import_id,)
+        ).fetchone() or (None, None)
+        previous = self.conn.execute(
+            "SELECT details_hash, fetch_count, change_count FROM detail_refresh WHERE import_permit_id = ?",
+            (import_id,),
+        ).fetchone()
+        fetches = (previous[1] if previous else 0) + 1
+        changed = previous is not None and previous[0] is not None and previous[0] != new_hash
+        changes = (previous[2] if previous else 0) + int(changed)
+
+        now = datetime.now(UTC)
+        next_at = now + refresh_interval(status_code, requested_date, fetches, changes, now)
+        self.conn.execute(
+            """
+            INSERT INTO detail_refresh (
+                import_permit_id, status_code, details_hash, fetch_count, change_count,
+                last_fetched_at, next_refresh_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(import_permit_id) DO UPDATE SET
+                status_code = excluded.status_code,
+                details_hash = excluded.details_hash,
+                fetch_count = excluded.fetch_count,
+                change_count = excluded.change_count,
+                failure_count = 0,
+                last_fetched_at = excluded.last_fetched_at,
+                next_refresh_at = excluded.next_refresh_at
+            """,
+            (
+                import_id,
+                status_code,
+                new_hash,
+                fetches,
+                changes,
+                now.strftime(_TIMESTAMP_FORMAT),
+                next_at.strftime(_TIMESTAMP_FORMAT),
+            ),
+        )
+        if changed:
+            self.changed += 1
+        elif previous is not None and previous[0] is not None:
+            self.unchanged += 1
+        return changed or (previous is not None and previous[0] is None)
+
+    def record_failure(self, import_id: int) -> timedelta:
+        """Push a permit whose fetch failed back by `failure_backoff()`.
+
+        A permit never fetched successfully gets a row without a hash, so
+        it is retried as a refresh instead of being planned as new again.
+        Returns the delay applied.
+        """
+        status_code = (self.conn.execute(
+            "SELECT status_code FROM import_permits WHERE id = ?", (import_id,)
+        ).fetchone() or (None,))[0]
+        previous = self.conn.execute(
+            "SELECT failure_count FROM detail_refresh WHERE import_permit_id = ?", (import_id,)
+        ).fetchone()
+        failures = (previous[0] if previous else 0) + 1
+        delay = failure_backoff(failures)
+        next_at = (datetime.now(UTC) + delay).strftime(_TIMESTAMP_FORMAT)
+        self.conn.execute(
+            """
+            INSERT INTO detail_refresh (import_permit_id, status_code, failure_count, next_refresh_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(import_permit_id) DO UPDATE SET
+                failure_count = excluded.failure_count,
+                next_refresh_at = excluded.next_refresh_at
+            """,
+            (import_id, status_code, failures, next_at),
+        )
+        self.failed += 1
+        return delay
@@ -2,7 +2,7 @@
 set -euo pipefail
 
 # EFDA Scraper Pipeline
-# Runs: scrape imports → scrape products → push to Turso
+# Runs: scrape imports → scrape products → build rollups → push to Turso
 #
 # Required env vars:
 #   EFDA_USERNAME, EFDA_PASSWORD   — portal credentials
@@ -25,14 +25,19 @@ echo "--- Step 1: Scraping import permits ---"
 python "$SCRIPT_DIR/scrape_all.py"
 echo ""
 
-# Step 2: Scrape product details for new imports
+# Step 2: Scrape product details for new imports, then refresh the most overdue ones
 echo "--- Step 2: Scraping product details ---"
 python "$SCRIPT_DIR/scrape_products.py"
 echo ""
 
-# Step 3: Push new data to Turso
-echo "--- Step 3: Pushing to Turso ---"
-node "$ROOT_DIR/dashboard/scripts/push-to-turso.mjs"
+# Step 3: Refresh analytics rollups for months touched by this run
+echo "--- Step 3: Building analytics rollups ---"
+python "$SCRIPT_DIR/build_rollups.py"
+echo ""
+
+# Step 4: Push new data to Turso
+echo "--- Step 4: Pushing to Turso ---"
+python "$SCRIPT_DIR/push_to_turso.py"
 echo ""
 
 echo "=== Pipeline complete ==="
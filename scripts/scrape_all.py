@@ -9,6 +9,11 @@ Usage:
     cd /Users/t/Developer/personal/efda-scraper
     .venv/bin/python scripts/scrape_all.py              # auto-detects mode
     .venv/bin/python scripts/scrape_all.py --full        # force full re-scrape (still 2023+ only)
+    .venv/bin/python scripts/scrape_all.py --calibrate   # re-probe the best list page size first
+
+The list page size is calibrated against the server (see
+efda_scraper.page_size) and kept in data/state/page_size.json; it is
+re-probed automatically once the stored value is older than 30 days.
 """
 
 from __future__ import annotations
@@ -21,11 +26,24 @@ import logging
 import os
 import sqlite3
 import time
+from collections.abc import Awaitable
+from dataclasses import dataclass
 from pathlib import Path
 
 import httpx
 from playwright.async_api import async_playwright
 
+from efda_scraper.changelog import install_changelog
+from efda_scraper.config import Settings, load_settings
+from efda_scraper.http_client import create_async_client
+from efda_scraper.http_telemetry import HttpTelemetry
+from efda_scraper.jsonstream import DECODE_ERRORS, read_array
+from efda_scraper.metrics import RunMetrics, init_scrape_log
+from efda_scraper.offload import Offloader
+from efda_scraper.page_size import PageSizeStore, calibrate_page_size
+from efda_scraper.resilience import RETRYABLE_ERRORS, CircuitOpenError, RetryBudget, RetryPolicy, is_server_error
+from efda_scraper.sqlite_writer import SQLiteWriter
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s | %(levelname)s | %(message)s",
@@ -39,10 +57,14 @@ CSV_PATH = DATA_DIR / "all_imports.csv"
 RAW_DIR = DATA_DIR / "raw" / "api_v2"
 STATE_DIR = DATA_DIR / "state"
 TOKEN_PATH = STATE_DIR / "token.json"
+PAGE_SIZE_STATE_PATH = STATE_DIR / "page_size.json"
+REPORTS_DIR = DATA_DIR / "reports"
 
 API_BASE = "https://api.eris.efda.gov.et"
 PORTAL_URL = "https://portal.eris.efda.gov.et/"
-PAGE_SIZE = 100
+PAGE_SIZE = 100  # used until a calibrated size is stored
+LIST_URL = f"{API_BASE}/api/ImportPermit/List"
+LIST_ENDPOINT_KEY = "POST /api/ImportPermit/List"
 DATE_CUTOFF = "2023-01-01"
 
 
@@ -157,26 +179,36 @@ def init_db(db_path: Path) -> sqlite3.Connection:
         )
         """
     )
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS scrape_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            started_at TEXT,
-            finished_at TEXT,
-            total_records INTEGER,
-            records_fetched INTEGER,
-            status TEXT,
-            message TEXT
-        )
-        """
-    )
     conn.commit()
+    init_scrape_log(conn)
+    install_changelog(conn)
     return conn
 
 
-def upsert_record(conn: sqlite3.Connection, rec: dict):
-    """Insert or update an import permit record."""
-    conn.execute(
+# API keys in the column order of the import_permits upsert below; a row is
+# these values followed by raw_json.
+_PERMIT_KEYS = (
+    "id", "importPermitNumber", "applicationId", "agentID", "agentName",
+    "supplierName", "portOfEntry", "paymentMode", "shippingMethod",
+    "currency", "amount", "freightCost", "importPermitStatus", "importPermitStatusCode",
+    "submoduleTypeCode", "performaInvoiceNumber",
+    "requestedDate", "expiryDate", "submissionDate", "decisionDate",
+    "delivery", "remark", "createdByUsername", "assignedUser",
+    "isAccessory",
+)
+ROW_ID = _PERMIT_KEYS.index("id")
+ROW_REQUESTED_DATE = _PERMIT_KEYS.index("requestedDate")
+ROW_RAW_JSON = len(_PERMIT_KEYS)
+
+
+def permit_row(rec: dict) -> tuple:
+    """Upsert parameters for one API record, raw_json included."""
+    return (*(rec.get(key) for key in _PERMIT_KEYS), json.dumps(rec, default=str))
+
+
+def upsert_rows(conn: sqlite3.Connection, rows: list[tuple]):
+    """Insert or update import permits from `permit_row` tuples."""
+    conn.executemany(
         """
         INSERT INTO import_permits (
             id, import_permit_number, application_id, agent_id, agent_name,
@@ -187,13 +219,8 @@ def upsert_record(conn: sqlite3.Connection, rec: dict):
             delivery, remark, created_by_username, assigned_user,
             is_accessory, raw_json, scraped_at
         ) VALUES (
-            :id, :importPermitNumber, :applicationId, :agentID, :agentName,
-            :supplierName, :portOfEntry, :paymentMode, :shippingMethod,
-            :currency, :amount, :freightCost, :importPermitStatus, :importPermitStatusCode,
-            :submoduleTypeCode, :performaInvoiceNumber,
-            :requestedDate, :expiryDate, :submissionDate, :decisionDate,
-            :delivery, :remark, :createdByUsername, :assignedUser,
-            :isAccessory, :raw_json, datetime('now')
+            ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+            datetime('now')
         )
         ON CONFLICT(id) DO UPDATE SET
             import_permit_number = excluded.import_permit_number,
@@ -205,19 +232,75 @@ def upsert_record(conn: sqlite3.Connection, rec: dict):
             raw_json = excluded.raw_json,
             scraped_at = excluded.scraped_at
         """,
-        {**rec, "raw_json": json.dumps(rec, default=str)},
+        rows,
     )
 
 
-def is_before_cutoff(rec: dict) -> bool:
+def is_before_cutoff(req_date: str | None) -> bool:
     """Check if a record's requestedDate is before the DATE_CUTOFF."""
-    req_date = rec.get("requestedDate", "")
     if not req_date:
         return False
     return req_date < DATE_CUTOFF
 
 
 CONCURRENCY_PAGES = 5
+# Non-retryable page failures in a row (e.g. 400 for a bad user id) that
+# stop the run; the breaker only counts 5xx/429, network errors and HTML.
+MAX_CONSECUTIVE_REJECTS = 3
+# Stop reasons that mean the run did not collect what it should have.
+FAILED_STOPS = {"first_page_error", "non_json_response", "auth_error", "circuit_open", "consecutive_errors"}
+
+
+@dataclass(slots=True)
+class PreparedPage:
+    records_total: int | None
+    rows: list[tuple]  # permit_row() tuples, in API order
+
+
+def prepare_page(records_total: int | None, records: list[dict]) -> PreparedPage:
+    """Build the upsert rows of a decoded list page.
+
+    Runs in the offload executor, so it must stay a picklable module-level
+    function.
+    """
+    return PreparedPage(records_total, [permit_row(rec) for rec in records])
+
+
+def write_raw_rows(path: Path, raw_rows: list[str]) -> None:
+    """Write the rows' raw JSON as one array; they are already encoded, so no re-encoding."""
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("[\n")
+        fh.write(",\n".join(raw_rows))
+        fh.write("\n]\n")
+
+
+@dataclass(slots=True)
+class PageResponse:
+    status_code: int
+    body: PreparedPage | None  # None if the response was not JSON
+    num_bytes: int
+
+
+async def _read_page(client: httpx.AsyncClient, request: httpx.Request, offload: Offloader) -> PageResponse:
+    """Send `request`, decode the `data` array while the body streams in and build its rows off the loop."""
+    resp = await client.send(request, stream=True)
+    try:
+        body = None
+        if resp.status_code == 200:
+            try:
+                meta, records = await read_array(resp, "data")
+            except DECODE_ERRORS:
+                pass
+            else:
+                body = await offload.run(prepare_page, meta.get("recordsTotal"), records)
+        return PageResponse(resp.status_code, body, resp.num_bytes_downloaded)
+    finally:
+        await resp.aclose()
+
+
+def _page_failed(resp: PageResponse) -> bool:
+    # A 200 that is not JSON is the portal's HTML error page, not data.
+    return is_server_error(resp.status_code) or (resp.status_code == 200 and resp.body is None)
 
 
 async def fetch_page(
@@ -226,38 +309,70 @@ async def fetch_page(
     headers: dict,
     user_id: str,
     semaphore: asyncio.Semaphore,
-) -> tuple[int, httpx.Response | None]:
-    """Fetch a single page of records with retries. Returns (offset, response)."""
-    max_retries = 5
+    policy: RetryPolicy,
+    offload: Offloader,
+    page_size: int = PAGE_SIZE,
+) -> tuple[int, PageResponse | None]:
+    """Fetch a single page through the run's retry policy. Returns (offset, response)."""
+
+    def send() -> Awaitable[PageResponse]:
+        log.info("Fetching records %d - %d ...", offset, offset + page_size)
+        request = client.build_request(
+            "POST",
+            LIST_URL,
+            data=build_form_data(offset, page_size, user_id),
+            headers=headers,
+        )
+        return _read_page(client, request, offload)
+
     async with semaphore:
-        for attempt in range(max_retries):
-            try:
-                log.info("Fetching records %d - %d ...", offset, offset + PAGE_SIZE)
-                resp = await client.post(
-                    f"{API_BASE}/api/ImportPermit/List",
-                    data=build_form_data(offset, PAGE_SIZE, user_id),
-                    headers=headers,
-                )
-                return offset, resp
-            except (httpx.RemoteProtocolError, httpx.ReadTimeout, httpx.ConnectError) as exc:
-                wait_time = 2.0 * (2 ** attempt)
-                log.warning(
-                    "Request failed (attempt %d/%d) at offset %d: %s. Retrying in %.1fs...",
-                    attempt + 1, max_retries, offset, exc, wait_time,
-                )
-                if attempt == max_retries - 1:
-                    log.error("Max retries reached at offset %d.", offset)
-                    return offset, None
-                await asyncio.sleep(wait_time)
+        try:
+            return offset, await policy.call("POST", LIST_URL, send, is_failure=_page_failed)
+        except RETRYABLE_ERRORS as exc:
+            log.error("Giving up on offset %d: %s", offset, exc)
+        except CircuitOpenError as exc:
+            log.error("Skipping offset %d: %s", offset, exc)
     return offset, None
 
 
-async def scrape_all(full: bool = False):
+async def calibrate_list_page_size(
+    client: httpx.AsyncClient,
+    headers: dict,
+    user_id: str,
+    store: PageSizeStore,
+    offload: Offloader,
+) -> None:
+    """Probe ImportPermit/List with increasing `length` values and store the best."""
+
+    async def probe(size: int) -> tuple[int, int | None]:
+        request = client.build_request(
+            "POST", LIST_URL, data=build_form_data(0, size, user_id), headers=headers
+        )
+        resp = await _read_page(client, request, offload)
+        if resp.status_code != 200 or resp.body is None:
+            raise RuntimeError(f"status={resp.status_code} json={resp.body is not None}")
+        return len(resp.body.rows), resp.body.records_total
+
+    log.info("Calibrating list page size...")
+    best, probes = await calibrate_page_size(probe)
+    if best is None:
+        log.warning("Page-size calibration found no working size; keeping %d", store.get(LIST_ENDPOINT_KEY) or PAGE_SIZE)
+        return
+    store.set(LIST_ENDPOINT_KEY, best, probes)
+    log.info("Calibrated list page size: %d", best)
+
+
+async def scrape_all(
+    full: bool = False, calibrate: bool = False, *, settings: Settings, offload: Offloader
+):
     RAW_DIR.mkdir(parents=True, exist_ok=True)
     STATE_DIR.mkdir(parents=True, exist_ok=True)
 
+    metrics = RunMetrics("scrape_all")
+
     # Step 1: Get auth token
-    bearer_token, user_id = await get_bearer_token()
+    with metrics.span("login"):
+        bearer_token, user_id = await get_bearer_token()
 
     # Save token for reuse by scrape_products.py
     TOKEN_PATH.write_text(json.dumps({
@@ -267,255 +382,331 @@ async def scrape_all(full: bool = False):
     }))
 
     # Step 2: Init DB
-    conn = init_db(DB_PATH)
+    with metrics.span("db_init"):
+        conn = init_db(DB_PATH)
     run_started = time.strftime("%Y-%m-%dT%H:%M:%S")
     conn.execute(
-        "INSERT INTO scrape_log (started_at, status) VALUES (?, ?)",
-        (run_started, "running"),
+        "INSERT INTO scrape_log (started_at, status, stage) VALUES (?, ?, ?)",
+        (run_started, "running", "permits"),
     )
     conn.commit()
     run_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
 
-    # Step 3: Determine mode
-    existing_count = conn.execute(
-        "SELECT COUNT(*) FROM import_permits WHERE requested_date >= ?", (DATE_CUTOFF,)
-    ).fetchone()[0]
-    max_existing_id = conn.execute(
-        "SELECT COALESCE(MAX(id), 0) FROM import_permits"
-    ).fetchone()[0]
-
-    incremental = existing_count > 0 and not full
-    if incremental:
-        log.info(
-            "Incremental mode: %d records in DB (2023+), max id=%d. "
-            "Will stop when hitting existing records.",
-            existing_count, max_existing_id,
-        )
-    else:
-        log.info(
-            "Full mode: scraping all records from newest until %s cutoff.", DATE_CUTOFF
-        )
-
-    headers = {
-        "Authorization": bearer_token,
-        "Accept": "application/json, text/plain, */*",
-        "Referer": PORTAL_URL,
-    }
-
-    all_records: list[dict] = []
+    all_records: list[tuple] = []
     total_records = None
-    consecutive_errors = 0
-    max_consecutive_errors = 3
+    failed_pages = 0
+    consecutive_rejects = 0
     stop_reason = "unknown"
     new_records = 0
     skipped_old = 0
 
     semaphore = asyncio.Semaphore(CONCURRENCY_PAGES)
-    transport = httpx.AsyncHTTPTransport(retries=3)
-    async with httpx.AsyncClient(timeout=120.0, transport=transport) as client:
-        # -- Fetch first page sequentially to get recordsTotal --
-        _, first_resp = await fetch_page(client, 0, headers, user_id, semaphore)
-
-        if first_resp is None or first_resp.status_code != 200:
-            status = first_resp.status_code if first_resp else "no response"
-            log.error("First page fetch failed (status=%s). Aborting.", status)
-            stop_reason = "first_page_error"
+    telemetry = HttpTelemetry()
+    policy = RetryPolicy(
+        max_attempts=5,
+        base_delay=2.0,
+        budget=RetryBudget(settings.retry_budget_percent / 100),
+        telemetry=telemetry,
+    )
+    list_breaker = policy.breaker("POST", LIST_URL)
+    page_sizes = PageSizeStore(PAGE_SIZE_STATE_PATH)
+    # Permit upserts are group-committed on a writer thread with its own
+    # connection; `conn` stays on this thread for the existence checks.
+    db_writer = SQLiteWriter(
+        DB_PATH,
+        max_queue=settings.db_queue_size,
+        batch_size=settings.db_batch_size,
+        commit_seconds=settings.db_commit_seconds,
+    )
+
+    final_count = None
+    status = "error"
+    message = None
+
+    try:
+        # Step 3: Determine mode
+        existing_count = conn.execute(
+            "SELECT COUNT(*) FROM import_permits WHERE requested_date >= ?", (DATE_CUTOFF,)
+        ).fetchone()[0]
+        max_existing_id = conn.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM import_permits"
+        ).fetchone()[0]
+
+        incremental = existing_count > 0 and not full
+        if incremental:
+            log.info(
+                "Incremental mode: %d records in DB (2023+), max id=%d. "
+                "Will stop when hitting existing records.",
+                existing_count, max_existing_id,
+            )
         else:
-            try:
-                first_body = first_resp.json()
-            except Exception:
-                log.error("Non-JSON response on first page. Aborting.")
-                first_body = None
-                stop_reason = "non_json_response"
-
-            if first_body is not None:
-                total_records = first_body.get("recordsTotal", 0)
-                first_data = first_body.get("data", [])
-                log.info("Total records on server: %d", total_records)
-
-                if not first_data:
-                    stop_reason = "no_more_data"
-                else:
-                    # Process first page
-                    hit_cutoff = False
-                    hit_existing = False
-                    page_new = 0
-                    for rec in first_data:
-                        if is_before_cutoff(rec):
-                            hit_cutoff = True
-                            skipped_old += 1
-                            continue
-                        if incremental and rec.get("id", 0) <= max_existing_id:
-                            exists = conn.execute(
-                                "SELECT 1 FROM import_permits WHERE id = ?", (rec["id"],)
-                            ).fetchone()
-                            if exists:
-                                hit_existing = True
-                                continue
-                        all_records.append(rec)
-                        upsert_record(conn, rec)
-                        page_new += 1
-
-                    new_records += page_new
-                    conn.commit()
-                    log.info("Page: %d new, %d total new (this run). offset=0", page_new, new_records)
-
-                    if hit_cutoff:
-                        stop_reason = "date_cutoff"
-                        log.info("Hit date cutoff (%s). Stopping.", DATE_CUTOFF)
-                    elif hit_existing and page_new == 0:
-                        stop_reason = "all_existing"
-                        log.info("All records in first page already exist. Stopping.")
+            log.info(
+                "Full mode: scraping all records from newest until %s cutoff.", DATE_CUTOFF
+            )
+
+        headers = {
+            "Authorization": bearer_token,
+            "Accept": "application/json, text/plain, */*",
+            "Referer": PORTAL_URL,
+        }
+
+        async with create_async_client(
+            timeout=120.0,
+            concurrency=CONCURRENCY_PAGES,
+            http2=settings.http2,
+            keepalive_expiry=settings.http_keepalive_seconds,
+            telemetry=telemetry,
+            retries=0,
+        ) as client:
+            if calibrate or page_sizes.is_stale(LIST_ENDPOINT_KEY):
+                with metrics.span("calibrate"):
+                    await calibrate_list_page_size(client, headers, user_id, page_sizes, offload)
+            page_size = page_sizes.get(LIST_ENDPOINT_KEY) or PAGE_SIZE
+            metrics.sections["page_size"] = page_size
+            log.info("Using list page size %d", page_size)
+
+            # -- Fetch first page sequentially to get recordsTotal --
+            with metrics.span("fetch"):
+                _, first_resp = await fetch_page(
+                    client, 0, headers, user_id, semaphore, policy, offload, page_size
+                )
+            if first_resp is not None:
+                metrics.add_bytes(first_resp.num_bytes)
+
+            if first_resp is None or first_resp.status_code != 200:
+                http_status = first_resp.status_code if first_resp else "no response"
+                log.error("First page fetch failed (status=%s). Aborting.", http_status)
+                stop_reason = "first_page_error"
+            else:
+                first_body = first_resp.body
+                if first_body is None:
+                    log.error("Non-JSON response on first page. Aborting.")
+                    stop_reason = "non_json_response"
+
+                if first_body is not None:
+                    total_records = first_body.records_total or 0
+                    first_data = first_body.rows
+                    log.info("Total records on server: %d", total_records)
+
+                    if not first_data:
+                        stop_reason = "no_more_data"
                     else:
-                        # -- Fetch remaining pages concurrently in batches --
-                        remaining_offsets = list(range(PAGE_SIZE, total_records, PAGE_SIZE))
-                        log.info(
-                            "Fetching %d remaining pages in batches of %d...",
-                            len(remaining_offsets), CONCURRENCY_PAGES,
-                        )
-
-                        for batch_start in range(0, len(remaining_offsets), CONCURRENCY_PAGES):
-                            batch_offsets = remaining_offsets[batch_start:batch_start + CONCURRENCY_PAGES]
-                            tasks = [
-                                fetch_page(client, off, headers, user_id, semaphore)
-                                for off in batch_offsets
-                            ]
-                            results = await asyncio.gather(*tasks)
-
-                            # Sort by offset to process in order
-                            results.sort(key=lambda r: r[0])
-
-                            batch_stop = False
-                            for off, resp in results:
-                                if resp is None or resp.status_code != 200:
-                                    status = resp.status_code if resp else "no response"
-                                    log.warning("API error (status=%s) at offset %d", status, off)
-                                    consecutive_errors += 1
-                                    if consecutive_errors >= max_consecutive_errors:
-                                        log.error("Too many consecutive errors. Stopping.")
-                                        stop_reason = "consecutive_errors"
-                                        batch_stop = True
-                                        break
+                        # Process first page
+                        with metrics.span("db_write"):
+                            hit_cutoff = False
+                            hit_existing = False
+                            page_rows = []
+                            for row in first_data:
+                                if is_before_cutoff(row[ROW_REQUESTED_DATE]):
+                                    hit_cutoff = True
+                                    skipped_old += 1
                                     continue
-
-                                try:
-                                    body = resp.json()
-                                except Exception:
-                                    log.warning("Non-JSON response at offset %d", off)
-                                    consecutive_errors += 1
-                                    if consecutive_errors >= max_consecutive_errors:
-                                        stop_reason = "non_json_response"
+                                if incremental and (row[ROW_ID] or 0) <= max_existing_id:
+                                    exists = conn.execute(
+                                        "SELECT 1 FROM import_permits WHERE id = ?", (row[ROW_ID],)
+                                    ).fetchone()
+                                    if exists:
+                                        hit_existing = True
+                                        continue
+                                page_rows.append(row)
+                            all_records.extend(page_rows)
+                            if page_rows:
+                                await db_writer.asubmit(upsert_rows, page_rows)
+                        page_new = len(page_rows)
+                        new_records += page_new
+                        log.info("Page: %d new, %d total new (this run). offset=0", page_new, new_records)
+
+                        if hit_cutoff:
+                            stop_reason = "date_cutoff"
+                            log.info("Hit date cutoff (%s). Stopping.", DATE_CUTOFF)
+                        elif hit_existing and page_new == 0:
+                            stop_reason = "all_existing"
+                            log.info("All records in first page already exist. Stopping.")
+                        else:
+                            # -- Fetch remaining pages concurrently in batches --
+                            remaining_offsets = list(range(page_size, total_records, page_size))
+                            log.info(
+                                "Fetching %d remaining pages in batches of %d...",
+                                len(remaining_offsets), CONCURRENCY_PAGES,
+                            )
+
+                            for batch_start in range(0, len(remaining_offsets), CONCURRENCY_PAGES):
+                                batch_offsets = remaining_offsets[batch_start:batch_start + CONCURRENCY_PAGES]
+                                tasks = [
+                                    fetch_page(client, off, headers, user_id, semaphore, policy, offload, page_size)
+                                    for off in batch_offsets
+                                ]
+                                with metrics.span("fetch"):
+                                    results = await asyncio.gather(*tasks)
+                                for _, resp in results:
+                                    if resp is not None:
+                                        metrics.add_bytes(resp.num_bytes)
+
+                                # Sort by offset to process in order
+                                results.sort(key=lambda r: r[0])
+
+                                batch_stop = False
+                                for off, resp in results:
+                                    if resp is not None and resp.status_code in (401, 403):
+                                        log.error("Auth rejected (status=%d) at offset %d. Stopping.", resp.status_code, off)
+                                        stop_reason = "auth_error"
                                         batch_stop = True
                                         break
-                                    continue
+                                    if resp is None or resp.status_code != 200 or resp.body is None:
+                                        http_status = resp.status_code if resp else "no response"
+                                        log.warning("API error (status=%s) at offset %d", http_status, off)
+                                        failed_pages += 1
+                                        if resp is not None and not _page_failed(resp):
+                                            consecutive_rejects += 1
+                                            if consecutive_rejects >= MAX_CONSECUTIVE_REJECTS:
+                                                log.error("Too many consecutive rejected pages. Stopping.")
+                                                stop_reason = "consecutive_errors"
+                                                batch_stop = True
+                                                break
+                                        if list_breaker.gave_up:
+                                            log.error("List endpoint is down. Stopping.")
+                                            stop_reason = "circuit_open"
+                                            batch_stop = True
+                                            break
+                                        continue
 
-                                consecutive_errors = 0
-                                page_data = body.get("data", [])
+                                    consecutive_rejects = 0
+                                    page_data = resp.body.rows
 
-                                if not page_data:
-                                    stop_reason = "no_more_data"
-                                    log.info("No more records at offset %d", off)
-                                    batch_stop = True
-                                    break
+                                    if not page_data:
+                                        stop_reason = "no_more_data"
+                                        log.info("No more records at offset %d", off)
+                                        batch_stop = True
+                                        break
 
-                                hit_cutoff = False
-                                hit_existing = False
-                                page_new = 0
+                                    hit_cutoff = False
+                                    hit_existing = False
+                                    page_rows = []
+
+                                    with metrics.span("db_write"):
+                                        for row in page_data:
+                                            if is_before_cutoff(row[ROW_REQUESTED_DATE]):
+                                                hit_cutoff = True
+                                                skipped_old += 1
+                                                continue
+                                            if incremental and (row[ROW_ID] or 0) <= max_existing_id:
+                                                exists = conn.execute(
+                                                    "SELECT 1 FROM import_permits WHERE id = ?", (row[ROW_ID],)
+                                                ).fetchone()
+                                                if exists:
+                                                    hit_existing = True
+                                                    continue
+                                            page_rows.append(row)
+                                        all_records.extend(page_rows)
+                                        if page_rows:
+                                            await db_writer.asubmit(upsert_rows, page_rows)
+                                    page_new = len(page_rows)
+                                    new_records += page_new
+                                    log.info(
+                                        "Page: %d new, %d total new (this run). offset=%d",
+                                        page_new, new_records, off,
+                                    )
+
+                                    if hit_cutoff:
+                                        stop_reason = "date_cutoff"
+                                        log.info("Hit date cutoff (%s). Stopping.", DATE_CUTOFF)
+                                        batch_stop = True
+                                        break
+                                    if hit_existing and page_new == 0:
+                                        stop_reason = "all_existing"
+                                        log.info("All records in this page already exist. Stopping.")
+                                        batch_stop = True
+                                        break
 
-                                for rec in page_data:
-                                    if is_before_cutoff(rec):
-                                        hit_cutoff = True
-                                        skipped_old += 1
-                                        continue
-                                    if incremental and rec.get("id", 0) <= max_existing_id:
-                                        exists = conn.execute(
-                                            "SELECT 1 FROM import_permits WHERE id = ?", (rec["id"],)
-                                        ).fetchone()
-                                        if exists:
-                                            hit_existing = True
-                                            continue
-                                    all_records.append(rec)
-                                    upsert_record(conn, rec)
-                                    page_new += 1
-
-                                new_records += page_new
-                                conn.commit()
-                                log.info(
-                                    "Page: %d new, %d total new (this run). offset=%d",
-                                    page_new, new_records, off,
-                                )
-
-                                if hit_cutoff:
-                                    stop_reason = "date_cutoff"
-                                    log.info("Hit date cutoff (%s). Stopping.", DATE_CUTOFF)
-                                    batch_stop = True
-                                    break
-                                if hit_existing and page_new == 0:
-                                    stop_reason = "all_existing"
-                                    log.info("All records in this page already exist. Stopping.")
-                                    batch_stop = True
+                                if batch_stop:
                                     break
 
-                            if batch_stop:
-                                break
-
-                            await asyncio.sleep(0.5)
-
-                        if stop_reason == "unknown":
-                            stop_reason = "end_of_data"
-                            log.info("Fetched all pages. Total records: %d", total_records)
-
-    # Step 4: Save raw JSON for this run
-    if all_records:
-        raw_path = RAW_DIR / "all_imports.json"
-        raw_path.write_text(json.dumps(all_records, indent=2, default=str))
-        log.info("Saved %d raw records to %s", len(all_records), raw_path)
-
-    # Step 5: Export 2023+ records from DB to CSV
-    final_count = conn.execute(
-        "SELECT COUNT(*) FROM import_permits WHERE requested_date >= ?", (DATE_CUTOFF,)
-    ).fetchone()[0]
-    log.info("Exporting %d records (2023+) from DB to CSV...", final_count)
-    csv_fields = [
-        "id", "import_permit_number", "application_id", "agent_name",
-        "supplier_name", "port_of_entry", "payment_mode", "shipping_method",
-        "currency", "amount", "freight_cost", "status", "status_code",
-        "submodule_type_code", "performa_invoice_number",
-        "requested_date", "expiry_date", "submission_date", "decision_date",
-        "delivery", "created_by_username", "assigned_user", "is_accessory", "remark",
-    ]
-    rows = conn.execute(
-        f"SELECT {', '.join(csv_fields)} FROM import_permits "
-        f"WHERE requested_date >= ? ORDER BY id DESC",
-        (DATE_CUTOFF,),
-    ).fetchall()
-    with open(CSV_PATH, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(csv_fields)
-        writer.writerows(rows)
-    log.info("Saved CSV with %d records to %s", len(rows), CSV_PATH)
-
-    # Step 6: Update scrape log
-    mode = "incremental" if incremental else "full"
-    conn.execute(
-        """
-        UPDATE scrape_log
-        SET finished_at = datetime('now'),
-            total_records = ?,
-            records_fetched = ?,
-            status = 'success',
-            message = ?
-        WHERE id = ?
-        """,
-        (
-            final_count,
-            new_records,
-            f"mode={mode} new={new_records} stop={stop_reason} skipped_old={skipped_old}",
-            run_id,
-        ),
-    )
-    conn.commit()
-    conn.close()
+                                await asyncio.sleep(0.5)
+
+                            if stop_reason == "unknown":
+                                stop_reason = "end_of_data"
+                                log.info("Fetched all pages. Total records: %d", total_records)
+
+        with metrics.span("db_write"):
+            await db_writer.aflush()
+
+        # Step 4: Save raw JSON for this run
+        if all_records:
+            raw_path = RAW_DIR / "all_imports.json"
+            with metrics.span("raw_write"):
+                await asyncio.to_thread(write_raw_rows, raw_path, [row[ROW_RAW_JSON] for row in all_records])
+            log.info("Saved %d raw records to %s", len(all_records), raw_path)
+
+        # Step 5: Export 2023+ records from DB to CSV
+        final_count = conn.execute(
+            "SELECT COUNT(*) FROM import_permits WHERE requested_date >= ?", (DATE_CUTOFF,)
+        ).fetchone()[0]
+        log.info("Exporting %d records (2023+) from DB to CSV...", final_count)
+        csv_fields = [
+            "id", "import_permit_number", "application_id", "agent_name",
+            "supplier_name", "port_of_entry", "payment_mode", "shipping_method",
+            "currency", "amount", "freight_cost", "status", "status_code",
+            "submodule_type_code", "performa_invoice_number",
+            "requested_date", "expiry_date", "submission_date", "decision_date",
+            "delivery", "created_by_username", "assigned_user", "is_accessory", "remark",
+        ]
+        with metrics.span("csv_export"):
+            rows = conn.execute(
+                f"SELECT {', '.join(csv_fields)} FROM import_permits "
+                f"WHERE requested_date >= ? ORDER BY id DESC",
+                (DATE_CUTOFF,),
+            ).fetchall()
+            with open(CSV_PATH, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(csv_fields)
+                writer.writerows(rows)
+        log.info("Saved CSV with %d records to %s", len(rows), CSV_PATH)
+
+        mode = "incremental" if incremental else "full"
+        status = "error" if stop_reason in FAILED_STOPS else "success"
+        message = f"mode={mode} new={new_records} stop={stop_reason} skipped_old={skipped_old}"
+    except Exception as exc:
+        message = str(exc)
+        raise
+    finally:
+        # Step 6: Update scrape log, however the run ended
+        db_writer.close()
+        metrics.incr("records_fetched", new_records)
+        metrics.incr("failed_pages", failed_pages)
+        metrics.sections["http"] = telemetry.summary()
+        metrics.sections["retries"] = policy.summary()
+        metrics.sections["offload"] = offload.summary()
+        metrics.sections["db_writer"] = db_writer.summary()
+        report = metrics.finish(status)
+        conn.execute(
+            """
+            UPDATE scrape_log
+            SET finished_at = datetime('now'),
+                total_records = ?,
+                records_fetched = ?,
+                status = ?,
+                message = ?,
+                metrics_json = ?
+            WHERE id = ?
+            """,
+            (
+                final_count,
+                new_records,
+                status,
+                message,
+                json.dumps(report),
+                run_id,
+            ),
+        )
+        conn.commit()
+        conn.close()
+        try:
+            metrics.write_report(REPORTS_DIR)
+        except OSError as exc:
+            # Never let a failed report replace the run's own exception.
+            log.error("Could not write the run report: %s", exc)
+        metrics.log_summary()
+        telemetry.log_summary()
 
     log.info(
         "Done! mode=%s, new_records=%d, stop_reason=%s, total_2023+=%d",
@@ -527,5 +718,10 @@ async def scrape_all(full: bool = False):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Scrape EFDA import permits (2023+)")
     parser.add_argument("--full", action="store_true", help="Force full re-scrape (still 2023+ only)")
+    parser.add_argument("--calibrate", action="store_true", help="Re-probe the best list page size before scraping")
     args = parser.parse_args()
-    asyncio.run(scrape_all(full=args.full))
+    settings = load_settings(str(BASE_DIR / ".env"))
+    # The offloader outlives the event loop, so its pool is shut down
+    # however the run ends.
+    with Offloader(mode=settings.offload_mode, workers=settings.cpu_workers) as offload:
+        asyncio.run(scrape_all(full=args.full, calibrate=args.calibrate, settings=settings, offload=offload))
@@ -5,9 +5,13 @@ For each import permit, calls GET /api/ImportPermit/{id} and extracts
 the `importPermitDetails` array containing product line items with
 product info, manufacturer, quantity, price, etc.
 
+Which permits are fetched is decided by refresh_schedule.RefreshScheduler:
+permits never fetched come first (newest first), then permits whose
+details are due for a refresh, up to --budget refreshes per run.
+
 Usage:
     cd /Users/t/Developer/personal/efda-scraper
-    .venv/bin/python scripts/scrape_products.py [--limit N]
+    .venv/bin/python scripts/scrape_products.py [--limit N] [--budget N]
 """
 
 from __future__ import annotations
@@ -20,23 +24,32 @@ import logging
 import os
 import sqlite3
 import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
 import httpx
 from playwright.async_api import async_playwright
 
+from efda_scraper.changelog import install_changelog
+from efda_scraper.config import Settings, load_settings
+from efda_scraper.http_client import create_async_client
+from efda_scraper.http_telemetry import HttpTelemetry
+from efda_scraper.jsonstream import DECODE_ERRORS, loads, read_array
+from efda_scraper.metrics import RunMetrics, init_scrape_log
+from efda_scraper.offload import Offloader
+from efda_scraper.resilience import RETRYABLE_ERRORS, CircuitOpenError, RetryBudget, RetryPolicy, is_server_error
+from efda_scraper.response_cache import ResponseCache, cache_key, open_response_cache
+from efda_scraper.sqlite_writer import SQLiteWriter, WriteListener, settled_results
+
 try:
-    from scripts.normalize import (
-        normalize_dosage_form,
-        normalize_dosage_strength,
-        normalize_generic_name,
-    )
+    from scripts.normalize import NormalizationCache
+    from scripts.refresh_schedule import PlannedFetch, RefreshScheduler, details_hash
 except ImportError:
-    from normalize import (  # type: ignore[no-redef]
-        normalize_dosage_form,
-        normalize_dosage_strength,
-        normalize_generic_name,
-    )
+    from normalize import NormalizationCache  # type: ignore[no-redef]
+    from refresh_schedule import PlannedFetch, RefreshScheduler, details_hash  # type: ignore[no-redef]
 
 logging.basicConfig(
     level=logging.INFO,
@@ -52,6 +65,8 @@ CSV_PATH = DATA_DIR / "import_products.csv"
 API_BASE = "https://api.eris.efda.gov.et"
 PORTAL_URL = "https://portal.eris.efda.gov.et/"
 TOKEN_PATH = DATA_DIR / "state" / "token.json"
+REPORTS_DIR = DATA_DIR / "reports"
+HTTP_CACHE_PATH = DATA_DIR / "cache" / "http_cache.sqlite3"
 TOKEN_MAX_AGE_SEC = 20 * 60  # 20 minutes
 
 
@@ -160,12 +175,125 @@ def init_products_table(conn: sqlite3.Connection):
     for col in [
         "full_item_name TEXT", "dosage_form TEXT", "dosage_strength TEXT", "dosage_unit TEXT",
         "norm_generic_name TEXT", "norm_dosage_form TEXT", "norm_dosage_strength TEXT",
+        "product_group_key TEXT", "product_group_id INTEGER",
     ]:
         try:
             conn.execute(f"ALTER TABLE import_permit_products ADD COLUMN {col}")
         except sqlite3.OperationalError:
             pass  # column already exists
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS product_groups (
+            id INTEGER PRIMARY KEY,
+            group_key TEXT NOT NULL UNIQUE,
+            generic_name TEXT,
+            dosage_form TEXT,
+            dosage_strength TEXT,
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_products_group_id
+        ON import_permit_products(product_group_id)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_products_stored_group_key
+        ON import_permit_products(product_group_key)
+        """
+    )
     conn.commit()
+    install_changelog(conn)
+
+
+# SQLite's LOWER()/TRIM() only touch ASCII letters and spaces; mirror that so
+# the stored key equals the expression the dashboard used to compute.
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def product_group_key(
+    generic_name: str | None,
+    dosage_form: str | None,
+    dosage_strength: str | None,
+    norm_generic_name: str | None,
+    norm_dosage_form: str | None,
+    norm_dosage_strength: str | None,
+) -> str | None:
+    """Build the generic + dosage form + strength grouping key.
+
+    Matches the dashboard's ``COALESCE(norm_*, raw)`` key, including its
+    NULL result when the product has no generic name.
+    """
+    generic = norm_generic_name if norm_generic_name is not None else generic_name
+    if generic is None:
+        return None
+    parts = [
+        generic,
+        norm_dosage_form if norm_dosage_form is not None else (dosage_form or ""),
+        norm_dosage_strength if norm_dosage_strength is not None else (dosage_strength or ""),
+    ]
+    return "||".join(part.strip(" ").translate(_ASCII_LOWER) for part in parts)
+
+
+class ProductGroupIndex(WriteListener):
+    """Assigns stable integer ids to product grouping keys via `product_groups`.
+
+    Inside a writer job, a new id is staged until the job's group commits
+    and forgotten if the job or the commit is rolled back, so no later row
+    gets the id of a `product_groups` row that was never written.
+    """
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self._conn = conn
+        self._ids: dict[str, int] = {
+            key: group_id
+            for group_id, key in conn.execute("SELECT id, group_key FROM product_groups")
+        }
+        self._staged: dict[str, int] = {}
+        self._job_keys: list[str] | None = None
+
+    def get_id(
+        self,
+        key: str | None,
+        generic_name: str | None,
+        dosage_form: str | None,
+        dosage_strength: str | None,
+    ) -> int | None:
+        if key is None:
+            return None
+        group_id = self._ids.get(key)
+        if group_id is None:
+            group_id = self._staged.get(key)
+        if group_id is None:
+            cursor = self._conn.execute(
+                "INSERT INTO product_groups (group_key, generic_name, dosage_form, dosage_strength) "
+                "VALUES (?, ?, ?, ?)",
+                (key, generic_name, dosage_form, dosage_strength),
+            )
+            group_id = int(cursor.lastrowid)
+            if self._job_keys is None:
+                self._ids[key] = group_id
+            else:
+                self._staged[key] = group_id
+                self._job_keys.append(key)
+        return group_id
+
+    def job_started(self) -> None:
+        self._job_keys = []
+
+    def job_finished(self, ok: bool) -> None:
+        if not ok:
+            for key in self._job_keys or ():
+                self._staged.pop(key, None)
+        self._job_keys = None
+
+    def group_finished(self, ok: bool) -> None:
+        if ok:
+            self._ids.update(self._staged)
+        self._staged.clear()
 
 
 def backfill_from_raw_json(conn: sqlite3.Connection):
@@ -199,8 +327,36 @@ def backfill_from_raw_json(conn: sqlite3.Connection):
     log.info("Backfill complete.")
 
 
-def backfill_normalized_columns(conn: sqlite3.Connection):
-    """Backfill norm_generic_name / norm_dosage_form / norm_dosage_strength."""
+def backfill_normalized_columns(conn: sqlite3.Connection, cache: NormalizationCache):
+    """Backfill norm_generic_name / norm_dosage_form / norm_dosage_strength.
+
+    Also re-normalizes rows whose raw value was cached under an older
+    normalizer version, so a version bump only touches the affected rows.
+    The new values go into a temp mapping table and are applied with one
+    UPDATE per field, a single pass over the products table.
+    """
+    cache.seed("import_permit_products")
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS norm_remap (raw TEXT PRIMARY KEY, normalized TEXT NOT NULL)"
+    )
+    for field in ("generic_name", "dosage_form", "dosage_strength"):
+        stale = cache.stale_values(field)
+        if not stale:
+            continue
+        log.info("Re-normalizing %d stale %s values...", len(stale), field)
+        conn.execute("DELETE FROM norm_remap")
+        conn.executemany(
+            "INSERT INTO norm_remap (raw, normalized) VALUES (?, ?)",
+            ((raw, cache.normalize(field, raw)) for raw in stale),
+        )
+        conn.execute(
+            f"""UPDATE import_permit_products
+            SET norm_{field} = (SELECT normalized FROM norm_remap WHERE raw = {field}),
+                product_group_key = NULL, product_group_id = NULL
+            WHERE {field} IN (SELECT raw FROM norm_remap)"""
+        )
+        conn.commit()
+
     rows = conn.execute(
         "SELECT id, generic_name, dosage_form, dosage_strength "
         "FROM import_permit_products "
@@ -215,9 +371,9 @@ def backfill_normalized_columns(conn: sqlite3.Connection):
             SET norm_generic_name = ?, norm_dosage_form = ?, norm_dosage_strength = ?
             WHERE id = ?""",
             (
-                normalize_generic_name(generic_name) if generic_name else None,
-                normalize_dosage_form(dosage_form) if dosage_form else None,
-                normalize_dosage_strength(dosage_strength) if dosage_strength else None,
+                cache.generic_name(generic_name),
+                cache.dosage_form(dosage_form),
+                cache.dosage_strength(dosage_strength),
                 row_id,
             ),
         )
@@ -225,15 +381,115 @@ def backfill_normalized_columns(conn: sqlite3.Connection):
     log.info("Normalized column backfill complete.")
 
 
-def upsert_product(conn: sqlite3.Connection, item: dict, import_permit_number: str):
-    """Insert or update a product line item."""
+def backfill_product_groups(conn: sqlite3.Connection, groups: ProductGroupIndex):
+    """Assign product_group_key / product_group_id to rows that lack them.
+
+    Touches scraped_at so the incremental Turso push ships the new keys.
+    """
+    rows = conn.execute(
+        "SELECT id, generic_name, dosage_form, dosage_strength, "
+        "norm_generic_name, norm_dosage_form, norm_dosage_strength "
+        "FROM import_permit_products "
+        "WHERE product_group_id IS NULL AND generic_name IS NOT NULL"
+    ).fetchall()
+    if not rows:
+        return
+    log.info("Backfilling product groups for %d products...", len(rows))
+    for row_id, *values in rows:
+        key = product_group_key(*values)
+        conn.execute(
+            "UPDATE import_permit_products SET product_group_key = ?, product_group_id = ?, "
+            "scraped_at = datetime('now') WHERE id = ?",
+            (key, groups.get_id(key, *values[3:]), row_id),
+        )
+    conn.commit()
+    log.info("Product group backfill complete.")
+
+
+def product_row(item: dict) -> tuple:
+    """Column values of a product line item as returned by the API, raw_json last.
+
+    Pure (no DB, no normalization cache), so it can run in the offload
+    executor.  Order: id, import_permit_id, product_id .. dosage_unit as in
+    the upsert below, minus import_permit_number and the derived columns.
+    """
     product = item.get("product") or {}
     mfg_addr = item.get("manufacturerAddress") or {}
     mfg = mfg_addr.get("manufacturer") or {}
+    return (
+        item.get("id"),
+        item.get("importPermitID"),
+        item.get("productID"),
+        product.get("name"),
+        product.get("genericName"),
+        product.get("brandName"),
+        product.get("description"),
+        product.get("indication"),
+        product.get("hsCode"),
+        product.get("registrationDate"),
+        product.get("expiryDate"),
+        product.get("productStatus"),
+        mfg.get("name"),
+        mfg.get("site"),
+        mfg.get("countryID"),
+        item.get("quantity"),
+        item.get("unitPrice"),
+        item.get("discount"),
+        item.get("amount"),
+        item.get("isAccessory"),
+        product.get("fullItemName"),
+        product.get("dosageForm") or product.get("dosageFormStr"),
+        product.get("dosageStrength") or product.get("dosageStrengthStr"),
+        product.get("dosageUnit") or product.get("dosageUnitName"),
+        json.dumps(item, default=str),
+    )
 
-    generic_name = product.get("genericName")
-    dosage_form = product.get("dosageForm") or product.get("dosageFormStr")
-    dosage_strength = product.get("dosageStrength") or product.get("dosageStrengthStr")
+
+@dataclass(slots=True)
+class PreparedDetails:
+    rows: list[tuple]  # product_row() tuples
+    details_hash: str
+
+
+def prepare_details(details: list) -> PreparedDetails:
+    """Build the product rows and details hash of a decoded `importPermitDetails` list.
+
+    Runs in the offload executor, so it must stay a picklable module-level
+    function.
+    """
+    return PreparedDetails([product_row(item) for item in details], details_hash(details))
+
+
+def prepare_cached_details(raw: bytes) -> PreparedDetails | None:
+    """Decode a whole cached ImportPermit/{id} body into product rows; None if it is not JSON."""
+    try:
+        body = loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(body, dict):
+        return None
+    return prepare_details(body.get("importPermitDetails") or [])
+
+
+def upsert_product(
+    conn: sqlite3.Connection,
+    row: tuple,
+    import_permit_number: str,
+    cache: NormalizationCache,
+    groups: ProductGroupIndex,
+):
+    """Insert or update a product line item from a `product_row` tuple."""
+    generic_name = row[4]
+    dosage_form = row[21]
+    dosage_strength = row[22]
+    norm_generic_name = cache.generic_name(generic_name)
+    norm_dosage_form = cache.dosage_form(dosage_form)
+    norm_dosage_strength = cache.dosage_strength(dosage_strength)
+    group_key = product_group_key(
+        generic_name, dosage_form, dosage_strength,
+        norm_generic_name, norm_dosage_form, norm_dosage_strength,
+    )
+    group_id = groups.get_id(group_key, norm_generic_name, norm_dosage_form, norm_dosage_strength)
 
     conn.execute(
         """
@@ -246,9 +502,11 @@ def upsert_product(conn: sqlite3.Connection, item: dict, import_permit_number: s
             quantity, unit_price, discount, amount,
             is_accessory, full_item_name, dosage_form, dosage_strength, dosage_unit,
             norm_generic_name, norm_dosage_form, norm_dosage_strength,
+            product_group_key, product_group_id,
             raw_json, scraped_at
         ) VALUES (
-            ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now')
+            ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+            datetime('now')
         )
         ON CONFLICT(id) DO UPDATE SET
             product_name = excluded.product_name,
@@ -264,44 +522,31 @@ def upsert_product(conn: sqlite3.Connection, item: dict, import_permit_number: s
             norm_generic_name = excluded.norm_generic_name,
             norm_dosage_form = excluded.norm_dosage_form,
             norm_dosage_strength = excluded.norm_dosage_strength,
+            product_group_key = excluded.product_group_key,
+            product_group_id = excluded.product_group_id,
             raw_json = excluded.raw_json,
             scraped_at = excluded.scraped_at
         """,
         (
-            item.get("id"),
-            item.get("importPermitID"),
+            row[0],
+            row[1],
             import_permit_number,
-            item.get("productID"),
-            product.get("name"),
-            generic_name,
-            product.get("brandName"),
-            product.get("description"),
-            product.get("indication"),
-            product.get("hsCode"),
-            product.get("registrationDate"),
-            product.get("expiryDate"),
-            product.get("productStatus"),
-            mfg.get("name"),
-            mfg.get("site"),
-            mfg.get("countryID"),
-            item.get("quantity"),
-            item.get("unitPrice"),
-            item.get("discount"),
-            item.get("amount"),
-            item.get("isAccessory"),
-            product.get("fullItemName"),
-            dosage_form,
-            dosage_strength,
-            product.get("dosageUnit") or product.get("dosageUnitName"),
-            normalize_generic_name(generic_name) if generic_name else None,
-            normalize_dosage_form(dosage_form) if dosage_form else None,
-            normalize_dosage_strength(dosage_strength) if dosage_strength else None,
-            json.dumps(item, default=str),
+            *row[2:24],
+            norm_generic_name,
+            norm_dosage_form,
+            norm_dosage_strength,
+            group_key,
+            group_id,
+            row[24],
         ),
     )
 
 
 CONCURRENCY_PRODUCTS = 10
+DEFAULT_REQUEST_BUDGET = 2000  # refresh requests per run; 0 means no limit
+# Failed permit fetches in a row (any status, 403 and network errors
+# included) that stop the run, on top of the breaker's own 5xx/429 limit.
+MAX_CONSECUTIVE_ERRORS = 5
 
 
 async def fetch_import_products(
@@ -310,180 +555,409 @@ async def fetch_import_products(
     import_number: str,
     headers: dict,
     semaphore: asyncio.Semaphore,
-) -> tuple[int, str, list | None, int]:
-    """Fetch product details for a single import. Returns (import_id, import_number, details_or_None, status_code)."""
-    async with semaphore:
-        for attempt in range(3):
-            try:
-                resp = await client.get(
-                    f"{API_BASE}/api/ImportPermit/{import_id}",
-                    headers=headers,
-                )
-                break
-            except (httpx.RemoteProtocolError, httpx.ReadTimeout, httpx.ConnectError) as exc:
-                log.warning("Request failed for %d (attempt %d): %s", import_id, attempt + 1, exc)
-                if attempt == 2:
-                    return import_id, import_number, None, 0
-                await asyncio.sleep(2 * (attempt + 1))
-
-        if resp.status_code != 200:
-            return import_id, import_number, None, resp.status_code
+    policy: RetryPolicy,
+    metrics: RunMetrics | None = None,
+    cache: ResponseCache | None = None,
+    refresh: bool = False,
+    offload: Offloader | None = None,
+) -> tuple[int, str, PreparedDetails | None, int]:
+    """Fetch product details for a single import. Returns (import_id, import_number, details_or_None, status_code).
+
+    `policy` is the run's shared retry policy, so every permit fetch feeds
+    the same detail-endpoint breaker.  The details array is decoded as the
+    body streams in; building its rows (and decoding cached bodies) runs on
+    `offload` when given.
+
+    Scheduled refreshes (`refresh=True`) always ask the server, revalidating
+    the cached copy when it carries validators.
+    """
+    url = f"{API_BASE}/api/ImportPermit/{import_id}"
+    async def prepare(fn: Callable[[Any], PreparedDetails | None], value: Any) -> PreparedDetails | None:
+        if offload is None:
+            return fn(value)
+        return await offload.run(fn, value)
+
+    key = cache_key("GET", url)
+    entry = cache.get(key) if cache is not None else None
+    if cache is not None and entry is not None and not refresh and cache.is_fresh(entry):
+        details = await prepare(prepare_cached_details, entry.body)
+        if details is not None:
+            return import_id, import_number, details, 200
+        # An unreadable cached body is fetched again in full, not revalidated
+        # (a 304 would only hand it back).
+        entry = None
+
+    request_headers = {**headers, **entry.conditional_headers()} if entry is not None else headers
+
+    async def send() -> tuple[PreparedDetails | None, int, int]:
+        async with client.stream("GET", url, headers=request_headers) as resp:
+            status_code = resp.status_code
+            details = None
+            if status_code == 304 and cache is not None and entry is not None:
+                cache.revalidated(entry)
+                details = await prepare(prepare_cached_details, entry.body)
+                status_code = 200
+            elif status_code == 200:
+                # Stream the body so the details array is decoded as it
+                # arrives; only building the rows goes to the offloader.
+                body: list[bytes] = []
+                try:
+                    _, items = await read_array(resp, "importPermitDetails", sink=body)
+                except DECODE_ERRORS:
+                    details = None
+                else:
+                    details = await prepare(prepare_details, items)
+                if cache is not None and details is not None:
+                    cache.put(
+                        key,
+                        url,
+                        b"".join(body),
+                        etag=resp.headers.get("etag"),
+                        last_modified=resp.headers.get("last-modified"),
+                    )
+            return details, status_code, resp.num_bytes_downloaded
 
+    async with semaphore:
         try:
-            body = resp.json()
-        except Exception:
-            return import_id, import_number, None, resp.status_code
-
-        details = body.get("importPermitDetails", [])
-        return import_id, import_number, details, resp.status_code
+            details, status_code, num_bytes = await policy.call(
+                "GET", url, send, is_failure=lambda result: is_server_error(result[1])
+            )
+        except (*RETRYABLE_ERRORS, CircuitOpenError) as exc:
+            log.warning("Request failed for %d: %s", import_id, exc)
+            return import_id, import_number, None, 0
 
+        if metrics is not None:
+            metrics.add_bytes(num_bytes)
+        return import_id, import_number, details, status_code
 
-async def scrape_products(limit: int | None = None):
-    # Step 1: Get auth token
-    bearer_token = await get_bearer_token()
 
-    # Step 2: Init DB
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.execute("PRAGMA journal_mode=WAL")
-    init_products_table(conn)
-    backfill_from_raw_json(conn)
-    backfill_normalized_columns(conn)
-
-    # Step 3: Get import IDs to process
-    # Skip imports we've already scraped products for
-    already_scraped = {
-        row[0]
-        for row in conn.execute(
-            "SELECT DISTINCT import_permit_id FROM import_permit_products"
-        ).fetchall()
-    }
-
-    all_imports = conn.execute(
-        "SELECT id, import_permit_number FROM import_permits "
-        "WHERE requested_date >= '2023-01-01' ORDER BY id DESC"
-    ).fetchall()
+def replace_products(
+    conn: sqlite3.Connection,
+    import_id: int,
+    rows: list[tuple],
+    import_permit_number: str,
+    cache: NormalizationCache,
+    groups: ProductGroupIndex,
+):
+    """Upsert a refreshed permit's line items and drop the ones it no longer lists."""
+    keep = [row[0] for row in rows if row[0] is not None]
+    placeholders = ", ".join("?" * len(keep))
+    conn.execute(
+        "DELETE FROM import_permit_products WHERE import_permit_id = ?"
+        + (f" AND id NOT IN ({placeholders})" if keep else ""),
+        (import_id, *keep),
+    )
+    for row in rows:
+        upsert_product(conn, row, import_permit_number, cache, groups)
 
-    to_process = [(pid, pnum) for pid, pnum in all_imports if pid not in already_scraped]
 
-    if limit:
-        to_process = to_process[:limit]
+def store_details(
+    conn: sqlite3.Connection,
+    scheduler: RefreshScheduler,
+    import_id: int,
+    import_number: str,
+    details: PreparedDetails,
+    is_refresh: bool,
+    cache: NormalizationCache,
+    groups: ProductGroupIndex,
+) -> int:
+    """Record a fetch with the scheduler and write its line items. Returns the rows written."""
+    changed = scheduler.record(import_id, details.details_hash)
+    if not is_refresh:
+        for row in details.rows:
+            upsert_product(conn, row, import_number, cache, groups)
+    elif changed:
+        replace_products(conn, import_id, details.rows, import_number, cache, groups)
+    else:
+        return 0
+    return len(details.rows)
+
+
+def store_failure(conn: sqlite3.Connection, scheduler: RefreshScheduler, import_id: int) -> int:
+    """Back off a permit whose fetch failed so it does not stay the most overdue. Returns 0 rows."""
+    scheduler.record_failure(import_id)
+    return 0
+
+
+async def scrape_products(
+    limit: int | None = None,
+    budget: int | None = DEFAULT_REQUEST_BUDGET,
+    *,
+    settings: Settings,
+    offload: Offloader,
+):
+    metrics = RunMetrics("scrape_products")
 
-    log.info(
-        "Will fetch products for %d imports (%d already done, %d total)",
-        len(to_process),
-        len(already_scraped),
-        len(all_imports),
-    )
+    # Step 1: Get auth token
+    with metrics.span("login"):
+        bearer_token = await get_bearer_token()
 
-    # Step 4: Fetch details concurrently in batches
-    headers = {
-        "Authorization": bearer_token,
-        "Accept": "application/json, text/plain, */*",
-        "Referer": PORTAL_URL,
-    }
+    # Step 2: Init DB
+    with metrics.span("db_init"):
+        conn = sqlite3.connect(str(DB_PATH), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        init_products_table(conn)
+        init_scrape_log(conn)
+        norm_cache = NormalizationCache(conn)
+        scheduler = RefreshScheduler(conn)
+    run_id = conn.execute(
+        "INSERT INTO scrape_log (started_at, status, stage) VALUES (?, ?, ?)",
+        (time.strftime("%Y-%m-%dT%H:%M:%S"), "running", "products"),
+    ).lastrowid
+    conn.commit()
 
-    total_products = 0
+    to_process: list[PlannedFetch] = []
+    new_count = 0
     errors = 0
-    max_consecutive_errors = 5
     consecutive_errors = 0
     retried_auth = False
+    stop_reason = None
+    total_products = 0
+    final_count = None
+    status = "error"
+    message = None
+
+    telemetry = HttpTelemetry()
+    policy = RetryPolicy(
+        max_attempts=3,
+        base_delay=2.0,
+        budget=RetryBudget(settings.retry_budget_percent / 100),
+        telemetry=telemetry,
+    )
+    detail_breaker = policy.breaker("GET", f"{API_BASE}/api/ImportPermit/0")
+    cache = open_response_cache(
+        HTTP_CACHE_PATH,
+        enabled=settings.http_cache_enabled,
+        max_bytes=settings.http_cache_max_bytes,
+        ttl_seconds=settings.http_cache_ttl_seconds,
+    )
+    db_writer: SQLiteWriter | None = None
+    writes: list[Future[int]] = []
+    try:
+        with metrics.span("backfill"):
+            backfill_from_raw_json(conn)
+            backfill_normalized_columns(conn, norm_cache)
+            groups = ProductGroupIndex(conn)
+            backfill_product_groups(conn, groups)
+
+        # Step 3: Plan this run: never-fetched permits first, then overdue refreshes
+        with metrics.span("schedule"):
+            to_process = scheduler.plan(budget or None, limit=limit or None)
+            due_total = scheduler.due_count()
+        new_count = sum(1 for planned in to_process if not planned.is_refresh)
+
+        log.info(
+            "Will fetch products for %d imports (%d new, %d of %d due refreshes, refresh budget=%s)",
+            len(to_process),
+            new_count,
+            len(to_process) - new_count,
+            due_total,
+            budget or "unlimited",
+        )
 
-    semaphore = asyncio.Semaphore(CONCURRENCY_PRODUCTS)
-    transport = httpx.AsyncHTTPTransport(retries=3)
-    async with httpx.AsyncClient(timeout=120.0, transport=transport) as client:
-        for batch_start in range(0, len(to_process), CONCURRENCY_PRODUCTS):
-            batch = to_process[batch_start:batch_start + CONCURRENCY_PRODUCTS]
-
-            tasks = [
-                fetch_import_products(client, imp_id, imp_num, headers, semaphore)
-                for imp_id, imp_num in batch
-            ]
-            results = await asyncio.gather(*tasks)
-
-            # Check for 401s — re-auth once and retry failed ones
-            needs_retry = []
-            for import_id, import_number, details, status_code in results:
-                if status_code == 401:
-                    needs_retry.append((import_id, import_number))
-
-            if needs_retry and not retried_auth:
-                log.warning("Got 401 for %d imports — token expired. Doing fresh login...", len(needs_retry))
-                bearer_token = await _login_for_token()
-                headers["Authorization"] = bearer_token
-                retried_auth = True
-                retry_tasks = [
-                    fetch_import_products(client, imp_id, imp_num, headers, semaphore)
-                    for imp_id, imp_num in needs_retry
-                ]
-                retry_results = await asyncio.gather(*retry_tasks)
-                # Replace 401 results with retried results
-                retry_map = {r[0]: r for r in retry_results}
-                results = [
-                    retry_map.get(r[0], r) if r[3] == 401 else r
-                    for r in results
+        # Step 4: Fetch details concurrently in batches
+        headers = {
+            "Authorization": bearer_token,
+            "Accept": "application/json, text/plain, */*",
+            "Referer": PORTAL_URL,
+        }
+
+        semaphore = asyncio.Semaphore(CONCURRENCY_PRODUCTS)
+        # The writer thread owns `conn` (and the scheduler, normalization cache
+        # and group index bound to it) until it is closed after the fetch loop.
+        db_writer = SQLiteWriter(
+            conn=conn,
+            max_queue=settings.db_queue_size,
+            batch_size=settings.db_batch_size,
+            commit_seconds=settings.db_commit_seconds,
+        )
+        db_writer.add_listener(norm_cache)
+        db_writer.add_listener(groups)
+        async with create_async_client(
+            timeout=120.0,
+            concurrency=CONCURRENCY_PRODUCTS,
+            http2=settings.http2,
+            keepalive_expiry=settings.http_keepalive_seconds,
+            telemetry=telemetry,
+            retries=0,
+        ) as client:
+            for batch_start in range(0, len(to_process), CONCURRENCY_PRODUCTS):
+                batch = to_process[batch_start:batch_start + CONCURRENCY_PRODUCTS]
+                planned: dict[int, PlannedFetch] = {item.import_id: item for item in batch}
+
+                tasks = [
+                    fetch_import_products(
+                        client, item.import_id, item.import_number, headers, semaphore,
+                        policy, metrics, cache, item.is_refresh, offload,
+                    )
+                    for item in batch
                 ]
+                with metrics.span("fetch"):
+                    results = await asyncio.gather(*tasks)
+
+                # Check for 401s — re-auth once and retry failed ones
+                needs_retry = []
+                for import_id, import_number, details, status_code in results:
+                    if status_code == 401:
+                        needs_retry.append(planned[import_id])
+
+                if needs_retry and not retried_auth:
+                    log.warning("Got 401 for %d imports — token expired. Doing fresh login...", len(needs_retry))
+                    with metrics.span("login"):
+                        bearer_token = await _login_for_token()
+                    headers["Authorization"] = bearer_token
+                    retried_auth = True
+                    retry_tasks = [
+                        fetch_import_products(
+                            client, item.import_id, item.import_number, headers, semaphore,
+                            policy, metrics, cache, item.is_refresh, offload,
+                        )
+                        for item in needs_retry
+                    ]
+                    with metrics.span("fetch"):
+                        retry_results = await asyncio.gather(*retry_tasks)
+                    # Replace 401 results with retried results
+                    retry_map = {r[0]: r for r in retry_results}
+                    results = [
+                        retry_map.get(r[0], r) if r[3] == 401 else r
+                        for r in results
+                    ]
+
+                # Process results and upsert to DB
+                for import_id, import_number, details, status_code in results:
+                    if details is None:
+                        if status_code != 0:
+                            log.warning("HTTP %d for import %d (%s)", status_code, import_id, import_number)
+                        else:
+                            log.warning("Request failed for import %d (%s)", import_id, import_number)
+                        errors += 1
+                        consecutive_errors += 1
+                        if status_code == 401 and retried_auth:
+                            stop_reason = "auth_error"
+                        elif consecutive_errors >= MAX_CONSECUTIVE_ERRORS and stop_reason is None:
+                            stop_reason = "consecutive_errors"
+                        if status_code not in (401, 403):
+                            writes.append(await db_writer.asubmit(store_failure, scheduler, import_id))
+                        continue
+
+                    consecutive_errors = 0
+
+                    with metrics.span("db_write"):
+                        writes.append(
+                            await db_writer.asubmit(
+                                store_details, scheduler, import_id, import_number, details,
+                                planned[import_id].is_refresh, norm_cache, groups,
+                            )
+                        )
+
+                processed = min(batch_start + len(batch), len(to_process))
+                log.info(
+                    "[%d/%d] Batch done: %d products stored so far (%d errors)",
+                    processed, len(to_process), sum(settled_results(writes)), errors,
+                )
 
-            # Process results and upsert to DB
-            batch_stop = False
-            for import_id, import_number, details, status_code in results:
-                if details is None:
-                    if status_code != 0:
-                        log.warning("HTTP %d for import %d (%s)", status_code, import_id, import_number)
-                    else:
-                        log.warning("Request failed for import %d (%s)", import_id, import_number)
-                    consecutive_errors += 1
-                    errors += 1
-                    if consecutive_errors >= max_consecutive_errors:
-                        log.error("Too many consecutive errors. Token may have expired.")
-                        batch_stop = True
-                        break
-                    continue
-
-                consecutive_errors = 0
-                for item in details:
-                    upsert_product(conn, item, import_number)
-                    total_products += 1
-
-            conn.commit()
-
-            processed = min(batch_start + len(batch), len(to_process))
-            log.info(
-                "[%d/%d] Batch done: %d products so far (%d errors)",
-                processed, len(to_process), total_products, errors,
-            )
-
-            if batch_stop:
-                break
-
-            await asyncio.sleep(0.3)
-
-    # Step 5: Export CSV
-    log.info("Exporting products to CSV...")
-    csv_fields = [
-        "id", "import_permit_id", "import_permit_number",
-        "product_name", "full_item_name", "generic_name", "brand_name",
-        "description", "hs_code",
-        "dosage_form", "dosage_strength", "dosage_unit",
-        "product_registration_date", "product_expiry_date", "product_status",
-        "manufacturer_name", "manufacturer_site",
-        "quantity", "unit_price", "discount", "amount",
-    ]
-    rows = conn.execute(
-        f"SELECT {', '.join(csv_fields)} FROM import_permit_products ORDER BY import_permit_id DESC"
-    ).fetchall()
-    with open(CSV_PATH, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(csv_fields)
-        writer.writerows(rows)
-
-    final_count = conn.execute("SELECT COUNT(*) FROM import_permit_products").fetchone()[0]
-    conn.close()
+                if detail_breaker.gave_up:
+                    stop_reason = "circuit_open"
+                if stop_reason is not None:
+                    log.error("Stopping early (%s).", stop_reason)
+                    break
+
+                await asyncio.sleep(0.3)
+
+        with metrics.span("db_write"):
+            await db_writer.aflush()
+        db_writer.close()
+        total_products = sum(future.result() for future in writes)
+
+        # Step 5: Export CSV
+        log.info("Exporting products to CSV...")
+        csv_fields = [
+            "id", "import_permit_id", "import_permit_number",
+            "product_name", "full_item_name", "generic_name", "brand_name",
+            "description", "hs_code",
+            "dosage_form", "dosage_strength", "dosage_unit",
+            "product_registration_date", "product_expiry_date", "product_status",
+            "manufacturer_name", "manufacturer_site",
+            "quantity", "unit_price", "discount", "amount",
+        ]
+        with metrics.span("csv_export"):
+            rows = conn.execute(
+                f"SELECT {', '.join(csv_fields)} FROM import_permit_products ORDER BY import_permit_id DESC"
+            ).fetchall()
+            with open(CSV_PATH, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(csv_fields)
+                writer.writerows(rows)
+
+        final_count = conn.execute("SELECT COUNT(*) FROM import_permit_products").fetchone()[0]
+        status = "error" if stop_reason is not None else "success"
+        message = (
+            f"imports={len(to_process)} new={new_count} refreshed={len(to_process) - new_count} "
+            f"changed={scheduler.changed} products={total_products} errors={errors}"
+            + (f" stop={stop_reason}" if stop_reason else "")
+        )
+    except Exception as exc:
+        total_products = sum(settled_results(writes))
+        message = str(exc)
+        raise
+    finally:
+        if db_writer is not None:
+            db_writer.close()
+            metrics.sections["db_writer"] = db_writer.summary()
+        metrics.incr("products_scraped", total_products)
+        metrics.incr("errors", errors)
+        metrics.incr("imports_new", new_count)
+        metrics.incr("imports_refreshed", len(to_process) - new_count)
+        metrics.incr("refresh_changed", scheduler.changed)
+        metrics.incr("refresh_unchanged", scheduler.unchanged)
+        metrics.incr("fetch_failures_backed_off", scheduler.failed)
+        metrics.incr("norm_cache_hits", norm_cache.hits)
+        metrics.incr("norm_cache_misses", norm_cache.misses)
+        metrics.sections["http"] = telemetry.summary()
+        metrics.sections["retries"] = policy.summary()
+        metrics.sections["offload"] = offload.summary()
+        if cache is not None:
+            metrics.sections["http_cache"] = cache.summary()
+            cache.close()
+        report = metrics.finish(status)
+        conn.execute(
+            """
+            UPDATE scrape_log
+            SET finished_at = datetime('now'),
+                total_records = ?,
+                records_fetched = ?,
+                status = ?,
+                message = ?,
+                metrics_json = ?
+            WHERE id = ?
+            """,
+            (final_count, total_products, status, message, json.dumps(report), run_id),
+        )
+        conn.commit()
+        conn.close()
+        try:
+            metrics.write_report(REPORTS_DIR)
+        except OSError as exc:
+            # Never let a failed report replace the run's own exception.
+            log.error("Could not write the run report: %s", exc)
+        metrics.log_summary()
+        telemetry.log_summary()
+    log.info("Normalization cache: %d hits, %d misses", norm_cache.hits, norm_cache.misses)
 
     log.info("Done! %d products scraped (%d errors). Total in DB: %d. CSV: %s", total_products, errors, final_count, CSV_PATH)
 
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--limit", type=int, default=None, help="Max imports to process (for testing)")
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=DEFAULT_REQUEST_BUDGET,
+        help=f"Max refresh requests this run; new permits are not capped (default {DEFAULT_REQUEST_BUDGET}, 0 = no limit)",
+    )
     args = parser.parse_args()
-    asyncio.run(scrape_products(limit=args.limit))
+    settings = load_settings(str(BASE_DIR / ".env"))
+    # The offloader outlives the event loop, so its pool is shut down
+    # however the run ends.
+    with Offloader(mode=settings.offload_mode, workers=settings.cpu_workers) as offload:
+        asyncio.run(scrape_products(limit=args.limit, budget=args.budget, settings=settings, offload=offload))
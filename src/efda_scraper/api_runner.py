@@ -5,15 +5,21 @@ import csv
 import json
 import logging
 import re
+import string
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
 from playwright.async_api import Page, async_playwright
 
-from efda_scraper.browser_pipeline import _click_first, _login, _wait_for_idle
+from efda_scraper.browser_pipeline import _PRODUCT_FIELDS, _SUPPLIER_FIELDS, _click_first, _login, _wait_for_idle
 from efda_scraper.config import Settings
+from efda_scraper.jsonstream import orjson
+from efda_scraper.metrics import RunMetrics
 from efda_scraper.playwright_utils import launch_chromium
-from efda_scraper.storage import SQLiteStore
+from efda_scraper.response_cache import ResponseCache, cache_key, open_response_cache
+from efda_scraper.storage import SQLiteStore, write_browser_detail, write_browser_import
 
 logger = logging.getLogger(__name__)
 
@@ -33,21 +39,10 @@ def _extract_records(payload: Any) -> list[dict[str, Any]]:
     return []
 
 
-def _value_for_keys(row: dict[str, Any], key_tokens: tuple[str, ...]) -> str | None:
-    lowered = {str(key).lower(): value for key, value in row.items()}
-    for key, value in lowered.items():
-        if any(token in key for token in key_tokens):
-            text = str(value).strip()
-            if text:
-                return text
-    return None
-
-
 def _normalize_products(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
     out: list[dict[str, Any]] = []
     for row in rows:
-        product_name = _value_for_keys(row, ("product", "item", "medicine", "drug", "description", "name"))
-        supplier_name = _value_for_keys(row, ("supplier", "manufacturer", "vendor"))
+        product_name, supplier_name = _PRODUCT_FIELDS.texts(row)
         out.append(
             {
                 "product_name": product_name,
@@ -61,7 +56,7 @@ def _normalize_products(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
 def _normalize_suppliers(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
     out: list[dict[str, Any]] = []
     for row in rows:
-        supplier_name = _value_for_keys(row, ("supplier", "manufacturer", "vendor", "name", "company"))
+        (supplier_name,) = _SUPPLIER_FIELDS.texts(row)
         if supplier_name is None:
             for value in row.values():
                 text = str(value).strip()
@@ -119,31 +114,98 @@ def _build_links(products: list[dict[str, Any]], suppliers: list[dict[str, Any]]
     return links
 
 
-def _format_recursive(value: Any, fields: dict[str, Any]) -> Any:
+# Fields run_api fills in for endpoint templates; the list call only has the first two.
+LIST_TEMPLATE_FIELDS = frozenset({"page", "page_size"})
+TEMPLATE_FIELDS = LIST_TEMPLATE_FIELDS | {"import_id", "id", "import_reference"}
+
+_PLACEHOLDER = re.compile(r"\{[a-zA-Z_][a-zA-Z0-9_]*\}")
+_FORMATTER = string.Formatter()
+_FIELD_ROOT = re.compile(r"[.\[]")
+
+Renderer = Callable[[Mapping[str, Any]], Any]
+
+
+def _compile_template(value: Any, slots: set[str]) -> Renderer | None:
+    """Compile `value` into a renderer, adding the fields it uses to `slots`.
+
+    Returns None when nothing in `value` needs rendering.  A string is a
+    `str.format` template when every replacement field is named; others
+    (`{}`, `{0}`, stray braces in literal JSON) stay as they are.
+    """
     if isinstance(value, str):
+        if "{" not in value:
+            return None
         try:
-            return value.format(**fields)
-        except Exception:
-            return value
+            names = [name for _, name, _, _ in _FORMATTER.parse(value) if name is not None]
+        except ValueError:
+            names = []
+        if not names or any(not name or name.isdigit() for name in names):
+            if _PLACEHOLDER.search(value):
+                raise ValueError(f"template {value!r} has a placeholder that cannot be filled")
+            return None
+        slots.update(_FIELD_ROOT.split(name, 1)[0] for name in names)
+        return value.format_map
     if isinstance(value, dict):
-        return {key: _format_recursive(sub, fields) for key, sub in value.items()}
+        parts = {key: _compile_template(sub, slots) for key, sub in value.items()}
+        if not any(parts.values()):
+            return None
+        items = [(key, parts[key] or _constant(sub)) for key, sub in value.items()]
+        return lambda fields: {key: render(fields) for key, render in items}
     if isinstance(value, list):
-        return [_format_recursive(item, fields) for item in value]
-    return value
+        parts = [_compile_template(item, slots) for item in value]
+        if not any(parts):
+            return None
+        renderers = [part or _constant(item) for part, item in zip(parts, value)]
+        return lambda fields: [render(fields) for render in renderers]
+    return None
 
 
-def _contains_placeholder(value: Any) -> bool:
-    pattern = re.compile(r"\{[a-zA-Z_][a-zA-Z0-9_]*\}")
-    if isinstance(value, str):
-        return bool(pattern.search(value))
-    if isinstance(value, dict):
-        return any(_contains_placeholder(sub) for sub in value.values())
-    if isinstance(value, list):
-        return any(_contains_placeholder(item) for item in value)
-    return False
+def _constant(value: Any) -> Renderer:
+    return lambda fields: value
+
+
+@dataclass(slots=True)
+class EndpointTemplate:
+    """A captured endpoint compiled once; `render_*` is None where the part is constant."""
+
+    method: str
+    headers: dict[str, str]
+    slots: frozenset[str]
+    url: Any
+    params: Any
+    json_body: Any
+    render_url: Renderer | None
+    render_params: Renderer | None
+    render_json: Renderer | None
+
+    @classmethod
+    def compile(cls, spec: dict[str, Any]) -> EndpointTemplate:
+        slots: set[str] = set()
+        url = spec.get("url", "")
+        params = spec.get("params") or {}
+        json_body = spec.get("json")
+        return cls(
+            method=str(spec.get("method", "GET")).upper(),
+            headers=spec.get("headers") or {},
+            url=url,
+            params=params,
+            json_body=json_body,
+            render_url=_compile_template(url, slots),
+            render_params=_compile_template(params, slots),
+            render_json=_compile_template(json_body, slots),
+            slots=frozenset(slots),
+        )
+
+    def render(self, fields: Mapping[str, Any]) -> tuple[str, dict[str, Any], Any]:
+        """(url, params, json body) for `fields`. Raises KeyError for a missing slot."""
+        return (
+            self.url if self.render_url is None else self.render_url(fields),
+            self.params if self.render_params is None else self.render_params(fields),
+            self.json_body if self.render_json is None else self.render_json(fields),
+        )
 
 
-def _load_endpoints(path: Path) -> dict[str, Any]:
+def _load_endpoints(path: Path) -> dict[str, EndpointTemplate]:
     if not path.exists():
         raise FileNotFoundError(
             f"Missing API endpoints file: {path}. Run `efda-scraper capture-api` first."
@@ -153,7 +215,23 @@ def _load_endpoints(path: Path) -> dict[str, Any]:
         raise ValueError(
             f"API endpoints file missing imports_list: {path}. Run `efda-scraper capture-api` again."
         )
-    return data
+    endpoints: dict[str, EndpointTemplate] = {}
+    for name, spec in data.items():
+        try:
+            endpoint = EndpointTemplate.compile(spec)
+            unknown = endpoint.slots - (LIST_TEMPLATE_FIELDS if name == "imports_list" else TEMPLATE_FIELDS)
+            if unknown:
+                raise ValueError(f"unknown placeholders {sorted(unknown)}")
+        except ValueError as exc:
+            if name == "imports_list":
+                raise ValueError(
+                    f"imports_list endpoint in {path} cannot be rendered: {exc}. "
+                    "Re-run `efda-scraper capture-api` to regenerate endpoint templates."
+                ) from exc
+            logger.warning("Skipping endpoint %s from %s: %s", name, path, exc)
+            continue
+        endpoints[name] = endpoint
+    return endpoints
 
 
 async def _browser_fetch_json(
@@ -209,6 +287,9 @@ async def _browser_fetch_json(
                 status: response.status,
                 url: abs.toString(),
                 contentType: response.headers.get('content-type') || '',
+                etag: response.headers.get('etag'),
+                lastModified: response.headers.get('last-modified'),
+                bytes: new Blob([text]).size,
                 json,
                 textPreview: text.slice(0, 1200),
             };
@@ -243,17 +324,46 @@ def _import_identity(raw: dict[str, Any]) -> tuple[str | None, str | None]:
     return import_id, import_reference
 
 
-async def _call_endpoint(page: Page, endpoint: dict[str, Any], fields: dict[str, Any]) -> dict[str, Any] | None:
-    method = str(endpoint.get("method", "GET")).upper()
-    url = _format_recursive(endpoint.get("url", ""), fields)
-    params = _format_recursive(endpoint.get("params") or {}, fields)
-    json_body = _format_recursive(endpoint.get("json"), fields)
-    headers = endpoint.get("headers") or {}
+def _dump_json(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _cached_result(url: str, payload: Any) -> dict[str, Any]:
+    return {
+        "ok": True,
+        "status": 200,
+        "url": url,
+        "contentType": "application/json",
+        "bytes": 0,
+        "json": payload,
+        "textPreview": "",
+        "cached": True,
+    }
 
-    if _contains_placeholder(url) or _contains_placeholder(params) or _contains_placeholder(json_body):
-        return None
 
-    return await _browser_fetch_json(
+async def _call_endpoint(
+    page: Page,
+    endpoint: EndpointTemplate,
+    fields: dict[str, Any],
+    metrics: RunMetrics | None = None,
+    cache: ResponseCache | None = None,
+) -> dict[str, Any]:
+    method = endpoint.method
+    url, params, json_body = endpoint.render(fields)
+    headers = endpoint.headers
+
+    key = entry = None
+    if cache is not None:
+        key = cache_key(method, url, params=params, body=json_body)
+        entry = cache.get(key)
+        if entry is not None:
+            if cache.is_fresh(entry):
+                return _cached_result(url, entry.json())
+            headers = {**headers, **entry.conditional_headers()}
+
+    result = await _browser_fetch_json(
         page,
         url=url,
         method=method,
@@ -261,6 +371,23 @@ async def _call_endpoint(page: Page, endpoint: dict[str, Any], fields: dict[str,
         headers=headers,
         json_body=json_body,
     )
+    if metrics is not None:
+        metrics.incr("requests")
+        metrics.add_bytes(int(result.get("bytes") or 0))
+
+    if cache is not None and key is not None:
+        if result.get("status") == 304 and entry is not None:
+            cache.revalidated(entry)
+            return _cached_result(url, entry.json())
+        if result.get("ok") and result.get("json") is not None:
+            cache.put(
+                key,
+                url,
+                _dump_json(result["json"]),
+                etag=result.get("etag"),
+                last_modified=result.get("lastModified"),
+            )
+    return result
 
 
 async def run_api_collection_async(
@@ -274,15 +401,26 @@ async def run_api_collection_async(
     effective_max_pages = max_pages or settings.max_pages
     effective_page_size = page_size or settings.page_size
 
+    metrics = RunMetrics("run_api")
     store = SQLiteStore(settings.sqlite_path)
-    store.init_schema()
+    with metrics.span("db_init"):
+        store.init_schema()
 
     run_id = store.start_run()
+    db_writer = store.open_writer(settings)
+    cache = open_response_cache(
+        settings.http_cache_path,
+        enabled=settings.http_cache_enabled,
+        max_bytes=settings.http_cache_max_bytes,
+        ttl_seconds=settings.http_cache_ttl_seconds,
+    )
     imports_seen = 0
     imports_scraped = 0
     products_seen = 0
     suppliers_seen = 0
     links_seen = 0
+    status = "error"
+    message: str | None = None
 
     links_csv_path = settings.sqlite_path.parent / "import_product_supplier_links.csv"
     all_link_rows: list[dict[str, str]] = []
@@ -297,34 +435,32 @@ async def run_api_collection_async(
             )
             page = await context.new_page()
 
-            await page.goto(settings.base_url, wait_until="domcontentloaded")
-            await _wait_for_idle(page, timeout_ms=15_000)
+            with metrics.span("login"):
+                await page.goto(settings.base_url, wait_until="domcontentloaded")
+                await _wait_for_idle(page, timeout_ms=15_000)
 
-            try:
-                await _login(page, settings)
-                await context.storage_state(path=str(settings.storage_state_path))
-            except Exception as exc:
-                logger.warning("Could not perform explicit login during run-api: %s", exc)
+                try:
+                    await _login(page, settings)
+                    await context.storage_state(path=str(settings.storage_state_path))
+                except Exception as exc:
+                    logger.warning("Could not perform explicit login during run-api: %s", exc)
 
-            try:
-                await _click_first(page, settings.imports_menu_selectors)
-                await _wait_for_idle(page, timeout_ms=8_000)
-            except Exception as exc:
-                logger.warning("Could not auto-open imports menu during run-api: %s", exc)
+                try:
+                    await _click_first(page, settings.imports_menu_selectors)
+                    await _wait_for_idle(page, timeout_ms=8_000)
+                except Exception as exc:
+                    logger.warning("Could not auto-open imports menu during run-api: %s", exc)
 
             for page_num in range(1, effective_max_pages + 1):
-                list_result = await _call_endpoint(
-                    page,
-                    endpoints["imports_list"],
-                    {
-                        "page": page_num,
-                        "page_size": effective_page_size,
-                    },
-                )
-                if list_result is None:
-                    raise RuntimeError(
-                        "imports_list endpoint has unresolved placeholders. "
-                        "Re-run `efda-scraper capture-api` to regenerate endpoint templates."
+                with metrics.span("fetch"):
+                    list_result = await _call_endpoint(
+                        page,
+                        endpoints["imports_list"],
+                        {
+                            "page": page_num,
+                            "page_size": effective_page_size,
+                        },
+                        metrics,
                     )
                 if not list_result.get("ok"):
                     raise RuntimeError(
@@ -343,7 +479,8 @@ async def run_api_collection_async(
                 api_raw_dir = settings.raw_output_dir / "api"
                 api_raw_dir.mkdir(parents=True, exist_ok=True)
                 raw_list_path = api_raw_dir / f"imports_page_{page_num:04d}.json"
-                raw_list_path.write_text(json.dumps(payload, indent=2, ensure_ascii=True), encoding="utf-8")
+                with metrics.span("raw_write"):
+                    raw_list_path.write_text(json.dumps(payload, indent=2, ensure_ascii=True), encoding="utf-8")
 
                 records = _extract_records(payload)
                 logger.info("API page %s returned %s imports", page_num, len(records))
@@ -365,7 +502,10 @@ async def run_api_collection_async(
                     suppliers_rows: list[dict[str, Any]] = []
 
                     if "import_products" in endpoints:
-                        products_result = await _call_endpoint(page, endpoints["import_products"], fields)
+                        with metrics.span("fetch"):
+                            products_result = await _call_endpoint(
+                                page, endpoints["import_products"], fields, metrics, cache
+                            )
                         if products_result and products_result.get("ok") and products_result.get("json") is not None:
                             products_rows = _extract_records(products_result["json"])
                         elif products_result and not products_result.get("ok"):
@@ -376,7 +516,10 @@ async def run_api_collection_async(
                             )
 
                     if "import_suppliers" in endpoints:
-                        suppliers_result = await _call_endpoint(page, endpoints["import_suppliers"], fields)
+                        with metrics.span("fetch"):
+                            suppliers_result = await _call_endpoint(
+                                page, endpoints["import_suppliers"], fields, metrics, cache
+                            )
                         if suppliers_result and suppliers_result.get("ok") and suppliers_result.get("json") is not None:
                             suppliers_rows = _extract_records(suppliers_result["json"])
                         elif suppliers_result and not suppliers_result.get("ok"):
@@ -386,9 +529,10 @@ async def run_api_collection_async(
                                 suppliers_result.get("status"),
                             )
 
-                    products = _normalize_products(products_rows)
-                    suppliers = _normalize_suppliers(suppliers_rows)
-                    links = _build_links(products, suppliers)
+                    with metrics.span("normalize"):
+                        products = _normalize_products(products_rows)
+                        suppliers = _normalize_suppliers(suppliers_rows)
+                        links = _build_links(products, suppliers)
 
                     import_reference_key = import_reference or import_id or f"page{page_num}-idx{imports_seen}"
 
@@ -402,19 +546,12 @@ async def run_api_collection_async(
                     }
 
                     raw_detail_path = api_raw_dir / f"import_{_safe_filename(import_reference_key)}.json"
-                    raw_detail_path.write_text(json.dumps(payload_out, indent=2, ensure_ascii=True), encoding="utf-8")
+                    with metrics.span("raw_write"):
+                        raw_detail_path.write_text(json.dumps(payload_out, indent=2, ensure_ascii=True), encoding="utf-8")
 
-                    store.upsert_browser_import(
-                        import_reference_key,
-                        detail_url=None,
-                        payload=payload_out,
-                    )
-                    store.replace_browser_detail(
-                        import_reference_key,
-                        products=products,
-                        suppliers=suppliers,
-                        links=links,
-                    )
+                    with metrics.span("db_write"):
+                        await db_writer.asubmit(write_browser_import, import_reference_key, None, payload_out)
+                        await db_writer.asubmit(write_browser_detail, import_reference_key, products, suppliers, links)
 
                     for link in links:
                         all_link_rows.append(
@@ -435,31 +572,42 @@ async def run_api_collection_async(
             await context.close()
             await browser.close()
 
-        links_csv_path.parent.mkdir(parents=True, exist_ok=True)
-        with links_csv_path.open("w", encoding="utf-8", newline="") as fh:
-            writer = csv.DictWriter(
-                fh,
-                fieldnames=["import_reference", "product_name", "supplier_name", "confidence", "source"],
-            )
-            writer.writeheader()
-            writer.writerows(all_link_rows)
+        with metrics.span("csv_export"):
+            links_csv_path.parent.mkdir(parents=True, exist_ok=True)
+            with links_csv_path.open("w", encoding="utf-8", newline="") as fh:
+                writer = csv.DictWriter(
+                    fh,
+                    fieldnames=["import_reference", "product_name", "supplier_name", "confidence", "source"],
+                )
+                writer.writeheader()
+                writer.writerows(all_link_rows)
 
-        store.finish_run(
-            run_id,
-            status="success",
-            records_seen=imports_seen,
-            records_upserted=imports_scraped,
-            message=f"products={products_seen} suppliers={suppliers_seen} links={links_seen}",
-        )
+        with metrics.span("db_write"):
+            await db_writer.aflush()
+        status = "success"
+        message = f"products={products_seen} suppliers={suppliers_seen} links={links_seen}"
     except Exception as exc:
+        message = str(exc)
+        raise
+    finally:
+        db_writer.close()
+        metrics.sections["db_writer"] = db_writer.summary()
+        if cache is not None:
+            metrics.sections["http_cache"] = cache.summary()
+            cache.close()
         store.finish_run(
             run_id,
-            status="error",
+            status=status,
             records_seen=imports_seen,
             records_upserted=imports_scraped,
-            message=str(exc),
+            message=message,
+            metrics=metrics.finish(status),
         )
-        raise
+        try:
+            metrics.write_report(settings.sqlite_path.parent / "reports")
+        except OSError as exc:
+            logger.error("Could not write the run report: %s", exc)
+        metrics.log_summary()
 
     return {
         "imports_seen": imports_seen,
@@ -471,6 +619,7 @@ async def run_api_collection_async(
         "api_capture": str(settings.api_capture_path),
         "api_endpoints": str(settings.api_endpoints_path),
         "endpoint_keys": sorted([key for key in endpoints.keys() if key.startswith("import")]),
+        "metrics": metrics.report(),
     }
 
 
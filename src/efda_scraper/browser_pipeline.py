@@ -6,6 +6,7 @@ import json
 import logging
 import re
 import time
+from collections.abc import Awaitable, Callable
 from pathlib import Path
 from typing import Any
 
@@ -17,11 +18,22 @@ from playwright.async_api import (
 )
 
 from efda_scraper.config import Settings
+from efda_scraper.field_plan import FieldPlanner
+from efda_scraper.metrics import RunMetrics
 from efda_scraper.playwright_utils import launch_chromium
-from efda_scraper.storage import SQLiteStore
+from efda_scraper.selector_cache import SelectorCache
+from efda_scraper.storage import SQLiteStore, write_browser_detail, write_browser_import
 
 logger = logging.getLogger(__name__)
 
+# Shared by every helper below; runs load it from and save it to
+# `selector_cache.json` next to the storage state.
+_SELECTORS = SelectorCache()
+
+
+def _selector_cache_path(settings: Settings) -> Path:
+    return settings.storage_state_path.parent / "selector_cache.json"
+
 
 def _safe_filename(text: str) -> str:
     return re.sub(r"[^A-Za-z0-9._-]+", "_", text).strip("_") or "record"
@@ -51,24 +63,64 @@ async def _visible_locator(root: Any, selector: str) -> Locator | None:
     return None
 
 
+def _context_key(page: Page, ctx: Any) -> str:
+    """Frame identity that survives reloads: the frame URL without its query."""
+    if ctx is page:
+        return "page"
+    return f"frame {(ctx.url or '<about:blank>').split('?')[0]}"
+
+
+async def _resolve(
+    page: Page,
+    selectors: list[str],
+    *,
+    frames_first: bool = False,
+    accept: Callable[[Locator], Awaitable[bool]] | None = None,
+) -> tuple[Locator, str, str] | None:
+    """First (selector, frame) whose locator resolves, tried in learned order.
+
+    The default order is every frame per selector, or every selector per
+    frame with `frames_first`; `_SELECTORS` reorders it by what matched
+    before.  `accept` can reject a resolved locator (e.g. a disabled
+    button).  Returns the locator, selector and frame name.
+    """
+    contexts = _iter_contexts(page)
+    if frames_first:
+        pairs = [(selector, context) for context in contexts for selector in selectors]
+    else:
+        pairs = [(selector, context) for selector in selectors for context in contexts]
+    keys = [(selector, _context_key(page, ctx)) for selector, (_, ctx) in pairs]
+    group = SelectorCache.group_key(selectors)
+
+    attempted: list[tuple[str, str]] = []
+    for index in _SELECTORS.order(group, keys):
+        selector, (ctx_name, ctx) = pairs[index]
+        attempted.append(keys[index])
+        locator = await _visible_locator(ctx, selector)
+        if locator is None or (accept is not None and not await accept(locator)):
+            continue
+        _SELECTORS.record(group, attempted, keys[index])
+        return locator, selector, ctx_name
+    _SELECTORS.record(group, attempted, None)
+    return None
+
+
 async def _fill_first(page: Page, selectors: list[str], value: str) -> str:
-    for selector in selectors:
-        for ctx_name, ctx in _iter_contexts(page):
-            locator = await _visible_locator(ctx, selector)
-            if locator is not None:
-                await locator.fill(value)
-                return f"{selector} [{ctx_name}]"
-    raise ValueError(f"None of the selectors matched: {selectors}")
+    resolved = await _resolve(page, selectors)
+    if resolved is None:
+        raise ValueError(f"None of the selectors matched: {selectors}")
+    locator, selector, ctx_name = resolved
+    await locator.fill(value)
+    return f"{selector} [{ctx_name}]"
 
 
 async def _click_first(page: Page, selectors: list[str]) -> str:
-    for selector in selectors:
-        for ctx_name, ctx in _iter_contexts(page):
-            locator = await _visible_locator(ctx, selector)
-            if locator is not None:
-                await locator.click()
-                return f"{selector} [{ctx_name}]"
-    raise ValueError(f"None of the selectors matched: {selectors}")
+    resolved = await _resolve(page, selectors)
+    if resolved is None:
+        raise ValueError(f"None of the selectors matched: {selectors}")
+    locator, selector, ctx_name = resolved
+    await locator.click()
+    return f"{selector} [{ctx_name}]"
 
 
 async def _fill_fallback_username(page: Page, value: str) -> str:
@@ -118,12 +170,7 @@ async def _fill_fallback_password(page: Page, value: str) -> str:
 
 
 async def _any_visible(page: Page, selectors: list[str]) -> bool:
-    for _, ctx in _iter_contexts(page):
-        for selector in selectors:
-            locator = await _visible_locator(ctx, selector)
-            if locator is not None:
-                return True
-    return False
+    return await _resolve(page, selectors, frames_first=True) is not None
 
 
 async def _wait_for_idle(page: Page, timeout_ms: int = 15_000) -> None:
@@ -408,23 +455,23 @@ async def _collect_import_refs_from_page(page: Page, pattern: str) -> list[str]:
     return deduped
 
 
+async def _is_enabled(locator: Locator) -> bool:
+    try:
+        return not await locator.is_disabled()
+    except Exception:
+        return True
+
+
 async def _click_next_page(page: Page, selectors: list[str]) -> bool:
-    for ctx_name, ctx in _iter_contexts(page):
-        for selector in selectors:
-            locator = await _visible_locator(ctx, selector)
-            if locator is None:
-                continue
-            try:
-                if await locator.is_disabled():
-                    continue
-            except Exception:
-                pass
-            await locator.click()
-            await _wait_for_idle(page, timeout_ms=12_000)
-            await page.wait_for_timeout(500)
-            logger.info("Moved to next imports page using selector %s [%s]", selector, ctx_name)
-            return True
-    return False
+    resolved = await _resolve(page, selectors, frames_first=True, accept=_is_enabled)
+    if resolved is None:
+        return False
+    locator, selector, ctx_name = resolved
+    await locator.click()
+    await _wait_for_idle(page, timeout_ms=12_000)
+    await page.wait_for_timeout(500)
+    logger.info("Moved to next imports page using selector %s [%s]", selector, ctx_name)
+    return True
 
 
 async def _open_import_detail(page: Page, import_ref: str) -> None:
@@ -520,21 +567,24 @@ async def _extract_rows_from_visible_grid(page: Page) -> list[dict[str, str]]:
     return [row for row in rows if isinstance(row, dict)]
 
 
-def _value_for_keys(row: dict[str, str], key_tokens: tuple[str, ...]) -> str | None:
-    lowered = {str(key).lower(): value for key, value in row.items()}
-    for key, value in lowered.items():
-        if any(token in key for token in key_tokens):
-            text = str(value).strip()
-            if text:
-                return text
-    return None
+# Header-token matching for product/supplier tables; shared with api_runner.
+_PRODUCT_FIELDS = FieldPlanner(
+    {
+        "product_name": ("product", "item", "medicine", "drug", "description", "name"),
+        "supplier_name": ("supplier", "manufacturer", "vendor"),
+    },
+    substring=True,
+)
+_SUPPLIER_FIELDS = FieldPlanner(
+    {"supplier_name": ("supplier", "manufacturer", "vendor", "name", "company")},
+    substring=True,
+)
 
 
 def _normalize_products(rows: list[dict[str, str]]) -> list[dict[str, Any]]:
     out: list[dict[str, Any]] = []
     for row in rows:
-        product_name = _value_for_keys(row, ("product", "item", "medicine", "drug", "description", "name"))
-        supplier_name = _value_for_keys(row, ("supplier", "manufacturer", "vendor"))
+        product_name, supplier_name = _PRODUCT_FIELDS.texts(row)
         out.append(
             {
                 "product_name": product_name,
@@ -548,7 +598,7 @@ def _normalize_products(rows: list[dict[str, str]]) -> list[dict[str, Any]]:
 def _normalize_suppliers(rows: list[dict[str, str]]) -> list[dict[str, Any]]:
     out: list[dict[str, Any]] = []
     for row in rows:
-        supplier_name = _value_for_keys(row, ("supplier", "manufacturer", "vendor", "name", "company"))
+        (supplier_name,) = _SUPPLIER_FIELDS.texts(row)
         if supplier_name is None:
             # Fall back to the first non-empty cell.
             for value in row.values():
@@ -626,10 +676,14 @@ async def run_browser_collection_async(
     effective_max_pages = max_pages or settings.max_pages
     effective_max_imports = max_imports if max_imports is not None else settings.max_imports
 
+    metrics = RunMetrics("run_browser")
     store = SQLiteStore(settings.sqlite_path)
-    store.init_schema()
+    with metrics.span("db_init"):
+        store.init_schema()
 
     run_id = store.start_run()
+    db_writer = store.open_writer(settings)
+    _SELECTORS.load(_selector_cache_path(settings))
     imports_seen = 0
     imports_scraped = 0
     products_seen = 0
@@ -647,20 +701,22 @@ async def run_browser_collection_async(
             context = await browser.new_context()
             page = await context.new_page()
 
-            await _login(page, settings)
-            await context.storage_state(path=str(settings.storage_state_path))
-            await _navigate_to_imports(page, settings)
+            with metrics.span("login"):
+                await _login(page, settings)
+                await context.storage_state(path=str(settings.storage_state_path))
+                await _navigate_to_imports(page, settings)
 
             for page_num in range(1, effective_max_pages + 1):
-                refs = await _collect_import_refs_from_page(page, settings.import_reference_pattern)
-                page_refs = [ref for ref in refs if ref not in seen_refs]
+                with metrics.span("list_refs"):
+                    refs = await _collect_import_refs_from_page(page, settings.import_reference_pattern)
+                    page_refs = [ref for ref in refs if ref not in seen_refs]
 
-                click_tokens: list[str] = []
-                token_mode = False
-                if not page_refs:
-                    click_tokens = await _collect_import_click_tokens_from_page(page)
-                    click_tokens = [token for token in click_tokens if token not in seen_refs]
-                    token_mode = len(click_tokens) > 0
+                    click_tokens: list[str] = []
+                    token_mode = False
+                    if not page_refs:
+                        click_tokens = await _collect_import_click_tokens_from_page(page)
+                        click_tokens = [token for token in click_tokens if token not in seen_refs]
+                        token_mode = len(click_tokens) > 0
 
                 logger.info(
                     "Imports page %s: discovered %s references%s",
@@ -687,17 +743,19 @@ async def run_browser_collection_async(
                     imports_seen += 1
 
                     try:
-                        await _open_import_detail(page, import_target)
-                        import_ref = await _detect_import_ref_on_detail(page, settings.import_reference_pattern) or import_target
-                        import_ref = _normalize_import_ref(import_ref)
-                        seen_refs.add(import_ref)
+                        with metrics.span("detail_extract"):
+                            await _open_import_detail(page, import_target)
+                            import_ref = await _detect_import_ref_on_detail(page, settings.import_reference_pattern) or import_target
+                            import_ref = _normalize_import_ref(import_ref)
+                            seen_refs.add(import_ref)
 
-                        products_raw = await _open_tab_and_extract(page, settings.products_tab_selectors)
-                        suppliers_raw = await _open_tab_and_extract(page, settings.suppliers_tab_selectors)
+                            products_raw = await _open_tab_and_extract(page, settings.products_tab_selectors)
+                            suppliers_raw = await _open_tab_and_extract(page, settings.suppliers_tab_selectors)
 
-                        products = _normalize_products(products_raw)
-                        suppliers = _normalize_suppliers(suppliers_raw)
-                        links = _build_links(products, suppliers)
+                        with metrics.span("normalize"):
+                            products = _normalize_products(products_raw)
+                            suppliers = _normalize_suppliers(suppliers_raw)
+                            links = _build_links(products, suppliers)
 
                         payload = {
                             "import_reference": import_ref,
@@ -710,15 +768,12 @@ async def run_browser_collection_async(
                         raw_dir = settings.raw_output_dir / "ui"
                         raw_dir.mkdir(parents=True, exist_ok=True)
                         raw_path = raw_dir / f"import_{_safe_filename(import_ref)}.json"
-                        raw_path.write_text(json.dumps(payload, indent=2, ensure_ascii=True), encoding="utf-8")
+                        with metrics.span("raw_write"):
+                            raw_path.write_text(json.dumps(payload, indent=2, ensure_ascii=True), encoding="utf-8")
 
-                        store.upsert_browser_import(import_ref, detail_url=page.url, payload=payload)
-                        store.replace_browser_detail(
-                            import_ref,
-                            products=products,
-                            suppliers=suppliers,
-                            links=links,
-                        )
+                        with metrics.span("db_write"):
+                            await db_writer.asubmit(write_browser_import, import_ref, page.url, payload)
+                            await db_writer.asubmit(write_browser_detail, import_ref, products, suppliers, links)
 
                         for link in links:
                             all_link_rows.append(
@@ -743,50 +798,72 @@ async def run_browser_collection_async(
                             len(links),
                         )
                     except Exception as exc:
+                        metrics.incr("detail_errors")
                         logger.exception("Failed to scrape import target %s: %s", import_target, exc)
                     finally:
-                        try:
-                            await page.go_back(wait_until="domcontentloaded")
-                            await _wait_for_idle(page, timeout_ms=12_000)
-                            await page.wait_for_timeout(600)
-                        except Exception:
-                            await _navigate_to_imports(page, settings)
+                        with metrics.span("navigate"):
+                            try:
+                                await page.go_back(wait_until="domcontentloaded")
+                                await _wait_for_idle(page, timeout_ms=12_000)
+                                await page.wait_for_timeout(600)
+                            except Exception:
+                                await _navigate_to_imports(page, settings)
 
                 if effective_max_imports and imports_scraped >= effective_max_imports:
                     break
 
-                moved = await _click_next_page(page, settings.imports_next_page_selectors)
+                with metrics.span("navigate"):
+                    moved = await _click_next_page(page, settings.imports_next_page_selectors)
                 if not moved:
                     break
 
             await context.close()
             await browser.close()
 
-        links_csv_path.parent.mkdir(parents=True, exist_ok=True)
-        with links_csv_path.open("w", encoding="utf-8", newline="") as fh:
-            writer = csv.DictWriter(
-                fh,
-                fieldnames=["import_reference", "product_name", "supplier_name", "confidence", "source"],
-            )
-            writer.writeheader()
-            writer.writerows(all_link_rows)
-
+        with metrics.span("csv_export"):
+            links_csv_path.parent.mkdir(parents=True, exist_ok=True)
+            with links_csv_path.open("w", encoding="utf-8", newline="") as fh:
+                writer = csv.DictWriter(
+                    fh,
+                    fieldnames=["import_reference", "product_name", "supplier_name", "confidence", "source"],
+                )
+                writer.writeheader()
+                writer.writerows(all_link_rows)
+
+        with metrics.span("db_write"):
+            await db_writer.aflush()
+        db_writer.close()
+        metrics.sections["db_writer"] = db_writer.summary()
+        metrics.sections["selector_cache"] = _SELECTORS.summary()
         store.finish_run(
             run_id,
             status="success",
             records_seen=imports_seen,
             records_upserted=imports_scraped,
             message=f"products={products_seen} suppliers={suppliers_seen} links={links_seen}",
+            metrics=metrics.finish("success"),
         )
     except Exception as exc:
+        db_writer.close()
+        metrics.sections["db_writer"] = db_writer.summary()
+        metrics.sections["selector_cache"] = _SELECTORS.summary()
         store.finish_run(
             run_id,
             status="error",
             records_seen=imports_seen,
             records_upserted=imports_scraped,
             message=str(exc),
+            metrics=metrics.finish("error"),
         )
         raise
+    finally:
+        db_writer.close()
+        _SELECTORS.save()
+        try:
+            metrics.write_report(settings.sqlite_path.parent / "reports")
+        except OSError as exc:
+            logger.error("Could not write the run report: %s", exc)
+        metrics.log_summary()
 
     return {
         "imports_seen": imports_seen,
@@ -795,6 +872,7 @@ async def run_browser_collection_async(
         "suppliers_seen": suppliers_seen,
         "links_seen": links_seen,
         "links_csv": str(links_csv_path),
+        "metrics": metrics.report(),
     }
 
 
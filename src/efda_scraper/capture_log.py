@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import logging
+import os
+import time
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from efda_scraper.jsonstream import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 256
+DEFAULT_FLUSH_SECONDS = 1.0
+DEFAULT_MAX_SEEN = 10_000
+PREVIEW_CHARS = 1200
+
+_BODIES_DIR = "bodies"
+_SESSION_GLOB = "session-*.jsonl.gz"
+
+
+def bodies_dir(capture_dir: Path) -> Path:
+    return capture_dir / _BODIES_DIR
+
+
+def body_path(capture_dir: Path, digest: str) -> Path:
+    return bodies_dir(capture_dir) / digest[:2] / f"{digest}.gz"
+
+
+def session_logs(capture_dir: Path) -> list[Path]:
+    """Session logs in `capture_dir`, oldest first."""
+    return sorted(capture_dir.glob(_SESSION_GLOB))
+
+
+class CaptureLogWriter:
+    """Streams captured API events to an append-only, gzipped JSONL session log.
+
+    Each session gets its own `session-<timestamp>.jsonl.gz` in
+    `capture_dir`.  A request is held in memory only until its response
+    arrives; at most `window` requests wait at once, and the oldest is
+    written out without a response when the window is full.  Response
+    bodies are written whole, gzipped, to `bodies/<sha256>.gz` and shared
+    across sessions, so the log line keeps only the digest and a short
+    preview.  Repeats of a request with the same status and body are
+    logged once.  The log is sync-flushed at most every `flush_seconds`,
+    so a crash loses at most that much; `iter_events()` reads a truncated
+    log up to the last complete line.  `window` comes from
+    `Settings.capture_window`.
+    """
+
+    def __init__(
+        self,
+        capture_dir: Path,
+        *,
+        window: int = DEFAULT_WINDOW,
+        flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+        max_seen: int = DEFAULT_MAX_SEEN,
+    ) -> None:
+        self.capture_dir = capture_dir
+        self.window = window
+        self.flush_seconds = flush_seconds
+        self.max_seen = max_seen
+        capture_dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        path = capture_dir / f"session-{stamp}.jsonl.gz"
+        suffix = 1
+        while path.exists():
+            suffix += 1
+            path = capture_dir / f"session-{stamp}-{suffix}.jsonl.gz"
+        self.path = path
+        self._log = gzip.open(path, "wb")
+        self._pending: dict[str, dict[str, Any]] = {}
+        self._seen: set[str] = set()
+        self._last_flush = time.monotonic()
+        self._closed = False
+        self.stats = {"events": 0, "duplicates": 0, "evicted": 0, "bodies": 0, "body_bytes": 0}
+
+    def request(self, key: str, event: dict[str, Any]) -> None:
+        """Hold a request until `response()` completes it."""
+        if key in self._pending:
+            return
+        if len(self._pending) >= self.window:
+            oldest = next(iter(self._pending))
+            self.stats["evicted"] += 1
+            self._write(self._pending.pop(oldest))
+        self._pending[key] = event
+
+    def response(
+        self,
+        key: str,
+        event: dict[str, Any],
+        *,
+        status: int,
+        headers: dict[str, str],
+        body: bytes | None,
+    ) -> None:
+        """Complete the request `key` (or `event`, if it was never seen) and log it."""
+        event = self._pending.pop(key, None) or event
+        event["status"] = status
+        event["response_headers"] = headers
+        event["content_type"] = headers.get("content-type", "")
+        if body is None:
+            event["body_sha256"] = None
+            event["body_bytes"] = None
+            event["response_preview"] = None
+        else:
+            event["body_sha256"] = self._store_body(body)
+            event["body_bytes"] = len(body)
+            event["response_preview"] = body[:PREVIEW_CHARS].decode("utf-8", errors="replace")
+
+        signature = f"{key} {status} {event['body_sha256']}"
+        if signature in self._seen:
+            self.stats["duplicates"] += 1
+            return
+        if len(self._seen) >= self.max_seen:
+            self._seen.clear()
+        self._seen.add(signature)
+        self._write(event)
+
+    def _store_body(self, body: bytes) -> str:
+        digest = hashlib.sha256(body).hexdigest()
+        path = body_path(self.capture_dir, digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(gzip.compress(body))
+            os.replace(tmp, path)
+            self.stats["bodies"] += 1
+            self.stats["body_bytes"] += len(body)
+        return digest
+
+    def _write(self, event: dict[str, Any]) -> None:
+        self._log.write(dumps(event).encode("utf-8") + b"\n")
+        self.stats["events"] += 1
+        now = time.monotonic()
+        if now - self._last_flush >= self.flush_seconds:
+            self._log.flush()
+            self._last_flush = now
+
+    def close(self) -> None:
+        """Write out requests still waiting for a response and finish the log. Idempotent."""
+        if self._closed:
+            return
+        self._closed = True
+        for event in self._pending.values():
+            self._write(event)
+        self._pending.clear()
+        self._log.close()
+
+    def __enter__(self) -> CaptureLogWriter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def summary(self) -> dict[str, Any]:
+        return {**self.stats, "window": self.window, "path": str(self.path)}
+
+
+def load_body(capture_dir: Path, digest: str) -> bytes | None:
+    try:
+        return gzip.decompress(body_path(capture_dir, digest).read_bytes())
+    except (OSError, EOFError, zlib.error):
+        return None
+
+
+def _response_json(capture_dir: Path, event: dict[str, Any]) -> Any:
+    digest = event.get("body_sha256")
+    if not digest or "json" not in str(event.get("content_type", "")).lower():
+        return None
+    body = load_body(capture_dir, digest)
+    if body is None:
+        return None
+    try:
+        return loads(body)
+    except ValueError:
+        return None
+
+
+def iter_events(log_path: Path, *, with_json: bool = True) -> Iterator[dict[str, Any]]:
+    """Yield the events of one session log, one line at a time.
+
+    With `with_json`, each event gets a `response_json` decoded from its
+    stored body (None for non-JSON or missing bodies), loaded only when the
+    event is reached.  A log cut short by a crash yields what was flushed.
+    """
+    capture_dir = log_path.parent
+    with gzip.open(log_path, "rb") as fh:
+        try:
+            for line in fh:
+                try:
+                    event = loads(line)
+                except ValueError:
+                    logger.warning("Skipping unreadable line in %s", log_path)
+                    continue
+                if with_json:
+                    event["response_json"] = _response_json(capture_dir, event)
+                yield event
+        except (EOFError, zlib.error, gzip.BadGzipFile) as exc:
+            logger.warning("Capture log %s is truncated (%s); read up to the last complete line", log_path, exc)
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# table -> primary-key column recorded in the changelog
+CDC_TABLES: dict[str, str] = {
+    "import_permits": "id",
+    "import_permit_products": "id",
+    "product_groups": "id",
+    "imports": "source_record_id",
+    "imports_ui": "import_reference",
+    "import_products": "id",
+    "import_suppliers": "id",
+    "product_supplier_links": "id",
+}
+
+# table -> parent-key column also recorded, so a deleted child row can still
+# be traced to its parent (e.g. a removed product line to its permit's month)
+CDC_PARENTS: dict[str, str] = {
+    "import_permit_products": "import_permit_id",
+}
+
+_OPS = (("INSERT", "I", "NEW"), ("UPDATE", "U", "NEW"), ("DELETE", "D", "OLD"))
+
+
+@dataclass(slots=True)
+class Change:
+    seq: int
+    table: str
+    pk: str
+    op: str
+    parent: str | None = None
+
+
+def install_changelog(conn: sqlite3.Connection) -> None:
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            pk TEXT NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT (datetime('now')),
+            parent_pk TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS changelog_cursors (
+            consumer TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        """
+    )
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(changelog)")}
+    if "parent_pk" not in columns:
+        # Changelogs from before parent keys: add the column and recreate the
+        # triggers that should fill it.
+        conn.execute("ALTER TABLE changelog ADD COLUMN parent_pk TEXT")
+        for table in CDC_PARENTS:
+            for _, op, _ in _OPS:
+                conn.execute(f"DROP TRIGGER IF EXISTS trg_changelog_{table}_{op.lower()}")
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table, pk_column in CDC_TABLES.items():
+        if table not in existing:
+            continue
+        parent_column = CDC_PARENTS.get(table)
+        for event, op, ref in _OPS:
+            parent = f"{ref}.{parent_column}" if parent_column else "NULL"
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_changelog_{table}_{op.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO changelog (table_name, pk, op, parent_pk)
+                    VALUES ('{table}', {ref}.{pk_column}, '{op}', {parent});
+                END
+                """
+            )
+    conn.commit()
+
+
+def get_cursor(conn: sqlite3.Connection, consumer: str) -> int | None:
+    row = conn.execute("SELECT seq FROM changelog_cursors WHERE consumer = ?", (consumer,)).fetchone()
+    return int(row[0]) if row else None
+
+
+def set_cursor(conn: sqlite3.Connection, consumer: str, seq: int) -> None:
+    conn.execute(
+        """
+        INSERT INTO changelog_cursors (consumer, seq, updated_at) VALUES (?, ?, datetime('now'))
+        ON CONFLICT(consumer) DO UPDATE SET seq = excluded.seq, updated_at = excluded.updated_at
+        """,
+        (consumer, seq),
+    )
+    conn.commit()
+
+
+def head_seq(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changelog").fetchone()[0])
+
+
+def read_changes(
+    conn: sqlite3.Connection,
+    after_seq: int,
+    *,
+    upto_seq: int | None = None,
+    tables: tuple[str, ...] | None = None,
+) -> list[Change]:
+    """Latest change per (table, pk) in (after_seq, upto_seq], oldest first."""
+    clauses = ["seq > ?"]
+    params: list[object] = [after_seq]
+    if upto_seq is not None:
+        clauses.append("seq <= ?")
+        params.append(upto_seq)
+    if tables:
+        clauses.append(f"table_name IN ({', '.join('?' for _ in tables)})")
+        params.extend(tables)
+    rows = conn.execute(
+        f"""
+        SELECT c.seq, c.table_name, c.pk, c.op, c.parent_pk
+        FROM changelog c
+        JOIN (
+            SELECT MAX(seq) AS seq FROM changelog
+            WHERE {' AND '.join(clauses)}
+            GROUP BY table_name, pk
+        ) latest ON latest.seq = c.seq
+        ORDER BY c.seq
+        """,
+        params,
+    ).fetchall()
+    return [
+        Change(seq=int(seq), table=table, pk=pk, op=op, parent=parent)
+        for seq, table, pk, op, parent in rows
+    ]
+
+
+def prune_changelog(conn: sqlite3.Connection) -> int:
+    """Drop entries every registered consumer has already read."""
+    row = conn.execute("SELECT MIN(seq) FROM changelog_cursors").fetchone()
+    if row is None or row[0] is None:
+        return 0
+    cursor = conn.execute("DELETE FROM changelog WHERE seq <= ?", (int(row[0]),))
+    conn.commit()
+    if cursor.rowcount:
+        logger.info("Pruned %s changelog entries", cursor.rowcount)
+    return cursor.rowcount
@@ -35,6 +35,8 @@ def _cmd_discover(args: argparse.Namespace) -> int:
         settings,
         duration_seconds=args.duration,
         start_url=args.start_url,
+        idle_seconds=args.idle_seconds,
+        target_count=args.target_count,
     )
     print(f"Discovery output: {output}")
     return 0
@@ -63,6 +65,30 @@ def _cmd_capture_api(args: argparse.Namespace) -> int:
     return 0
 
 
+def _cmd_infer_endpoints(args: argparse.Namespace) -> int:
+    from efda_scraper.endpoint_inference import update_endpoints
+
+    settings = load_settings(args.env_file)
+    endpoints = update_endpoints(
+        settings.api_capture_path,
+        settings.api_endpoints_path,
+        rebuild=args.rebuild,
+        top_k=args.top_k or settings.inference_top_k,
+    )
+    print(
+        json.dumps(
+            {
+                "endpoints_path": str(settings.api_endpoints_path),
+                "roles": sorted(k for k in endpoints.keys() if k.startswith("import")),
+                "captured_sessions": endpoints.get("captured_sessions", 0),
+                "captured_event_count": endpoints.get("captured_event_count", 0),
+            },
+            indent=2,
+        )
+    )
+    return 0
+
+
 def _cmd_run(args: argparse.Namespace) -> int:
     from efda_scraper.pipeline import run_imports_collection
 
@@ -76,6 +102,14 @@ def _cmd_run(args: argparse.Namespace) -> int:
     return 0
 
 
+def _cmd_calibrate_page_size(args: argparse.Namespace) -> int:
+    from efda_scraper.pipeline import calibrate_imports_page_size
+
+    settings = load_settings(args.env_file)
+    print(json.dumps(calibrate_imports_page_size(settings), indent=2))
+    return 0
+
+
 def _cmd_run_api(args: argparse.Namespace) -> int:
     from efda_scraper.api_runner import run_api_collection
 
@@ -125,8 +159,20 @@ def build_parser() -> argparse.ArgumentParser:
     login.set_defaults(func=_cmd_login)
 
     discover = subparsers.add_parser("discover", help="Legacy endpoint discovery from browser traffic")
-    discover.add_argument("--duration", type=int, default=30, help="Capture duration in seconds")
+    discover.add_argument("--duration", type=int, default=30, help="Max capture duration in seconds")
     discover.add_argument("--start-url", default=None, help="Optional URL to open after login")
+    discover.add_argument(
+        "--idle-seconds",
+        type=float,
+        default=10.0,
+        help="Stop after this long without a new API call (0 = only stop on duration or target)",
+    )
+    discover.add_argument(
+        "--target-count",
+        type=int,
+        default=None,
+        help="Stop once this many distinct endpoints are recorded",
+    )
     discover.set_defaults(func=_cmd_discover)
 
     capture_api = subparsers.add_parser(
@@ -142,11 +188,25 @@ def build_parser() -> argparse.ArgumentParser:
     capture_api.add_argument("--start-url", default=None, help="Optional URL to open after login")
     capture_api.set_defaults(func=_cmd_capture_api)
 
+    infer = subparsers.add_parser(
+        "infer-endpoints",
+        help="Fold stored capture sessions not seen yet into the endpoint templates",
+    )
+    infer.add_argument("--rebuild", action="store_true", help="Discard saved evidence and re-read every session")
+    infer.add_argument("--top-k", type=int, default=None, help="Candidates kept per role (default from EFDA_INFERENCE_TOP_K)")
+    infer.set_defaults(func=_cmd_infer_endpoints)
+
     run = subparsers.add_parser("run", help="Run legacy endpoint-catalog imports pipeline")
     run.add_argument("--max-pages", type=int, default=None, help="Max pages to fetch")
     run.add_argument("--page-size", type=int, default=None, help="Page size for API")
     run.set_defaults(func=_cmd_run)
 
+    calibrate = subparsers.add_parser(
+        "calibrate-page-size",
+        help="Probe the imports list endpoint for the best page size and store it",
+    )
+    calibrate.set_defaults(func=_cmd_calibrate_page_size)
+
     run_api = subparsers.add_parser(
         "run-api",
         help="Run API-first collection using captured endpoint templates",
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+from collections import deque
+from collections.abc import AsyncIterator, Callable
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
@@ -9,6 +12,11 @@ from typing import Any
 import httpx
 
 from efda_scraper.config import Settings
+from efda_scraper.http_client import create_async_client, create_client
+from efda_scraper.http_telemetry import HttpTelemetry
+from efda_scraper.jsonstream import loads
+from efda_scraper.resilience import RetryBudget, RetryPolicy, is_server_error
+from efda_scraper.singleflight import SingleFlight, request_key
 
 logger = logging.getLogger(__name__)
 
@@ -44,34 +52,134 @@ def _load_storage_state(path: Path) -> dict[str, Any]:
     return json.loads(path.read_text(encoding="utf-8"))
 
 
+def _apply_cookies(client: httpx.Client | httpx.AsyncClient, state: dict[str, Any]) -> None:
+    for cookie in state.get("cookies", []):
+        client.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain"),
+            path=cookie.get("path", "/"),
+        )
+
+
+def _format_request(endpoint: EndpointSpec, fields: dict[str, Any]) -> tuple[str, dict[str, str]]:
+    path = endpoint.path.format(**fields)
+    params = {key: value.format(**fields) for key, value in endpoint.params.items()}
+    return path, params
+
+
 class PortalClient:
     def __init__(self, settings: Settings) -> None:
         self._settings = settings
         self._state = _load_storage_state(settings.storage_state_path)
-        self._client = httpx.Client(
+        self.bytes_received = 0
+        self.telemetry = HttpTelemetry()
+        self._client = create_client(
             base_url=settings.base_url,
             timeout=settings.request_timeout_seconds,
+            http2=settings.http2,
+            keepalive_expiry=settings.http_keepalive_seconds,
+            telemetry=self.telemetry,
         )
-
-        for cookie in self._state.get("cookies", []):
-            self._client.cookies.set(
-                cookie["name"],
-                cookie["value"],
-                domain=cookie.get("domain"),
-                path=cookie.get("path", "/"),
-            )
+        _apply_cookies(self._client, self._state)
 
     def close(self) -> None:
         self._client.close()
 
     def request(self, endpoint: EndpointSpec, *, fields: dict[str, Any] | None = None) -> dict[str, Any] | list[Any]:
-        fields = fields or {}
-
-        path = endpoint.path.format(**fields)
-        params = {key: value.format(**fields) for key, value in endpoint.params.items()}
+        path, params = _format_request(endpoint, fields or {})
 
         logger.info("Requesting %s %s", endpoint.method, path)
         response = self._client.request(endpoint.method, path, params=params)
         response.raise_for_status()
+        self.bytes_received += len(response.content)
+
+        return loads(response.content)
+
 
-        return response.json()
+class AsyncPortalClient:
+    """Async variant of `PortalClient` with a prefetching page iterator."""
+
+    def __init__(self, settings: Settings, *, concurrency: int = 1) -> None:
+        self._settings = settings
+        self._state = _load_storage_state(settings.storage_state_path)
+        self.bytes_received = 0
+        self.pages_requested = 0
+        self.telemetry = HttpTelemetry()
+        self.flights = SingleFlight()
+        self.retry_policy = RetryPolicy(
+            budget=RetryBudget(settings.retry_budget_percent / 100), telemetry=self.telemetry
+        )
+        self._client = create_async_client(
+            base_url=settings.base_url,
+            timeout=settings.request_timeout_seconds,
+            concurrency=concurrency,
+            http2=settings.http2,
+            keepalive_expiry=settings.http_keepalive_seconds,
+            telemetry=self.telemetry,
+            retries=0,
+        )
+        _apply_cookies(self._client, self._state)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def request(self, endpoint: EndpointSpec, *, fields: dict[str, Any] | None = None) -> dict[str, Any] | list[Any]:
+        """Identical requests already in flight share one network call."""
+        path, params = _format_request(endpoint, fields or {})
+        key = request_key(endpoint.method, f"{path}?{sorted(params.items())}")
+        return await self.flights.do(key, lambda: self._fetch(endpoint.method, path, params))
+
+    async def _fetch(self, method: str, path: str, params: dict[str, str]) -> dict[str, Any] | list[Any]:
+        logger.info("Requesting %s %s", method, path)
+        response = await self.retry_policy.call(
+            method,
+            path,
+            lambda: self._client.request(method, path, params=params),
+            is_failure=lambda response: is_server_error(response.status_code),
+        )
+        response.raise_for_status()
+        self.bytes_received += len(response.content)
+
+        return loads(response.content)
+
+    async def iter_pages(
+        self,
+        endpoint: EndpointSpec,
+        *,
+        page_size: int,
+        max_pages: int,
+        is_empty: Callable[[Any], bool],
+        prefetch: int = 4,
+    ) -> AsyncIterator[tuple[int, dict[str, Any] | list[Any]]]:
+        """Yield `(page, payload)` in page order, keeping up to `prefetch` requests in flight.
+
+        The first page for which `is_empty(payload)` is true is still yielded
+        (so callers can record it) and ends the iteration; requests already
+        prefetched past it are cancelled.  Wrap in `contextlib.aclosing` when
+        breaking out early so those requests are cancelled promptly.
+        """
+        pending: deque[tuple[int, asyncio.Task[Any]]] = deque()
+        next_page = 1
+        try:
+            while True:
+                while next_page <= max_pages and len(pending) < max(1, prefetch):
+                    task = asyncio.create_task(
+                        self.request(endpoint, fields={"page": next_page, "page_size": page_size})
+                    )
+                    pending.append((next_page, task))
+                    self.pages_requested += 1
+                    next_page += 1
+                if not pending:
+                    return
+
+                page, task = pending.popleft()
+                payload = await task
+                yield page, payload
+                if is_empty(payload):
+                    return
+        finally:
+            for _, task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
@@ -36,6 +36,7 @@ class Settings:
     endpoint_catalog_path: Path
     api_capture_path: Path
     api_endpoints_path: Path
+    http_cache_path: Path
     sqlite_path: Path
     raw_output_dir: Path
     headless: bool
@@ -45,14 +46,42 @@ class Settings:
     max_pages: int
     max_imports: int
     api_capture_duration_seconds: int
+    prefetch_pages: int
+    http2: bool
+    http_keepalive_seconds: float
+    http_cache_enabled: bool
+    http_cache_max_bytes: int
+    http_cache_ttl_seconds: float
+    retry_budget_percent: float
+    offload_mode: str
+    cpu_workers: int
+    db_queue_size: int
+    db_batch_size: int
+    db_commit_seconds: float
+    capture_window: int
+    inference_top_k: int
 
 
-def _parse_bool(value: str, *, default: bool) -> bool:
+def parse_bool(value: str | None, *, default: bool) -> bool:
+    """Read an on/off environment value; None (unset) gives `default`."""
     if value is None:
         return default
     return value.strip().lower() in {"1", "true", "yes", "y", "on"}
 
 
+def _capture_dir(path: Path) -> Path:
+    # EFDA_API_CAPTURE_PATH used to name a single JSON file; an .env still
+    # pointing at one (or at any existing file) gets the sibling directory
+    # of the same stem, e.g. api_capture.json -> api_capture/.
+    if path.suffix == ".json" or path.is_file():
+        path = path.with_suffix("")
+    if path.is_file():
+        raise ValueError(
+            f"EFDA_API_CAPTURE_PATH must be a directory for the capture logs, but {path} is a file"
+        )
+    return path
+
+
 def _parse_selector_list(value: str | None, fallback: list[str]) -> list[str]:
     if not value:
         return fallback
@@ -156,10 +185,12 @@ def load_settings(dotenv_path: str = ".env") -> Settings:
             "endpoints.catalog.json",
         )
     )
-    api_capture_path = Path(
-        os.getenv(
-            "EFDA_API_CAPTURE_PATH",
-            "data/state/api_capture.json",
+    api_capture_path = _capture_dir(
+        Path(
+            os.getenv(
+                "EFDA_API_CAPTURE_PATH",
+                "data/state/api_capture",
+            )
         )
     )
     api_endpoints_path = Path(
@@ -168,6 +199,12 @@ def load_settings(dotenv_path: str = ".env") -> Settings:
             "data/state/api_endpoints.json",
         )
     )
+    http_cache_path = Path(
+        os.getenv(
+            "EFDA_HTTP_CACHE_PATH",
+            "data/cache/http_cache.sqlite3",
+        )
+    )
     sqlite_path = Path(
         os.getenv(
             "EFDA_SQLITE_PATH",
@@ -181,13 +218,27 @@ def load_settings(dotenv_path: str = ".env") -> Settings:
         )
     )
 
-    headless = _parse_bool(os.getenv("EFDA_HEADLESS", "true"), default=True)
-    strict_login_check = _parse_bool(os.getenv("EFDA_STRICT_LOGIN_CHECK", "true"), default=True)
+    headless = parse_bool(os.getenv("EFDA_HEADLESS", "true"), default=True)
+    strict_login_check = parse_bool(os.getenv("EFDA_STRICT_LOGIN_CHECK", "true"), default=True)
     request_timeout_seconds = float(os.getenv("EFDA_REQUEST_TIMEOUT_SECONDS", "30"))
     page_size = int(os.getenv("EFDA_PAGE_SIZE", "100"))
     max_pages = int(os.getenv("EFDA_MAX_PAGES", "100"))
     max_imports = int(os.getenv("EFDA_MAX_IMPORTS", "0"))
     api_capture_duration_seconds = int(os.getenv("EFDA_API_CAPTURE_DURATION_SECONDS", "45"))
+    prefetch_pages = int(os.getenv("EFDA_PREFETCH_PAGES", "4"))
+    http2 = parse_bool(os.getenv("EFDA_HTTP2"), default=True)
+    http_keepalive_seconds = float(os.getenv("EFDA_HTTP_KEEPALIVE_SECONDS", "30"))
+    http_cache_enabled = parse_bool(os.getenv("EFDA_HTTP_CACHE"), default=True)
+    http_cache_max_bytes = int(float(os.getenv("EFDA_HTTP_CACHE_MAX_MB", "512")) * 1024 * 1024)
+    http_cache_ttl_seconds = float(os.getenv("EFDA_HTTP_CACHE_TTL_HOURS", "24")) * 3600
+    retry_budget_percent = float(os.getenv("EFDA_RETRY_BUDGET_PERCENT", "20"))
+    offload_mode = os.getenv("EFDA_OFFLOAD", "process").strip().lower()
+    cpu_workers = int(os.getenv("EFDA_CPU_WORKERS", "0"))
+    db_queue_size = int(os.getenv("EFDA_DB_QUEUE_SIZE", "1000"))
+    db_batch_size = int(os.getenv("EFDA_DB_BATCH_SIZE", "200"))
+    db_commit_seconds = float(os.getenv("EFDA_DB_COMMIT_SECONDS", "1"))
+    capture_window = int(os.getenv("EFDA_CAPTURE_WINDOW", "256"))
+    inference_top_k = int(os.getenv("EFDA_INFERENCE_TOP_K", "5"))
 
     return Settings(
         base_url=base_url,
@@ -206,6 +257,7 @@ def load_settings(dotenv_path: str = ".env") -> Settings:
         endpoint_catalog_path=endpoint_catalog_path,
         api_capture_path=api_capture_path,
         api_endpoints_path=api_endpoints_path,
+        http_cache_path=http_cache_path,
         sqlite_path=sqlite_path,
         raw_output_dir=raw_output_dir,
         headless=headless,
@@ -215,4 +267,18 @@ def load_settings(dotenv_path: str = ".env") -> Settings:
         max_pages=max_pages,
         max_imports=max_imports,
         api_capture_duration_seconds=api_capture_duration_seconds,
+        prefetch_pages=prefetch_pages,
+        http2=http2,
+        http_keepalive_seconds=http_keepalive_seconds,
+        http_cache_enabled=http_cache_enabled,
+        http_cache_max_bytes=http_cache_max_bytes,
+        http_cache_ttl_seconds=http_cache_ttl_seconds,
+        retry_budget_percent=retry_budget_percent,
+        offload_mode=offload_mode,
+        cpu_workers=cpu_workers,
+        db_queue_size=db_queue_size,
+        db_batch_size=db_batch_size,
+        db_commit_seconds=db_commit_seconds,
+        capture_window=capture_window,
+        inference_top_k=inference_top_k,
     )
@@ -7,22 +7,35 @@ import time
 from pathlib import Path
 from typing import Any
 
-from playwright.async_api import Page, Response, async_playwright
+from playwright.async_api import Response, async_playwright
 
 from efda_scraper.config import Settings
 
 logger = logging.getLogger(__name__)
 
+_DISCOVERY_URL_TOKENS = ("api", "import", "medicine", "permit", "eris")
+PREVIEW_CHARS = 1000
+DEFAULT_MAX_BODY_BYTES = 256 * 1024
+DEFAULT_IDLE_SECONDS = 10.0
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 256
 
-async def _response_summary(response: Response) -> dict[str, Any]:
+
+async def _response_summary(response: Response, max_body_bytes: int = DEFAULT_MAX_BODY_BYTES) -> dict[str, Any]:
     content_type = response.headers.get("content-type", "")
     body_preview = ""
     if "application/json" in content_type:
-        try:
-            body_preview = await response.text()
-            body_preview = body_preview[:1000]
-        except Exception:
-            body_preview = "<unavailable>"
+        # Playwright cannot read part of a body, so skip bodies that announce
+        # a size over the cap and decode only the preview of the rest.
+        length = response.headers.get("content-length", "")
+        if length.isdigit() and int(length) > max_body_bytes:
+            body_preview = f"<skipped: {length} bytes>"
+        else:
+            try:
+                body = await response.body()
+                body_preview = body[: PREVIEW_CHARS * 4].decode("utf-8", errors="replace")[:PREVIEW_CHARS]
+            except Exception:
+                body_preview = "<unavailable>"
     return {
         "url": response.url,
         "status": response.status,
@@ -33,16 +46,102 @@ async def _response_summary(response: Response) -> dict[str, Any]:
     }
 
 
+class DiscoveryRecorder:
+    """Records one summary per distinct (method, url) response on a bounded worker pool.
+
+    The page's response handler only filters, de-duplicates and enqueues;
+    `workers` tasks read the bodies.  When `max_queue` responses are
+    waiting, further ones are dropped and counted rather than buffered.
+    `wait()` returns once `target_count` endpoints are recorded, once no
+    new matching response has arrived for `idle_seconds` (after the first
+    one), or after `max_seconds`, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = DEFAULT_WORKERS,
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+    ) -> None:
+        self.max_body_bytes = max_body_bytes
+        self.found: dict[tuple[str, str], dict[str, Any]] = {}
+        self.dropped = 0
+        self._queued: set[tuple[str, str]] = set()
+        self._queue: asyncio.Queue[Response] = asyncio.Queue(maxsize=max_queue)
+        self._activity = asyncio.Event()
+        self._last_activity: float | None = None
+        self._workers = [asyncio.create_task(self._work()) for _ in range(workers)]
+
+    def on_response(self, response: Response) -> None:
+        url = response.url.lower()
+        if not any(token in url for token in _DISCOVERY_URL_TOKENS):
+            return
+        key = (response.request.method, response.url)
+        if key in self._queued:
+            return
+        try:
+            self._queue.put_nowait(response)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+        self._queued.add(key)
+        self._last_activity = time.monotonic()
+        self._activity.set()
+
+    async def _work(self) -> None:
+        while True:
+            response = await self._queue.get()
+            try:
+                self.found[(response.request.method, response.url)] = await _response_summary(
+                    response, self.max_body_bytes
+                )
+            except Exception as exc:
+                logger.debug("Could not summarize %s: %s", response.url, exc)
+            finally:
+                self._queue.task_done()
+            self._activity.set()
+
+    async def wait(self, *, max_seconds: float, idle_seconds: float, target_count: int | None) -> str:
+        """Block until a stop condition holds; returns which one ("target", "idle" or "duration")."""
+        deadline = time.monotonic() + max_seconds
+        while True:
+            now = time.monotonic()
+            if target_count and len(self.found) >= target_count:
+                return "target"
+            timeout = deadline - now
+            if idle_seconds > 0 and self._last_activity is not None:
+                idle_left = self._last_activity + idle_seconds - now
+                if idle_left <= 0 and self._queue.empty():
+                    return "idle"
+                timeout = min(timeout, max(idle_left, 0.1))
+            if deadline <= now:
+                return "duration"
+            self._activity.clear()
+            try:
+                await asyncio.wait_for(self._activity.wait(), timeout=timeout)
+            except TimeoutError:
+                pass
+
+    async def close(self) -> None:
+        """Finish the queued responses, then stop the workers."""
+        await self._queue.join()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+
 async def discover_endpoints(
     settings: Settings,
     duration_seconds: int = 30,
     start_url: str | None = None,
+    *,
+    idle_seconds: float = DEFAULT_IDLE_SECONDS,
+    target_count: int | None = None,
 ) -> Path:
     destination = settings.storage_state_path.parent / "discovered_endpoints.json"
     destination.parent.mkdir(parents=True, exist_ok=True)
 
-    found: list[dict[str, Any]] = []
-
     async with async_playwright() as playwright:
         browser = await playwright.chromium.launch(headless=False)
         context = await browser.new_context(
@@ -52,40 +151,56 @@ async def discover_endpoints(
         )
         page = await context.new_page()
 
-        async def handle_response(response: Response) -> None:
-            url = response.url.lower()
-            if any(token in url for token in ("api", "import", "medicine", "permit", "eris")):
-                found.append(await _response_summary(response))
-
-        page.on("response", lambda resp: asyncio.create_task(handle_response(resp)))
+        recorder = DiscoveryRecorder()
+        page.on("response", recorder.on_response)
 
         target_url = start_url or settings.base_url
-        logger.info("Opening %s and recording network calls for %ss", target_url, duration_seconds)
-        await page.goto(target_url, wait_until="domcontentloaded")
-
-        started = time.time()
-        while time.time() - started < duration_seconds:
-            await page.wait_for_timeout(500)
+        logger.info(
+            "Opening %s and recording network calls for up to %ss (stops after %ss without new calls)",
+            target_url,
+            duration_seconds,
+            idle_seconds,
+        )
+        try:
+            await page.goto(target_url, wait_until="domcontentloaded")
+            stop_reason = await recorder.wait(
+                max_seconds=duration_seconds,
+                idle_seconds=idle_seconds,
+                target_count=target_count,
+            )
+        finally:
+            await recorder.close()
 
         await context.close()
         await browser.close()
 
-    unique_by_url: dict[tuple[str, str], dict[str, Any]] = {}
-    for item in found:
-        key = (item["method"], item["url"])
-        if key not in unique_by_url:
-            unique_by_url[key] = item
-
     payload = {
         "captured_at": int(time.time()),
-        "count": len(unique_by_url),
-        "items": sorted(unique_by_url.values(), key=lambda x: x["url"]),
+        "count": len(recorder.found),
+        "stop_reason": stop_reason,
+        "dropped": recorder.dropped,
+        "items": sorted(recorder.found.values(), key=lambda x: x["url"]),
     }
     destination.write_text(json.dumps(payload, indent=2), encoding="utf-8")
-    logger.info("Wrote endpoint discovery file: %s", destination)
+    logger.info("Wrote endpoint discovery file: %s (%s)", destination, stop_reason)
 
     return destination
 
 
-def discover_sync(settings: Settings, duration_seconds: int = 30, start_url: str | None = None) -> Path:
-    return asyncio.run(discover_endpoints(settings, duration_seconds=duration_seconds, start_url=start_url))
+def discover_sync(
+    settings: Settings,
+    duration_seconds: int = 30,
+    start_url: str | None = None,
+    *,
+    idle_seconds: float = DEFAULT_IDLE_SECONDS,
+    target_count: int | None = None,
+) -> Path:
+    return asyncio.run(
+        discover_endpoints(
+            settings,
+            duration_seconds=duration_seconds,
+            start_url=start_url,
+            idle_seconds=idle_seconds,
+            target_count=target_count,
+        )
+    )
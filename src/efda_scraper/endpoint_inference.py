@@ -0,0 +1,419 @@
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import os
+import re
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+from urllib.parse import ParseResult, parse_qs, urlparse, urlunparse
+
+from efda_scraper.capture_log import iter_events, session_logs
+
+logger = logging.getLogger(__name__)
+
+_CAPTURE_URL_TOKENS = ("api", "import", "supplier", "product", "permit", "medicine", "eris")
+_PAGE_KEYS = {"page", "pageindex", "pagenumber", "currentpage", "skip", "offset", "start"}
+_PAGE_SIZE_KEYS = {"pagesize", "size", "limit", "take", "maxresultcount", "length"}
+_ID_KEYS = {"id", "importid", "requestid", "applicationid", "permitid"}
+_HEADER_WHITELIST = {"accept", "content-type", "x-requested-with"}
+_ID_SEGMENT = re.compile(r"[0-9a-fA-F-]{16,}")
+
+ROLES = ("imports_list", "import_detail", "import_products", "import_suppliers")
+MIN_ROLE_SCORE = 20.0
+DEFAULT_TOP_K = 5
+STATE_VERSION = 1
+STATE_FILE = "inference.json"
+
+
+def _looks_like_api(url: str) -> bool:
+    text = url.lower()
+    return any(token in text for token in _CAPTURE_URL_TOKENS)
+
+
+def _extract_records(payload: Any) -> list[dict[str, Any]]:
+    if isinstance(payload, list):
+        return [item for item in payload if isinstance(item, dict)]
+    if isinstance(payload, dict):
+        for key in ("items", "results", "records", "data", "content", "value"):
+            value = payload.get(key)
+            if isinstance(value, list):
+                return [item for item in value if isinstance(item, dict)]
+    return []
+
+
+def _record_identifiers(records: list[dict[str, Any]]) -> tuple[str | None, str | None]:
+    if not records:
+        return None, None
+    first = records[0]
+    import_id = None
+    import_reference = None
+    for key in ("id", "importId", "import_id", "requestId", "applicationId"):
+        if key in first and first[key] not in (None, ""):
+            import_id = str(first[key])
+            break
+    for key in ("reference", "referenceNo", "referenceNumber", "permitNo", "permitNumber"):
+        if key in first and first[key] not in (None, ""):
+            import_reference = str(first[key])
+            break
+    return import_id, import_reference
+
+
+def _key_placeholder(key: str) -> str | None:
+    lower = key.lower()
+    if lower in _PAGE_KEYS:
+        return "{page}"
+    if lower in _PAGE_SIZE_KEYS:
+        return "{page_size}"
+    if lower in _ID_KEYS or ("import" in lower and "id" in lower):
+        return "{import_id}"
+    if "reference" in lower or "permit" in lower:
+        return "{import_reference}"
+    return None
+
+
+def _template_json_value(value: Any, key_hint: str | None = None) -> Any:
+    if isinstance(value, dict):
+        return {key: _template_json_value(sub, key) for key, sub in value.items()}
+    if isinstance(value, list):
+        return [_template_json_value(item, key_hint) for item in value]
+    if key_hint is not None:
+        ph = _key_placeholder(key_hint)
+        if ph is not None:
+            return ph
+    return value
+
+
+def _templated_path(path: str) -> str:
+    """`path` with numeric and long hex/uuid segments replaced by `{import_id}`."""
+    return "/".join(
+        "{import_id}" if segment and (segment.isdigit() or _ID_SEGMENT.fullmatch(segment)) else segment
+        for segment in path.split("/")
+    )
+
+
+@dataclass(slots=True)
+class _Features:
+    """What scoring and templating need from one event, extracted once."""
+
+    url: str
+    method: str
+    parsed: ParseResult
+    query: dict[str, list[str]]
+    records: list[dict[str, Any]]
+    payload_is_dict: bool
+    has_page_key: bool
+    has_page_size_key: bool
+    has_id_field: bool
+    has_reference_field: bool
+
+    def key(self, role: str) -> str:
+        """Identity of the endpoint this event would template to for `role`."""
+        path = self.parsed.path if role == "imports_list" else _templated_path(self.parsed.path)
+        return f"{self.method} {self.parsed.scheme}://{self.parsed.netloc}{path}?{','.join(sorted(self.query))}"
+
+
+def _features(event: dict[str, Any]) -> _Features:
+    url = event["url"]
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query, keep_blank_values=True)
+    query_keys = {key.lower() for key in query}
+    payload = event.get("response_json")
+    records = _extract_records(payload)
+    first_keys = {str(k).lower() for k in records[0]} if records else set()
+    return _Features(
+        url=url.lower(),
+        method=event.get("method") or "GET",
+        parsed=parsed,
+        query=query,
+        records=records,
+        payload_is_dict=isinstance(payload, dict),
+        has_page_key=not query_keys.isdisjoint(_PAGE_KEYS),
+        has_page_size_key=not query_keys.isdisjoint(_PAGE_SIZE_KEYS),
+        has_id_field=any("id" in key for key in first_keys),
+        has_reference_field=any("reference" in key or "permit" in key for key in first_keys),
+    )
+
+
+def _score_imports_list(f: _Features) -> float:
+    score = 0.0
+    if f.records:
+        score += 50
+    if "import" in f.url:
+        score += 25
+    if "product" in f.url or "supplier" in f.url:
+        score -= 25
+    if f.method in {"GET", "POST"}:
+        score += 5
+    if f.has_page_key:
+        score += 10
+    if f.has_page_size_key:
+        score += 10
+    if f.records:
+        if f.has_id_field:
+            score += 8
+        if f.has_reference_field:
+            score += 8
+    return score
+
+
+def _score_role(f: _Features, role: str) -> float:
+    if role == "imports_list":
+        return _score_imports_list(f)
+    score = 0.0
+    if role == "import_products":
+        if "product" in f.url:
+            score += 40
+        if "import" in f.url:
+            score += 10
+        if "supplier" in f.url:
+            score -= 10
+        if f.records:
+            score += 30
+    elif role == "import_suppliers":
+        if "supplier" in f.url:
+            score += 40
+        if "import" in f.url:
+            score += 10
+        if "product" in f.url:
+            score -= 10
+        if f.records:
+            score += 30
+    elif role == "import_detail":
+        if "import" in f.url:
+            score += 25
+        if f.payload_is_dict:
+            score += 25
+        if f.records:
+            score -= 15
+    if f.method in {"GET", "POST"}:
+        score += 5
+    return score
+
+
+def _template_from_event(event: dict[str, Any], f: _Features, *, role: str) -> dict[str, Any]:
+    parsed = f.parsed
+    path_template = parsed.path if role == "imports_list" else _templated_path(parsed.path)
+
+    params_template: dict[str, str] = {}
+    for key, values in f.query.items():
+        value = values[0] if values else ""
+        params_template[key] = _key_placeholder(key) or value
+
+    request_json = event.get("request_json")
+    json_template: Any | None = None
+    if request_json is not None:
+        json_template = _template_json_value(request_json)
+
+    request_headers = {str(k): str(v) for k, v in (event.get("request_headers") or {}).items()}
+    headers_template = {
+        key: value
+        for key, value in request_headers.items()
+        if key.lower() in _HEADER_WHITELIST and value not in ("", "<redacted>")
+    }
+
+    return {
+        "method": event["method"],
+        "url": urlunparse((parsed.scheme, parsed.netloc, path_template, "", "", "")),
+        "params": params_template,
+        "json": json_template,
+        "headers": headers_template,
+        "sample_url": event["url"],
+        "sample_status": event.get("status"),
+    }
+
+
+@dataclass(slots=True)
+class Candidate:
+    """Evidence for one endpoint template in one role, merged across sessions."""
+
+    key: str
+    score: float
+    hits: int
+    sessions: int
+    last_session: str
+    template: dict[str, Any]
+    import_id: str | None = None
+    import_reference: str | None = None
+
+    def rank(self) -> tuple[float, int, str]:
+        return self.score, self.hits, self.last_session
+
+
+def infer_session(
+    events: Iterable[dict[str, Any]],
+    session: str,
+    *,
+    top_k: int = DEFAULT_TOP_K,
+) -> tuple[dict[str, list[Candidate]], int]:
+    """Score one session's events in a single pass.
+
+    Features are extracted once per event; the role scores reuse them.
+    Events that template to the same endpoint are folded into one
+    candidate (best score, hit count), so memory grows with distinct
+    endpoints, not events.  Returns the top `top_k` candidates per role
+    and the number of events read.
+    """
+    by_role: dict[str, dict[str, Candidate]] = {role: {} for role in ROLES}
+    event_count = 0
+    for event in events:
+        event_count += 1
+        status = event.get("status")
+        if not (
+            isinstance(status, int)
+            and status < 400
+            and event.get("response_json") is not None
+            and _looks_like_api(event.get("url", ""))
+        ):
+            continue
+        f = _features(event)
+        for role, candidates in by_role.items():
+            score = _score_role(f, role)
+            key = f.key(role)
+            candidate = candidates.get(key)
+            if candidate is not None:
+                candidate.hits += 1
+                if score <= candidate.score:
+                    continue
+                candidate.score = score
+            else:
+                candidate = candidates[key] = Candidate(key, score, 1, 1, session, {})
+            candidate.template = _template_from_event(event, f, role=role)
+            if role == "imports_list":
+                candidate.import_id, candidate.import_reference = _record_identifiers(f.records)
+
+    top = {
+        role: heapq.nlargest(top_k, candidates.values(), key=Candidate.rank)
+        for role, candidates in by_role.items()
+    }
+    return top, event_count
+
+
+class EndpointInference:
+    """Endpoint evidence accumulated over capture sessions, persisted between runs.
+
+    The state file (`inference.json` in the capture directory) keeps the
+    top `top_k` candidates per role and the names of the session logs
+    already folded in.  `update()` reads only session logs it has not seen,
+    so re-inferring after a new capture costs one pass over that capture.
+    A candidate seen in several sessions keeps its best score and sums its
+    hits; ties rank by hits, then by the most recent session.  `top_k`
+    comes from `Settings.inference_top_k`.
+    """
+
+    def __init__(self, capture_dir: Path, *, top_k: int = DEFAULT_TOP_K) -> None:
+        self.capture_dir = capture_dir
+        self.state_path = capture_dir / STATE_FILE
+        self.top_k = top_k
+        self.sessions: list[str] = []
+        self.event_count = 0
+        self.candidates: dict[str, list[Candidate]] = {role: [] for role in ROLES}
+
+    def load(self) -> None:
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if state.get("version") != STATE_VERSION:
+            logger.info("Ignoring inference state %s with another version", self.state_path)
+            return
+        self.sessions = list(state.get("sessions", []))
+        self.event_count = int(state.get("event_count", 0))
+        for role in ROLES:
+            self.candidates[role] = [Candidate(**item) for item in state.get("candidates", {}).get(role, [])]
+
+    def save(self) -> None:
+        state = {
+            "version": STATE_VERSION,
+            "sessions": self.sessions,
+            "event_count": self.event_count,
+            "candidates": {role: [asdict(c) for c in candidates] for role, candidates in self.candidates.items()},
+        }
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    def merge(self, session_top: dict[str, list[Candidate]]) -> None:
+        for role, fresh in session_top.items():
+            merged = {candidate.key: candidate for candidate in self.candidates[role]}
+            for candidate in fresh:
+                known = merged.get(candidate.key)
+                if known is None:
+                    merged[candidate.key] = candidate
+                    continue
+                hits = known.hits + candidate.hits
+                sessions = known.sessions + 1
+                if candidate.score >= known.score:
+                    known = merged[candidate.key] = candidate
+                known.hits = hits
+                known.sessions = sessions
+                known.last_session = max(known.last_session, candidate.last_session)
+            self.candidates[role] = heapq.nlargest(self.top_k, merged.values(), key=Candidate.rank)
+
+    def update(self) -> list[str]:
+        """Fold in every session log not seen yet; returns their names."""
+        seen = set(self.sessions)
+        added: list[str] = []
+        for log_path in session_logs(self.capture_dir):
+            if log_path.name in seen:
+                continue
+            session_top, event_count = infer_session(iter_events(log_path), log_path.name, top_k=self.top_k)
+            self.merge(session_top)
+            self.event_count += event_count
+            self.sessions.append(log_path.name)
+            added.append(log_path.name)
+        return added
+
+    def endpoints(self) -> dict[str, Any]:
+        """The `api_endpoints.json` document for the current evidence."""
+        if not self.candidates["imports_list"]:
+            return {}
+        imports_list = self.candidates["imports_list"][0]
+        endpoints: dict[str, Any] = {"imports_list": imports_list.template}
+        for role in ROLES[1:]:
+            ranked = self.candidates[role]
+            if ranked and ranked[0].score >= MIN_ROLE_SCORE:
+                endpoints[role] = ranked[0].template
+        endpoints["sample_fields"] = {
+            "page": 1,
+            "page_size": 50,
+            "import_id": imports_list.import_id,
+            "import_reference": imports_list.import_reference,
+        }
+        endpoints["captured_event_count"] = self.event_count
+        endpoints["captured_sessions"] = len(self.sessions)
+        return endpoints
+
+
+def update_endpoints(
+    capture_dir: Path,
+    endpoints_path: Path,
+    *,
+    rebuild: bool = False,
+    top_k: int = DEFAULT_TOP_K,
+) -> dict[str, Any]:
+    """Fold new capture sessions into the saved evidence and rewrite `endpoints_path`.
+
+    With `rebuild`, the saved evidence is discarded and every session log
+    in `capture_dir` is read again.
+    """
+    inference = EndpointInference(capture_dir, top_k=top_k)
+    if not rebuild:
+        inference.load()
+    added = inference.update()
+    endpoints = inference.endpoints()
+    if added or rebuild:
+        capture_dir.mkdir(parents=True, exist_ok=True)
+        inference.save()
+    endpoints_path.parent.mkdir(parents=True, exist_ok=True)
+    endpoints_path.write_text(json.dumps(endpoints, indent=2), encoding="utf-8")
+    logger.info(
+        "Inferred endpoints from %d new of %d capture sessions: %s",
+        len(added),
+        len(inference.sessions),
+        endpoints_path,
+    )
+    return endpoints
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from collections.abc import Hashable, Mapping
+from typing import Any
+
+DEFAULT_MAX_SHAPES = 256
+
+
+class FieldPlanner:
+    """Compiles, once per row shape, which keys each output field reads.
+
+    `fields` maps an output field to its key spec.  With `substring=False`
+    the spec is a list of exact keys in priority order; with `substring=True`
+    it is a list of lower-case tokens and every key containing one of them
+    is a candidate, in the row's own key order.  Rows from one endpoint
+    share a key set, so the candidate lookup runs once per shape and each
+    row only does direct `row[key]` reads.  The plan cache holds at most
+    `max_shapes` shapes and starts over when full.  A planner usually lives
+    for the whole process, so a run reports its own counters via
+    `snapshot()` and `summary(since)`.
+    """
+
+    def __init__(
+        self,
+        fields: Mapping[str, tuple[str, ...]],
+        *,
+        substring: bool = False,
+        max_shapes: int = DEFAULT_MAX_SHAPES,
+    ) -> None:
+        self.fields = tuple(fields)
+        self._specs = tuple(fields.values())
+        self.substring = substring
+        self.max_shapes = max_shapes
+        self._plans: dict[tuple[Hashable, ...], tuple[tuple[Hashable, ...], ...]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def plan(self, row: Mapping[Hashable, Any]) -> tuple[tuple[Hashable, ...], ...]:
+        """Candidate keys per field for rows shaped like `row`."""
+        shape = tuple(row)
+        plan = self._plans.get(shape)
+        if plan is not None:
+            self.hits += 1
+            return plan
+        self.misses += 1
+        if self.substring:
+            # Later keys win on case-insensitive collisions but keep the
+            # first one's position, matching a lower-cased dict of the row.
+            by_lower: dict[str, Hashable] = {}
+            for key in shape:
+                by_lower[str(key).lower()] = key
+            plan = tuple(
+                tuple(key for lower, key in by_lower.items() if any(token in lower for token in spec))
+                for spec in self._specs
+            )
+        else:
+            present = set(shape)
+            plan = tuple(tuple(key for key in spec if key in present) for spec in self._specs)
+        if len(self._plans) >= self.max_shapes:
+            self._plans.clear()
+        self._plans[shape] = plan
+        return plan
+
+    def values(self, row: Mapping[Hashable, Any]) -> list[Any]:
+        """First value per field that is neither None nor empty string."""
+        out: list[Any] = []
+        for keys in self.plan(row):
+            found = None
+            for key in keys:
+                value = row[key]
+                if value is not None and value != "":
+                    found = value
+                    break
+            out.append(found)
+        return out
+
+    def texts(self, row: Mapping[Hashable, Any]) -> list[str | None]:
+        """First candidate per field whose `str()` is non-blank, stripped."""
+        out: list[str | None] = []
+        for keys in self.plan(row):
+            found = None
+            for key in keys:
+                text = str(row[key]).strip()
+                if text:
+                    found = text
+                    break
+            out.append(found)
+        return out
+
+    def snapshot(self) -> tuple[int, int]:
+        """Current (hits, misses), to pass to `summary()` later."""
+        return self.hits, self.misses
+
+    def summary(self, since: tuple[int, int] = (0, 0)) -> dict[str, int]:
+        """Plan cache counters; with `since`, only those counted after that `snapshot()`."""
+        return {"shapes": len(self._plans), "hits": self.hits - since[0], "misses": self.misses - since[1]}
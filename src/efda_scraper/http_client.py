@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+import httpx
+
+from efda_scraper.http_telemetry import HttpTelemetry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_SECONDS = 120.0
+DEFAULT_KEEPALIVE_EXPIRY_SECONDS = 30.0
+CONNECT_RETRIES = 3
+
+_warned_no_h2 = False
+
+
+def _http2_enabled(requested: bool) -> bool:
+    """Resolve the HTTP/2 switch (`Settings.http2`, default on).
+
+    HTTP/2 needs the `h2` package (`httpx[http2]`); without it we fall back
+    to HTTP/1.1 keep-alive instead of failing.
+    """
+    global _warned_no_h2
+    if not requested:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        if not _warned_no_h2:
+            logger.warning("HTTP/2 requested but the `h2` package is missing; using HTTP/1.1")
+            _warned_no_h2 = True
+        return False
+    return True
+
+
+def build_limits(concurrency: int, keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY_SECONDS) -> httpx.Limits:
+    """Pool sized to the caller's concurrency so every in-flight request can
+    keep its connection alive instead of re-handshaking TLS."""
+    size = max(1, concurrency)
+    return httpx.Limits(
+        max_connections=size,
+        max_keepalive_connections=size,
+        keepalive_expiry=keepalive_expiry,
+    )
+
+
+def _client_kwargs(
+    *,
+    base_url: str | None,
+    timeout: float,
+    headers: dict[str, str] | None,
+    telemetry: HttpTelemetry | None,
+    async_hooks: bool,
+) -> dict[str, Any]:
+    kwargs: dict[str, Any] = {"timeout": timeout}
+    if base_url is not None:
+        kwargs["base_url"] = base_url
+    if headers:
+        kwargs["headers"] = headers
+    if telemetry is not None:
+        kwargs["event_hooks"] = telemetry.async_hooks() if async_hooks else telemetry.hooks()
+    return kwargs
+
+
+def create_client(
+    *,
+    base_url: str | None = None,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    concurrency: int = 1,
+    http2: bool = True,
+    keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY_SECONDS,
+    headers: dict[str, str] | None = None,
+    telemetry: HttpTelemetry | None = None,
+    retries: int = CONNECT_RETRIES,
+) -> httpx.Client:
+    """Synchronous client on the shared tuned transport.
+
+    Compression is negotiated by httpx itself: `Accept-Encoding` advertises
+    every decoder that is installed (gzip/deflate, plus br with `brotli`).
+    `retries` are transport-level connect retries; pass 0 when the caller
+    retries through a `resilience.RetryPolicy`.
+    """
+    transport = httpx.HTTPTransport(
+        retries=retries,
+        http2=_http2_enabled(http2),
+        limits=build_limits(concurrency, keepalive_expiry),
+    )
+    return httpx.Client(
+        transport=transport,
+        **_client_kwargs(base_url=base_url, timeout=timeout, headers=headers, telemetry=telemetry, async_hooks=False),
+    )
+
+
+def create_async_client(
+    *,
+    base_url: str | None = None,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    concurrency: int = 1,
+    http2: bool = True,
+    keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY_SECONDS,
+    headers: dict[str, str] | None = None,
+    telemetry: HttpTelemetry | None = None,
+    retries: int = CONNECT_RETRIES,
+) -> httpx.AsyncClient:
+    """Async counterpart of `create_client`; size `concurrency` to the semaphore."""
+    transport = httpx.AsyncHTTPTransport(
+        retries=retries,
+        http2=_http2_enabled(http2),
+        limits=build_limits(concurrency, keepalive_expiry),
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        **_client_kwargs(base_url=base_url, timeout=timeout, headers=headers, telemetry=telemetry, async_hooks=True),
+    )
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import logging
+import re
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Callable, Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+_EXTENSION_KEY = "efda_telemetry"
+
+
+def endpoint_key(method: str, url: httpx.URL | str) -> str:
+    """`GET /api/ImportPermit/{id}`-style key; numeric path segments are folded."""
+    path = httpx.URL(str(url)).path
+    return f"{method.upper()} {_ID_SEGMENT.sub('/{id}', path)}"
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    # nearest-rank on an already sorted list
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+@dataclass(slots=True)
+class EndpointStats:
+    latencies: list[float] = field(default_factory=list)
+    statuses: Counter[int] = field(default_factory=Counter)
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    new_connections: int = 0
+    reused_connections: int = 0
+    http_versions: Counter[str] = field(default_factory=Counter)
+
+    def summary(self) -> dict[str, Any]:
+        ordered = sorted(self.latencies)
+        completed = self.new_connections + self.reused_connections
+        return {
+            "requests": self.requests,
+            "responses": len(ordered),
+            "failures": self.failures,
+            "retries": self.retries,
+            "status_codes": {str(code): count for code, count in sorted(self.statuses.items())},
+            "latency_ms": {
+                "p50": round(_percentile(ordered, 0.50) * 1000, 1),
+                "p95": round(_percentile(ordered, 0.95) * 1000, 1),
+                "p99": round(_percentile(ordered, 0.99) * 1000, 1),
+                "max": round(ordered[-1] * 1000, 1),
+            }
+            if ordered
+            else None,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "connection_reuse_ratio": round(self.reused_connections / completed, 3) if completed else None,
+            "http_versions": dict(self.http_versions),
+        }
+
+
+@dataclass(slots=True)
+class _InFlight:
+    stats: EndpointStats
+    started: float
+    connects: int = 0
+    transport_retries: int = 0
+
+
+class HttpTelemetry:
+    """Per-endpoint latency, status, retry, byte and connection-reuse counters.
+
+    Collected through httpx event hooks plus the httpcore `trace` request
+    extension, so nothing in the request path changes.  Latency is measured
+    from the request hook until the response body has been fully read, and
+    bytes in are wire (still compressed) bytes.  Pass `hooks()` to an
+    `httpx.Client` or `async_hooks()` to an `httpx.AsyncClient`.
+    """
+
+    def __init__(self) -> None:
+        self.endpoints: dict[str, EndpointStats] = {}
+
+    def _stats(self, key: str) -> EndpointStats:
+        stats = self.endpoints.get(key)
+        if stats is None:
+            stats = self.endpoints[key] = EndpointStats()
+        return stats
+
+    def _start(self, request: httpx.Request) -> _InFlight:
+        stats = self._stats(endpoint_key(request.method, request.url))
+        stats.requests += 1
+        stats.bytes_out += int(request.headers.get("content-length") or 0)
+        flight = _InFlight(stats=stats, started=time.perf_counter())
+        request.extensions[_EXTENSION_KEY] = flight
+        return flight
+
+    @staticmethod
+    def _on_trace(flight: _InFlight, event: str) -> None:
+        if event == "connection.connect_tcp.started":
+            flight.connects += 1
+        elif event == "connection.retry.started":
+            flight.transport_retries += 1
+
+    def _on_response(self, response: httpx.Response) -> _InFlight | None:
+        flight = response.request.extensions.get(_EXTENSION_KEY)
+        if flight is None:
+            return None
+        stats = flight.stats
+        stats.statuses[response.status_code] += 1
+        stats.retries += flight.transport_retries
+        stats.http_versions[response.http_version] += 1
+        if flight.connects:
+            stats.new_connections += 1
+        else:
+            stats.reused_connections += 1
+        return flight
+
+    def _on_body(self, flight: _InFlight, num_bytes: int) -> None:
+        flight.stats.latencies.append(time.perf_counter() - flight.started)
+        flight.stats.bytes_in += num_bytes
+
+    def record_retry(self, method: str, url: httpx.URL | str) -> None:
+        """Count an application-level retry (the caller's own retry loop)."""
+        self._stats(endpoint_key(method, url)).retries += 1
+
+    def record_failure(self, method: str, url: httpx.URL | str) -> None:
+        """Count a request that raised before any response arrived."""
+        self._stats(endpoint_key(method, url)).failures += 1
+
+    # -- hooks -------------------------------------------------------------
+
+    def hooks(self) -> dict[str, list[Callable[..., Any]]]:
+        def on_request(request: httpx.Request) -> None:
+            flight = self._start(request)
+            request.extensions["trace"] = lambda event, info: self._on_trace(flight, event)
+
+        def on_response(response: httpx.Response) -> None:
+            flight = self._on_response(response)
+            if flight is not None:
+                response.stream = _MeteredStream(response.stream, lambda n: self._on_body(flight, n))
+
+        return {"request": [on_request], "response": [on_response]}
+
+    def async_hooks(self) -> dict[str, list[Callable[..., Any]]]:
+        async def on_request(request: httpx.Request) -> None:
+            flight = self._start(request)
+
+            async def trace(event: str, info: dict[str, Any]) -> None:
+                self._on_trace(flight, event)
+
+            request.extensions["trace"] = trace
+
+        async def on_response(response: httpx.Response) -> None:
+            flight = self._on_response(response)
+            if flight is not None:
+                response.stream = _AsyncMeteredStream(response.stream, lambda n: self._on_body(flight, n))
+
+        return {"request": [on_request], "response": [on_response]}
+
+    # -- reporting ---------------------------------------------------------
+
+    def summary(self) -> dict[str, Any]:
+        return {key: stats.summary() for key, stats in sorted(self.endpoints.items())}
+
+    def log_summary(self) -> None:
+        for key, summary in self.summary().items():
+            latency = summary["latency_ms"] or {}
+            logger.info(
+                "%s: n=%s p50=%sms p95=%sms p99=%sms statuses=%s retries=%s failures=%s in=%sB out=%sB reuse=%s",
+                key,
+                summary["requests"],
+                latency.get("p50"),
+                latency.get("p95"),
+                latency.get("p99"),
+                summary["status_codes"],
+                summary["retries"],
+                summary["failures"],
+                summary["bytes_in"],
+                summary["bytes_out"],
+                summary["connection_reuse_ratio"],
+            )
+
+
+class _MeteredStream(httpx.SyncByteStream):
+    def __init__(self, stream: Any, on_close: Callable[[int], None]) -> None:
+        self._stream = stream
+        self._on_close: Callable[[int], None] | None = on_close
+        self._bytes = 0
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._bytes += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        self._stream.close()
+        if self._on_close is not None:
+            self._on_close(self._bytes)
+            self._on_close = None
+
+
+class _AsyncMeteredStream(httpx.AsyncByteStream):
+    def __init__(self, stream: Any, on_close: Callable[[int], None]) -> None:
+        self._stream = stream
+        self._on_close: Callable[[int], None] | None = on_close
+        self._bytes = 0
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self._bytes += len(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+        if self._on_close is not None:
+            self._on_close(self._bytes)
+            self._on_close = None
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+import httpx
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:  # optional: fall back to buffered decoding
+    ijson = None  # type: ignore[assignment]
+    ObjectBuilder = None  # type: ignore[assignment,misc]
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is the fallback backend
+    orjson = None  # type: ignore[assignment]
+
+_SCALAR_EVENTS = frozenset({"string", "number", "boolean", "null"})
+_OPEN_EVENTS = frozenset({"start_map", "start_array"})
+_CLOSE_EVENTS = frozenset({"end_map", "end_array"})
+
+# Errors a caller should treat as "body is not the JSON we expected".
+DECODE_ERRORS: tuple[type[Exception], ...] = (ValueError,)
+if ijson is not None:
+    DECODE_ERRORS += (ijson.JSONError,)
+
+
+def loads(data: bytes | str) -> Any:
+    """Decode a complete JSON document with the fastest available backend."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value: Any) -> str:
+    """Encode `value` as compact JSON text with the fastest available backend."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str).decode("utf-8")
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+class _ResponseReader:
+    """Minimal async file object over `response.aiter_bytes()` for ijson."""
+
+    def __init__(self, response: httpx.Response, sink: list[bytes] | None = None) -> None:
+        self._chunks = response.aiter_bytes()
+        self._buffer = b""
+        self._sink = sink
+
+    async def read(self, size: int = -1) -> bytes:
+        # ijson's C backend copies at most `size` bytes per call, so never
+        # hand back more than it asked for.
+        if not self._buffer:
+            try:
+                self._buffer = await anext(self._chunks)
+            except StopAsyncIteration:
+                return b""
+            if self._sink is not None:
+                self._sink.append(self._buffer)
+        if size < 0 or size >= len(self._buffer):
+            chunk, self._buffer = self._buffer, b""
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+async def aiter_array(
+    response: httpx.Response,
+    key: str,
+    *,
+    meta: dict[str, Any] | None = None,
+    sink: list[bytes] | None = None,
+) -> AsyncIterator[Any]:
+    """Yield the elements of the top-level `key` array while the body streams in.
+
+    `response` must come from `client.send(..., stream=True)` or
+    `client.stream(...)`.  Top-level scalar fields (e.g. `recordsTotal`) are
+    copied into `meta` as they are seen, so they are complete once the
+    iterator is exhausted.  Numbers decode to int/float, as with `json`.
+    Raw (decompressed) body chunks are appended to `sink` when given, e.g. to
+    cache the body.  Without ijson installed the body is buffered and decoded
+    in one go.
+    """
+    if ijson is None:
+        raw = await response.aread()
+        if sink is not None:
+            sink.append(raw)
+        body = loads(raw)
+        if not isinstance(body, dict):
+            return
+        if meta is not None:
+            meta.update({name: value for name, value in body.items() if name != key})
+        for item in body.get(key) or []:
+            yield item
+        return
+
+    item_prefix = f"{key}.item"
+    builder: Any = None
+    depth = 0
+    async for prefix, event, value in ijson.parse_async(_ResponseReader(response, sink), use_float=True):
+        if builder is None:
+            if prefix == item_prefix:
+                if event in _OPEN_EVENTS:
+                    builder = ObjectBuilder()
+                    builder.event(event, value)
+                    depth = 1
+                elif event in _SCALAR_EVENTS:
+                    yield value
+            elif meta is not None and event in _SCALAR_EVENTS and prefix and "." not in prefix:
+                meta[prefix] = value
+            continue
+
+        builder.event(event, value)
+        if event in _OPEN_EVENTS:
+            depth += 1
+        elif event in _CLOSE_EVENTS:
+            depth -= 1
+            if depth == 0:
+                yield builder.value
+                builder = None
+
+
+async def read_array(
+    response: httpx.Response,
+    key: str,
+    *,
+    sink: list[bytes] | None = None,
+) -> tuple[dict[str, Any], list[Any]]:
+    """Collect `aiter_array` into `(meta, items)`."""
+    meta: dict[str, Any] = {}
+    items = [item async for item in aiter_array(response, key, meta=meta, sink=sink)]
+    return meta, items
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+
+def _peak_rss_bytes() -> int | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux.
+    return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+
+
+@dataclass(slots=True)
+class StageStats:
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+
+
+class RunMetrics:
+    """Wall/CPU time per pipeline stage plus run-level resource counters.
+
+    Spans with the same stage name accumulate, so a stage entered once per
+    page reports its total.  `sections` holds extra report blocks (e.g. the
+    HTTP telemetry summary).  Inside async code a span also covers whatever
+    other tasks ran while it was awaiting; time top-level stages (a whole
+    fetch batch, not each request) to keep the numbers additive.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.started_at = datetime.now(UTC).isoformat()
+        self.finished_at: str | None = None
+        self.status = "running"
+        self.stages: dict[str, StageStats] = {}
+        self.counters: dict[str, int] = {}
+        self.sections: dict[str, Any] = {}
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._wall_seconds: float | None = None
+        self._cpu_seconds: float | None = None
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[StageStats]:
+        stats = self.stages.setdefault(stage, StageStats())
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield stats
+        finally:
+            stats.calls += 1
+            stats.wall_seconds += time.perf_counter() - wall_start
+            stats.cpu_seconds += time.process_time() - cpu_start
+
+    def incr(self, counter: str, amount: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def add_bytes(self, amount: int) -> None:
+        self.incr("bytes_downloaded", amount)
+
+    def finish(self, status: str) -> dict[str, Any]:
+        self.status = status
+        self.finished_at = datetime.now(UTC).isoformat()
+        self._wall_seconds = time.perf_counter() - self._wall_start
+        self._cpu_seconds = time.process_time() - self._cpu_start
+        return self.report()
+
+    def report(self) -> dict[str, Any]:
+        wall = self._wall_seconds if self._wall_seconds is not None else time.perf_counter() - self._wall_start
+        cpu = self._cpu_seconds if self._cpu_seconds is not None else time.process_time() - self._cpu_start
+        staged = sum(stats.wall_seconds for stats in self.stages.values())
+        report = {
+            "name": self.name,
+            "status": self.status,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "wall_seconds": round(wall, 3),
+            "cpu_seconds": round(cpu, 3),
+            "peak_rss_bytes": _peak_rss_bytes(),
+            "unaccounted_seconds": round(max(wall - staged, 0.0), 3),
+            "stages": {
+                stage: {key: round(value, 3) if isinstance(value, float) else value for key, value in asdict(stats).items()}
+                for stage, stats in self.stages.items()
+            },
+            "counters": dict(self.counters),
+        }
+        report.update(self.sections)
+        return report
+
+    def write_report(self, directory: Path) -> Path:
+        """Write the run report as JSON, plus a `<name>_latest.json` copy."""
+        directory.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps(self.report(), indent=2, ensure_ascii=True)
+        stamp = self.started_at[:19].replace(":", "").replace("-", "")
+        destination = directory / f"{self.name}_{stamp}.json"
+        destination.write_text(payload, encoding="utf-8")
+        (directory / f"{self.name}_latest.json").write_text(payload, encoding="utf-8")
+        logger.info("Run report written to %s", destination)
+        return destination
+
+    def log_summary(self) -> None:
+        report = self.report()
+        stages = ", ".join(
+            f"{stage}={stats['wall_seconds']:.1f}s" for stage, stats in report["stages"].items()
+        )
+        logger.info(
+            "%s: wall=%.1fs cpu=%.1fs peak_rss=%s bytes_downloaded=%s | %s",
+            self.name,
+            report["wall_seconds"],
+            report["cpu_seconds"],
+            report["peak_rss_bytes"],
+            report["counters"].get("bytes_downloaded", 0),
+            stages,
+        )
+
+
+def ensure_metrics_column(conn: sqlite3.Connection, table: str) -> None:
+    """Add the `metrics_json` column to a run-log table created before it existed."""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if columns and "metrics_json" not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN metrics_json TEXT")
+        conn.commit()
+
+
+def init_scrape_log(conn: sqlite3.Connection) -> None:
+    """Create the `scrape_log` run table used by the scripts/ pipeline stages."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scrape_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT,
+            finished_at TEXT,
+            total_records INTEGER,
+            records_fetched INTEGER,
+            status TEXT,
+            message TEXT,
+            stage TEXT,
+            metrics_json TEXT
+        )
+        """
+    )
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(scrape_log)")}
+    if "stage" not in columns:
+        conn.execute("ALTER TABLE scrape_log ADD COLUMN stage TEXT")
+    conn.commit()
+    ensure_metrics_column(conn, "scrape_log")
@@ -1,16 +1,22 @@
 from __future__ import annotations
 
+import json
+from dataclasses import dataclass
 from datetime import UTC, datetime
-from hashlib import sha256
+from hashlib import blake2b
 from typing import Any
 
-from pydantic import BaseModel, ConfigDict, Field
 
+@dataclass(slots=True)
+class MedicineImportRecord:
+    """One normalized portal record.
 
-class MedicineImportRecord(BaseModel):
-    model_config = ConfigDict(extra="allow")
+    A plain slotted dataclass: values are coerced once by
+    `pipeline.normalize_many`, so construction does no per-field validation.
+    """
 
-    source_record_id: str = Field(description="Stable id from portal record")
+    source_record_id: str  # stable id from the portal record
+    raw: dict[str, Any]
     permit_number: str | None = None
     importer_name: str | None = None
     product_name: str | None = None
@@ -20,16 +26,45 @@ class MedicineImportRecord(BaseModel):
     status: str | None = None
     imported_at: datetime | None = None
     updated_at: datetime | None = None
-    raw: dict[str, Any]
+
+
+_ID_KEYS = ("id", "import_id", "permit_id", "reference_no", "referenceNumber")
+_PLAIN_TYPES = frozenset({str, int, bool, type(None)})
+_INT64_LIMIT = 2**63
+_CANONICAL_JSON = json.JSONEncoder(sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _canonical_numbers(value: Any) -> Any:
+    # Integral floats become ints so 5 and 5.0 hash alike; containers are
+    # copied only along the way to a float.  Floats beyond the 64-bit range
+    # stay floats, as they always have, so their digests do not move.
+    kind = type(value)
+    if kind is dict:
+        return {key: item if type(item) in _PLAIN_TYPES else _canonical_numbers(item) for key, item in value.items()}
+    if kind is list or kind is tuple:
+        return [item if type(item) in _PLAIN_TYPES else _canonical_numbers(item) for item in value]
+    if kind is float and value.is_integer() and abs(value) < _INT64_LIMIT:
+        return int(value)
+    return value
+
+
+def canonical_digest(payload: Any) -> str:
+    """128-bit BLAKE2b of the payload's canonical JSON (keys sorted at every depth, integral floats as ints).
+
+    Always encoded by the stdlib encoder, never orjson: the two format
+    exponent floats differently (``1e-05`` vs ``1e-5``), and orjson is
+    optional, so a digest must not depend on which one is installed.
+    """
+    encoded = _CANONICAL_JSON.encode(_canonical_numbers(payload)).encode("utf-8")
+    return blake2b(encoded, digest_size=16).hexdigest()
 
 
 def stable_record_id(payload: dict[str, Any]) -> str:
-    for key in ("id", "import_id", "permit_id", "reference_no", "referenceNumber"):
+    for key in _ID_KEYS:
         value = payload.get(key)
         if value is not None:
             return str(value)
-    serial = repr(sorted(payload.items())).encode("utf-8")
-    return sha256(serial).hexdigest()
+    return canonical_digest(payload)
 
 
 def now_utc() -> datetime:
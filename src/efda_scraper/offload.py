@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MODES = ("process", "thread", "inline")
+
+
+def _default_workers() -> int:
+    # Leave a core for the event loop and SQLite.
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+class Offloader:
+    """Runs CPU-bound work (decoding, row building) off the event loop.
+
+    `mode` is `process` (default: real parallelism in spawned workers; `fn`
+    and its arguments must be picklable, i.e. module-level functions and
+    plain data), `thread`, or `inline` (run on the loop, for debugging).
+    Callers pass `Settings.offload_mode` and `cpu_workers` (0 picks one
+    less than the cores, at most 4).  At most `max_in_flight` jobs are
+    submitted at once; further callers wait, so a burst of finished
+    responses backpressures the fetchers instead of piling up in the
+    executor queue.
+    """
+
+    def __init__(
+        self,
+        *,
+        mode: str = "process",
+        workers: int = 0,
+        max_in_flight: int | None = None,
+    ) -> None:
+        mode = mode.lower()
+        if mode not in MODES:
+            raise ValueError(f"EFDA_OFFLOAD must be one of {', '.join(MODES)}, got {mode!r}")
+        workers = workers or _default_workers()
+        self.mode = mode
+        self.workers = workers
+        self._executor: Executor | None = None
+        if mode == "process":
+            # Workers start on first use, when the event loop, the SQLite
+            # writer and HTTP threads are already running; forking then can
+            # copy a held lock into the child, so start them fresh instead.
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        elif mode == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="efda-cpu")
+        self._slots = asyncio.Semaphore(max_in_flight or workers * 2)
+        self.jobs = 0
+        self.slot_wait_seconds = 0.0
+
+    async def run(self, fn: Callable[..., T], /, *args: Any) -> T:
+        self.jobs += 1
+        if self._executor is None:
+            return fn(*args)
+        started = time.perf_counter()
+        async with self._slots:
+            self.slot_wait_seconds += time.perf_counter() - started
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self) -> Offloader:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "jobs": self.jobs,
+            "slot_wait_seconds": round(self.slot_wait_seconds, 3),
+        }
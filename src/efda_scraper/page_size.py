@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+import logging
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CANDIDATES = (100, 250, 500, 1000, 2000, 5000)
+DEFAULT_MAX_AGE = timedelta(days=30)
+
+# A probe requests one page of `size` records and returns
+# (records returned, total records the server reports or None).
+Probe = Callable[[int], Awaitable[tuple[int, int | None]]]
+
+
+@dataclass(slots=True)
+class ProbeResult:
+    size: int
+    attempts: int
+    errors: int
+    records: int | None
+    latency_seconds: float | None
+
+    @property
+    def seconds_per_record(self) -> float | None:
+        if not self.records or self.latency_seconds is None:
+            return None
+        return self.latency_seconds / self.records
+
+
+class PageSizeStore:
+    """Calibrated page sizes per endpoint, kept in a small JSON state file."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def _load(self) -> dict[str, Any]:
+        if not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable page-size state at %s", self.path)
+            return {}
+
+    def entry(self, endpoint: str) -> dict[str, Any] | None:
+        return self._load().get(endpoint)
+
+    def get(self, endpoint: str) -> int | None:
+        entry = self.entry(endpoint)
+        return int(entry["page_size"]) if entry else None
+
+    def is_stale(self, endpoint: str, max_age: timedelta = DEFAULT_MAX_AGE) -> bool:
+        entry = self.entry(endpoint)
+        if not entry:
+            return True
+        calibrated_at = datetime.fromisoformat(entry["calibrated_at"])
+        return datetime.now(UTC) - calibrated_at > max_age
+
+    def set(self, endpoint: str, page_size: int, probes: list[ProbeResult]) -> None:
+        data = self._load()
+        data[endpoint] = {
+            "page_size": page_size,
+            "calibrated_at": datetime.now(UTC).isoformat(),
+            "probes": [asdict(probe) for probe in probes],
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+
+async def calibrate_page_size(
+    probe: Probe,
+    *,
+    candidates: tuple[int, ...] = DEFAULT_CANDIDATES,
+    repeats: int = 2,
+) -> tuple[int | None, list[ProbeResult]]:
+    """Probe increasing page sizes and pick the cheapest per record.
+
+    Sizes are tried in ascending order and probing stops at the first size
+    that errors (larger pages will not behave better) or that the server
+    caps (fewer records than requested while more exist).  A detected cap
+    becomes the upper bound for the choice.  Returns `(best, results)`;
+    `best` is None when no size succeeded.
+    """
+    results: list[ProbeResult] = []
+    cap: int | None = None
+    for size in sorted(candidates):
+        latencies: list[float] = []
+        returned: list[int] = []
+        total: int | None = None
+        errors = 0
+        for _ in range(repeats):
+            started = time.perf_counter()
+            try:
+                count, total = await probe(size)
+            except Exception as exc:
+                errors += 1
+                logger.warning("Page-size probe length=%d failed: %s", size, exc)
+                continue
+            latencies.append(time.perf_counter() - started)
+            returned.append(count)
+
+        result = ProbeResult(
+            size=size,
+            attempts=repeats,
+            errors=errors,
+            records=min(returned) if returned else None,
+            latency_seconds=statistics.median(latencies) if latencies else None,
+        )
+        results.append(result)
+        logger.info(
+            "Probe length=%d: records=%s latency=%s errors=%d",
+            size,
+            result.records,
+            f"{result.latency_seconds:.2f}s" if result.latency_seconds is not None else "-",
+            errors,
+        )
+
+        if errors:
+            break
+        if result.records is not None and result.records < size:
+            if total is not None and total > result.records:
+                cap = result.records
+                logger.info("Server caps page length at %d", cap)
+            break
+
+    usable = [
+        result
+        for result in results
+        if not result.errors and result.seconds_per_record is not None
+    ]
+    if not usable:
+        return None, results
+    best = min(usable, key=lambda result: result.seconds_per_record or 0.0).size
+    if cap is not None:
+        best = min(best, cap)
+    return best, results
@@ -1,18 +1,29 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+from concurrent.futures import Future
+from collections.abc import Callable, Iterable
+from contextlib import aclosing
+from dataclasses import asdict, fields
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
-from efda_scraper.client import PortalClient, load_catalog
+from efda_scraper.client import AsyncPortalClient, load_catalog
 from efda_scraper.config import Settings
+from efda_scraper.field_plan import FieldPlanner
+from efda_scraper.metrics import RunMetrics
 from efda_scraper.models import MedicineImportRecord, stable_record_id
-from efda_scraper.storage import SQLiteStore
+from efda_scraper.page_size import PageSizeStore, calibrate_page_size
+from efda_scraper.sqlite_writer import settled_results
+from efda_scraper.storage import SQLiteStore, write_records
 
 logger = logging.getLogger(__name__)
 
+_TOTAL_KEYS = ("recordsTotal", "totalCount", "total")
+
 
 def _safe_str(value: Any) -> str | None:
     if value is None:
@@ -44,27 +55,42 @@ def _safe_datetime(value: Any) -> datetime | None:
     return None
 
 
-def _pick(payload: dict[str, Any], keys: tuple[str, ...]) -> Any:
-    for key in keys:
-        if key in payload and payload[key] not in (None, ""):
-            return payload[key]
-    return None
+# Record schema: (field, payload keys in priority order, coercion), in the
+# field order of MedicineImportRecord after source_record_id and raw.
+_RECORD_FIELDS: tuple[tuple[str, tuple[str, ...], Callable[[Any], Any]], ...] = (
+    ("permit_number", ("permit_number", "permitNo", "permit", "license_no"), _safe_str),
+    ("importer_name", ("importer_name", "importerName", "company_name", "importer"), _safe_str),
+    ("product_name", ("product_name", "medicine_name", "item_name", "productName"), _safe_str),
+    ("quantity", ("quantity", "qty", "approved_quantity"), _safe_float),
+    ("quantity_unit", ("quantity_unit", "uom", "unit"), _safe_str),
+    ("origin_country", ("origin_country", "country", "country_of_origin"), _safe_str),
+    ("status", ("status", "state", "approval_status"), _safe_str),
+    ("imported_at", ("imported_at", "import_date", "date"), _safe_datetime),
+    ("updated_at", ("updated_at", "last_updated", "modified_at"), _safe_datetime),
+)
+# Checked once here, so normalize_many can build records positionally.
+if [name for name, _, _ in _RECORD_FIELDS] != [field.name for field in fields(MedicineImportRecord)][2:]:
+    raise RuntimeError("_RECORD_FIELDS is out of sync with MedicineImportRecord")
+_RECORD_PLANNER = FieldPlanner({name: keys for name, keys, _ in _RECORD_FIELDS})
+_RECORD_COERCIONS = tuple(coerce for _, _, coerce in _RECORD_FIELDS)
+
+
+def normalize_many(raws: Iterable[dict[str, Any]]) -> list[MedicineImportRecord]:
+    """Normalize a page of portal records in one pass."""
+    records: list[MedicineImportRecord] = []
+    append = records.append
+    values_for = _RECORD_PLANNER.values
+    for raw in raws:
+        values = [
+            None if value is None else coerce(value)
+            for value, coerce in zip(values_for(raw), _RECORD_COERCIONS)
+        ]
+        append(MedicineImportRecord(stable_record_id(raw), raw, *values))
+    return records
 
 
 def normalize_record(raw: dict[str, Any]) -> MedicineImportRecord:
-    return MedicineImportRecord(
-        source_record_id=stable_record_id(raw),
-        permit_number=_safe_str(_pick(raw, ("permit_number", "permitNo", "permit", "license_no"))),
-        importer_name=_safe_str(_pick(raw, ("importer_name", "importerName", "company_name", "importer"))),
-        product_name=_safe_str(_pick(raw, ("product_name", "medicine_name", "item_name", "productName"))),
-        quantity=_safe_float(_pick(raw, ("quantity", "qty", "approved_quantity"))),
-        quantity_unit=_safe_str(_pick(raw, ("quantity_unit", "uom", "unit"))),
-        origin_country=_safe_str(_pick(raw, ("origin_country", "country", "country_of_origin"))),
-        status=_safe_str(_pick(raw, ("status", "state", "approval_status"))),
-        imported_at=_safe_datetime(_pick(raw, ("imported_at", "import_date", "date"))),
-        updated_at=_safe_datetime(_pick(raw, ("updated_at", "last_updated", "modified_at"))),
-        raw=raw,
-    )
+    return normalize_many((raw,))[0]
 
 
 def _extract_list(payload: dict[str, Any] | list[Any]) -> list[dict[str, Any]]:
@@ -85,64 +111,163 @@ def _write_raw_page(raw_dir: Path, page_number: int, payload: dict[str, Any] | l
     return destination
 
 
-def run_imports_collection(settings: Settings, max_pages: int | None = None, page_size: int | None = None) -> dict[str, int]:
+def _page_size_store(settings: Settings) -> PageSizeStore:
+    return PageSizeStore(settings.storage_state_path.parent / "page_size.json")
+
+
+def _reported_total(payload: dict[str, Any] | list[Any]) -> int | None:
+    if isinstance(payload, dict):
+        for key in _TOTAL_KEYS:
+            value = payload.get(key)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+async def calibrate_imports_page_size_async(settings: Settings) -> dict[str, Any]:
+    catalog = load_catalog(settings.endpoint_catalog_path)
+    list_endpoint = catalog.get("imports_list")
+    if list_endpoint is None:
+        raise ValueError("endpoint catalog must define `imports_list`")
+
+    client = AsyncPortalClient(settings)
+
+    async def probe(size: int) -> tuple[int, int | None]:
+        payload = await client.request(list_endpoint, fields={"page": 1, "page_size": size})
+        return len(_extract_list(payload)), _reported_total(payload)
+
+    try:
+        best, probes = await calibrate_page_size(probe)
+    finally:
+        await client.aclose()
+
+    store = _page_size_store(settings)
+    if best is not None:
+        store.set("imports_list", best, probes)
+    return {
+        "page_size": best if best is not None else store.get("imports_list"),
+        "calibrated": best is not None,
+        "probes": [asdict(result) for result in probes],
+    }
+
+
+async def run_imports_collection_async(
+    settings: Settings,
+    max_pages: int | None = None,
+    page_size: int | None = None,
+) -> dict[str, Any]:
     catalog = load_catalog(settings.endpoint_catalog_path)
     list_endpoint = catalog.get("imports_list")
     if list_endpoint is None:
         raise ValueError("endpoint catalog must define `imports_list`")
 
     effective_max_pages = max_pages or settings.max_pages
-    effective_page_size = page_size or settings.page_size
+    effective_page_size = page_size or _page_size_store(settings).get("imports_list") or settings.page_size
+    prefetch = max(1, settings.prefetch_pages)
 
+    metrics = RunMetrics("imports")
     store = SQLiteStore(settings.sqlite_path)
-    store.init_schema()
+    with metrics.span("db_init"):
+        store.init_schema()
 
     run_id = store.start_run()
+    writer = store.open_writer(settings)
+    writes: list[Future[int]] = []
     records_seen = 0
     records_upserted = 0
+    pages_attempted = 0
+    plan_start = _RECORD_PLANNER.snapshot()
+    status = "error"
+    message: str | None = None
 
-    client = PortalClient(settings)
+    client = AsyncPortalClient(settings, concurrency=prefetch)
     try:
-        for page in range(1, effective_max_pages + 1):
-            payload = client.request(
-                list_endpoint,
-                fields={"page": page, "page_size": effective_page_size},
-            )
+        pages = client.iter_pages(
+            list_endpoint,
+            page_size=effective_page_size,
+            max_pages=effective_max_pages,
+            is_empty=lambda payload: not _extract_list(payload),
+            prefetch=prefetch,
+        )
+        async with aclosing(pages):
+            while True:
+                with metrics.span("fetch"):
+                    item = await anext(pages, None)
+                if item is None:
+                    break
+                page, payload = item
+                pages_attempted += 1
 
-            raw_path = _write_raw_page(settings.raw_output_dir, page, payload)
-            logger.info("Saved raw payload for page %s to %s", page, raw_path)
+                with metrics.span("raw_write"):
+                    raw_path = _write_raw_page(settings.raw_output_dir, page, payload)
+                logger.info("Saved raw payload for page %s to %s", page, raw_path)
 
-            records = _extract_list(payload)
-            if not records:
-                logger.info("No records found on page %s, stopping pagination", page)
-                break
+                records = _extract_list(payload)
+                if not records:
+                    logger.info("No records found on page %s, stopping pagination", page)
+                    break
 
-            for raw in records:
-                normalized = normalize_record(raw)
-                records_seen += 1
-                records_upserted += store.upsert_record(normalized)
+                with metrics.span("normalize"):
+                    normalized = normalize_many(records)
+                records_seen += len(normalized)
+                with metrics.span("db_write"):
+                    writes.append(await writer.asubmit(write_records, normalized))
 
-        store.finish_run(
-            run_id,
-            status="success",
-            records_seen=records_seen,
-            records_upserted=records_upserted,
-            message=None,
-        )
+        with metrics.span("db_write"):
+            await writer.aflush()
+        records_upserted = sum(future.result() for future in writes)
+        status = "success"
     except Exception as exc:
+        records_upserted = sum(settled_results(writes))
+        message = str(exc)
+        raise
+    finally:
+        writer.close()
+        await client.aclose()
+        metrics.add_bytes(client.bytes_received)
+        metrics.sections["http"] = client.telemetry.summary()
+        metrics.sections["singleflight"] = client.flights.summary()
+        metrics.sections["retries"] = client.retry_policy.summary()
+        metrics.sections["db_writer"] = writer.summary()
+        metrics.sections["field_plan"] = _RECORD_PLANNER.summary(plan_start)
         store.finish_run(
             run_id,
-            status="error",
+            status=status,
             records_seen=records_seen,
             records_upserted=records_upserted,
-            message=str(exc),
+            message=message,
+            metrics=metrics.finish(status),
         )
-        raise
-    finally:
-        client.close()
+        client.telemetry.log_summary()
+        try:
+            metrics.write_report(settings.sqlite_path.parent / "reports")
+        except OSError as exc:
+            # Never let a failed report replace the run's own exception.
+            logger.error("Could not write the run report: %s", exc)
+        metrics.log_summary()
 
     return {
         "records_seen": records_seen,
         "records_upserted": records_upserted,
-        "pages_attempted": effective_max_pages,
+        "pages_attempted": pages_attempted,
+        "pages_requested": client.pages_requested,
+        "metrics": metrics.report(),
     }
+
+
+def calibrate_imports_page_size(settings: Settings) -> dict[str, Any]:
+    return asyncio.run(calibrate_imports_page_size_async(settings))
+
+
+def run_imports_collection(
+    settings: Settings,
+    max_pages: int | None = None,
+    page_size: int | None = None,
+) -> dict[str, Any]:
+    return asyncio.run(
+        run_imports_collection_async(
+            settings,
+            max_pages=max_pages,
+            page_size=page_size,
+        )
+    )
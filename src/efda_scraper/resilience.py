@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+import httpx
+
+from efda_scraper.http_telemetry import HttpTelemetry, endpoint_key
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errors worth another attempt: the request may never have reached the
+# server, or the connection dropped mid-response.
+RETRYABLE_ERRORS: tuple[type[Exception], ...] = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.ReadTimeout,
+    httpx.WriteTimeout,
+    httpx.PoolTimeout,
+    httpx.RemoteProtocolError,
+    httpx.ReadError,
+)
+
+DEFAULT_RETRY_BUDGET_RATIO = 0.2
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """The endpoint stayed down through every probe; stop calling it."""
+
+
+def is_server_error(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+class RetryBudget:
+    """Caps retries at `minimum + ratio * requests` for the whole run.
+
+    During an outage every request fails, so per-request retry counts
+    multiply the load; a budget proportional to traffic keeps retries a
+    small share of it no matter how many workers are failing.
+    """
+
+    def __init__(self, ratio: float = DEFAULT_RETRY_BUDGET_RATIO, minimum: int = 10) -> None:
+        self.ratio = ratio
+        self.minimum = minimum
+        self.requests = 0
+        self.retries = 0
+        self.denied = 0
+
+    def record_request(self) -> None:
+        self.requests += 1
+
+    def try_spend(self) -> bool:
+        if self.retries >= self.minimum + self.ratio * self.requests:
+            self.denied += 1
+            return False
+        self.retries += 1
+        return True
+
+
+class CircuitBreaker:
+    """Per-endpoint breaker shared by every worker calling that endpoint.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    every caller waits in `before_call()` for the cooldown.  The first
+    caller after it is let through alone as a probe; success closes the
+    circuit and releases everyone, failure reopens it with a doubled
+    cooldown.  After `max_trips` failed reopenings in a row the breaker
+    gives up and raises `CircuitOpenError`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 5,
+        cooldown_seconds: float = 30.0,
+        max_cooldown_seconds: float = 300.0,
+        max_trips: int = 5,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self.max_trips = max_trips
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opens = 0
+        self.gave_up = False
+        self._opened_until = 0.0
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _wait(self, timeout: float | None) -> None:
+        event = self._changed
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except TimeoutError:
+            pass
+
+    async def before_call(self) -> None:
+        while True:
+            if self.gave_up:
+                raise CircuitOpenError(f"{self.name}: circuit open after {self.opens} trips")
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN:
+                remaining = self._opened_until - time.monotonic()
+                if remaining <= 0:
+                    self.state = HALF_OPEN
+                    logger.info("%s: probing after cooldown", self.name)
+                    return
+                await self._wait(remaining)
+            else:
+                await self._wait(None)
+
+    def record_success(self) -> None:
+        self.failures = 0
+        if self.state != CLOSED:
+            logger.info("%s: probe succeeded, resuming", self.name)
+            self.state = CLOSED
+            self.trips = 0
+            self._notify()
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            self._trip()
+
+    def release(self) -> None:
+        """A probe ended without a verdict (e.g. cancelled); let the next caller probe."""
+        if self.state == HALF_OPEN:
+            self.state = OPEN
+            self._opened_until = 0.0
+            self._notify()
+
+    def _trip(self) -> None:
+        self.trips += 1
+        self.opens += 1
+        if self.trips > self.max_trips:
+            self.gave_up = True
+            logger.error("%s: still failing after %d cooldowns, giving up", self.name, self.max_trips)
+        else:
+            cooldown = min(self.cooldown_seconds * 2 ** (self.trips - 1), self.max_cooldown_seconds)
+            self._opened_until = time.monotonic() + cooldown
+            logger.warning(
+                "%s: %d consecutive failures, pausing all workers for %.0fs",
+                self.name,
+                self.failures,
+                cooldown,
+            )
+        self.state = OPEN
+        self._notify()
+
+    def summary(self) -> dict[str, Any]:
+        return {"state": self.state, "opens": self.opens, "gave_up": self.gave_up}
+
+
+class RetryPolicy:
+    """One retry policy for a run: jittered backoff, a shared retry budget and
+    a circuit breaker per endpoint (`endpoint_key` of method and URL).
+
+    Use it as the only retry layer, i.e. with a client built with
+    `retries=0`, so attempts do not multiply across layers.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_attempts: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        budget: RetryBudget | None = None,
+        telemetry: HttpTelemetry | None = None,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self.telemetry = telemetry
+        self.breakers: dict[str, CircuitBreaker] = {}
+
+    def breaker(self, method: str, url: httpx.URL | str) -> CircuitBreaker:
+        key = endpoint_key(method, url)
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = CircuitBreaker(key)
+        return breaker
+
+    def backoff(self, attempt: int) -> float:
+        # "Full jitter": spreads retries from many workers over the window.
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(
+        self,
+        method: str,
+        url: httpx.URL | str,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        is_failure: Callable[[T], bool] | None = None,
+    ) -> T:
+        """Run `fn()` until it succeeds, attempts or budget run out, or the circuit gives up.
+
+        Retryable exceptions and results for which `is_failure(result)` is
+        true count against the endpoint's breaker and are retried; the last
+        exception is re-raised, or the last failing result returned.
+        Raises `CircuitOpenError` once the breaker has given up.
+        """
+        breaker = self.breaker(method, url)
+        attempt = 0
+        while True:
+            await breaker.before_call()
+            self.budget.record_request()
+            error: Exception | None = None
+            try:
+                result = await fn()
+            except RETRYABLE_ERRORS as exc:
+                error = exc
+                breaker.record_failure()
+                if self.telemetry is not None:
+                    self.telemetry.record_failure(method, url)
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                if is_failure is None or not is_failure(result):
+                    breaker.record_success()
+                    return result
+                breaker.record_failure()
+
+            attempt += 1
+            if attempt >= self.max_attempts or not self.budget.try_spend():
+                if error is not None:
+                    raise error
+                return result
+            delay = self.backoff(attempt)
+            logger.warning(
+                "%s %s failed (attempt %d/%d): %s. Retrying in %.1fs...",
+                method,
+                url,
+                attempt,
+                self.max_attempts,
+                error or "retryable response",
+                delay,
+            )
+            if self.telemetry is not None:
+                self.telemetry.record_retry(method, url)
+            await asyncio.sleep(delay)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "requests": self.budget.requests,
+            "retries": self.budget.retries,
+            "retries_denied_by_budget": self.budget.denied,
+            "breakers": {key: breaker.summary() for key, breaker in sorted(self.breakers.items())},
+        }
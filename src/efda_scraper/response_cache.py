@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from efda_scraper.jsonstream import loads
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 24 * 3600.0
+
+# Query/body fields that carry credentials; they never take part in a key.
+_AUTH_FIELDS = frozenset(
+    {"access_token", "token", "auth", "authorization", "api_key", "apikey", "signature", "sig"}
+)
+
+
+def cache_key(
+    method: str,
+    url: str,
+    *,
+    params: dict[str, Any] | None = None,
+    body: Any = None,
+) -> str:
+    """Stable key for a request: method, URL without fragment, sorted query and body.
+
+    Headers are not part of the key, so `Authorization`/`Cookie` values (and
+    tokens passed as query or body fields) never split or leak into entries.
+    """
+    parsed = httpx.URL(url)
+    query = [
+        (name, value)
+        for name, value in parsed.params.multi_items()
+        if name.lower() not in _AUTH_FIELDS
+    ]
+    for name, value in (params or {}).items():
+        if value is not None and str(name).lower() not in _AUTH_FIELDS:
+            query.append((str(name), str(value)))
+    query.sort()
+    if isinstance(body, dict):
+        body = {name: value for name, value in body.items() if str(name).lower() not in _AUTH_FIELDS}
+    base = str(parsed.copy_with(query=None, fragment=None))
+    canonical = json.dumps(
+        [method.upper(), base, query, body],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    key: str
+    url: str
+    body: bytes
+    content_hash: str
+    etag: str | None
+    last_modified: str | None
+    validated_at: float
+
+    @property
+    def has_validators(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def conditional_headers(self) -> dict[str, str]:
+        headers: dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def json(self) -> Any:
+        return loads(self.body)
+
+
+class ResponseCache:
+    """Persistent, size-bounded LRU cache of successful response bodies.
+
+    Entries the server tagged with `ETag`/`Last-Modified` are always
+    revalidated with a conditional request (a 304 is a cheap hit).  Entries
+    without validators are served straight from disk for `ttl_seconds`;
+    after that they are re-fetched and the content hash tells whether the
+    body actually changed.  Least recently used entries are evicted once the
+    stored bodies exceed `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0, "unchanged": 0, "evicted": 0}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS http_cache (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                validated_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_http_cache_accessed ON http_cache(accessed_at)")
+        self._conn.commit()
+        self._total_bytes = int(self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0])
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def get(self, key: str) -> CacheEntry | None:
+        row = self._conn.execute(
+            "SELECT url, body, content_hash, etag, last_modified, validated_at FROM http_cache WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self._conn.execute("UPDATE http_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        url, body, content_hash, etag, last_modified, validated_at = row
+        return CacheEntry(key, url, bytes(body), content_hash, etag, last_modified, validated_at)
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """True when `entry` may be used without asking the server (counted as a hit)."""
+        if entry.has_validators:
+            return False
+        fresh = time.time() - entry.validated_at < self.ttl_seconds
+        if fresh:
+            self.stats["hits"] += 1
+        return fresh
+
+    def revalidated(self, entry: CacheEntry) -> None:
+        """Record a 304 for `entry`; its body stays valid."""
+        now = time.time()
+        entry.validated_at = now
+        self._conn.execute(
+            "UPDATE http_cache SET validated_at = ?, accessed_at = ? WHERE key = ?",
+            (now, now, entry.key),
+        )
+        self._conn.commit()
+        self.stats["revalidated"] += 1
+
+    def put(
+        self,
+        key: str,
+        url: str,
+        body: bytes,
+        *,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> bool:
+        """Store a fresh 200 body. Returns False when it matches the cached content."""
+        content_hash = hashlib.sha256(body).hexdigest()
+        now = time.time()
+        previous = self._conn.execute(
+            "SELECT size, content_hash FROM http_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if previous is not None and previous[1] == content_hash:
+            self._conn.execute(
+                "UPDATE http_cache SET etag = ?, last_modified = ?, validated_at = ?, accessed_at = ? WHERE key = ?",
+                (etag, last_modified, now, now, key),
+            )
+            self._conn.commit()
+            self.stats["unchanged"] += 1
+            return False
+
+        self._conn.execute(
+            """
+            INSERT INTO http_cache (key, url, body, size, content_hash, etag, last_modified, validated_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                url = excluded.url,
+                body = excluded.body,
+                size = excluded.size,
+                content_hash = excluded.content_hash,
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                validated_at = excluded.validated_at,
+                accessed_at = excluded.accessed_at
+            """,
+            (key, url, body, len(body), content_hash, etag, last_modified, now, now),
+        )
+        self._total_bytes += len(body) - (previous[0] if previous is not None else 0)
+        self.stats["stored"] += 1
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+        self._conn.commit()
+        return True
+
+    def _evict(self) -> None:
+        # Trim to 90% of the bound so eviction does not run on every insert.
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM http_cache ORDER BY accessed_at").fetchall()
+        doomed: list[tuple[str]] = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM http_cache WHERE key = ?", doomed)
+        self.stats["evicted"] += len(doomed)
+
+    def summary(self) -> dict[str, Any]:
+        return {**self.stats, "total_bytes": self._total_bytes, "max_bytes": self.max_bytes}
+
+
+def open_response_cache(
+    path: Path,
+    *,
+    enabled: bool = True,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    ttl_seconds: float = DEFAULT_TTL_SECONDS,
+) -> ResponseCache | None:
+    """Open the cache at `path`, or return None when it is turned off.
+
+    Callers pass `Settings.http_cache_enabled`, `http_cache_max_bytes` and
+    `http_cache_ttl_seconds` (`EFDA_HTTP_CACHE*`).
+    """
+    if not enabled:
+        return None
+    return ResponseCache(path, max_bytes=max_bytes, ttl_seconds=ttl_seconds)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 64
+
+# A candidate is one selector tried in one frame, e.g.
+# ("button:has-text('Login')", "page").
+Candidate = tuple[str, str]
+
+
+def _entry_key(candidate: Candidate) -> str:
+    return f"{candidate[0]}\t{candidate[1]}"
+
+
+class SelectorCache:
+    """Learns which selector and frame resolves each selector list.
+
+    A group is one selector list from `Settings` (e.g. the submit
+    selectors).  For every group it keeps the last candidate that matched
+    and, per candidate, how often it was tried and matched.  `order()`
+    puts the last winner first and the rest by smoothed success rate,
+    keeping the configured order among equals, so a stable page resolves
+    in one probe instead of walking every selector in every frame.  State
+    is a small JSON file; `load()` and `save()` are no-ops without a
+    path.  Each group keeps its `max_entries` most successful candidates.
+    """
+
+    def __init__(self, path: Path | None = None, *, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self._groups: dict[str, dict[str, Any]] = {}
+        self._dirty = False
+        self.stats = {"lookups": 0, "first_try": 0, "misses": 0, "probes": 0}
+
+    @staticmethod
+    def group_key(selectors: Sequence[str]) -> str:
+        return "||".join(selectors)
+
+    def load(self, path: Path | None = None) -> None:
+        if path is not None:
+            self.path = path
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            self._groups = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable selector cache at %s", self.path)
+            self._groups = {}
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._groups, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def order(self, group: str, candidates: Sequence[Candidate]) -> list[int]:
+        """Indexes of `candidates` in the order they should be tried."""
+        entry = self._groups.get(group)
+        if not entry:
+            return list(range(len(candidates)))
+        winner = tuple(entry.get("winner") or ())
+        counts = entry.get("candidates", {})
+
+        def rank(index: int) -> tuple[int, float, int]:
+            candidate = candidates[index]
+            tries, hits = counts.get(_entry_key(candidate), (0, 0))
+            # Laplace smoothing: untried candidates rank at 0.5, above ones
+            # that keep failing and below ones that keep matching.
+            return (0 if candidate == winner else 1, -(hits + 1) / (tries + 2), index)
+
+        return sorted(range(len(candidates)), key=rank)
+
+    def record(self, group: str, attempted: Sequence[Candidate], winner: Candidate | None) -> None:
+        """Count one resolution: every attempted candidate was tried, `winner` (the last one) matched."""
+        self.stats["lookups"] += 1
+        self.stats["probes"] += len(attempted)
+        if winner is None:
+            self.stats["misses"] += 1
+        elif len(attempted) == 1:
+            self.stats["first_try"] += 1
+
+        entry = self._groups.setdefault(group, {"winner": None, "candidates": {}})
+        counts = entry["candidates"]
+        for candidate in attempted:
+            tries, hits = counts.get(_entry_key(candidate), (0, 0))
+            counts[_entry_key(candidate)] = [tries + 1, hits + int(candidate == winner)]
+        if winner is not None:
+            entry["winner"] = list(winner)
+        if len(counts) > self.max_entries:
+            kept = sorted(counts.items(), key=lambda item: (item[1][1], item[1][0]), reverse=True)
+            entry["candidates"] = dict(kept[: self.max_entries])
+        self._dirty = True
+
+    def summary(self) -> dict[str, Any]:
+        lookups = self.stats["lookups"]
+        return {
+            **self.stats,
+            "groups": len(self._groups),
+            "first_try_rate": round(self.stats["first_try"] / lookups, 3) if lookups else None,
+        }
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+def request_key(method: str, url: Any, body: Any = None) -> tuple[str, str, Any]:
+    """Coalescing key: identical method, URL and body mean the same request."""
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return method.upper(), str(url), body
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task[Any]) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one.
+
+    The first caller for a key starts `fn()`; callers arriving while it is
+    still running await the same result (or exception) instead of issuing
+    their own request.  Once it finishes the key is free again, so this
+    never serves stale data.  The call runs in its own task, so cancelling
+    one waiter does not cancel it for the others; cancelling the last
+    waiter cancels the call too, so abandoned requests do not outlive
+    their callers.  Waiters share the result object: treat it as read-only.
+    """
+
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            self.calls += 1
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._release(key, flight))
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                self.cancelled += 1
+                flight.task.cancel()
+                # Let the call unwind (e.g. close its connection) before
+                # the cancellation propagates.
+                await asyncio.gather(flight.task, return_exceptions=True)
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _release(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def summary(self) -> dict[str, int]:
+        return {"calls": self.calls, "coalesced": self.coalesced, "cancelled": self.cancelled}
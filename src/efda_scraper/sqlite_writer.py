@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_COMMIT_SECONDS = 1.0
+
+_STOP = object()
+
+
+class _Barrier:
+    __slots__ = ("done",)
+
+    def __init__(self) -> None:
+        self.done: Future[None] = Future()
+
+
+class WriteListener:
+    """In-memory state that mirrors rows written by `SQLiteWriter` jobs.
+
+    Caches of rows a job inserts (e.g. ids of new lookup rows) must not
+    outlive a rollback.  Registered with `SQLiteWriter.add_listener()`, a
+    listener is told on the writer thread when a job starts and finishes
+    and when its group commits or fails, so it can keep new entries staged
+    until they are durable.  The hooks are no-ops by default.
+    """
+
+    def job_started(self) -> None:
+        pass
+
+    def job_finished(self, ok: bool) -> None:
+        pass
+
+    def group_finished(self, ok: bool) -> None:
+        pass
+
+
+class SQLiteWriter:
+    """Owns one SQLite connection on a dedicated thread and applies write jobs in order.
+
+    A job is `fn(conn, *args)`; `submit()`/`asubmit()` queue it and return a
+    `concurrent.futures.Future` with its return value.  Jobs are applied in
+    submission order and committed in groups, once `batch_size` jobs are
+    pending or `commit_seconds` after the first of them, whichever comes
+    first.  A job's future resolves only after its group has committed.
+    Each job runs in its own savepoint, so a failing job is rolled back on
+    its own and the rest of the group still commits.  `add_listener()`
+    hooks in-memory caches into those rollbacks and commits.
+
+    The queue holds at most `max_queue` jobs; beyond that `submit()` blocks
+    and `asubmit()` waits without blocking the loop, so a slow disk slows the
+    producers down instead of growing memory.  `flush()` is a barrier: it
+    returns once everything submitted before it is committed, and re-raises
+    the first job error since the previous flush, so fire-and-forget writes
+    cannot fail silently.
+
+    The writer opens `db_path` itself, or adopts `conn` (opened with
+    `check_same_thread=False`); an adopted connection is left open by
+    `close()` and must not be used elsewhere until then.  Callers pass the
+    sizes from `Settings.db_queue_size`, `db_batch_size` and `db_commit_seconds`.
+    """
+
+    def __init__(
+        self,
+        db_path: Path | None = None,
+        *,
+        conn: sqlite3.Connection | None = None,
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        commit_seconds: float = DEFAULT_COMMIT_SECONDS,
+    ) -> None:
+        if (db_path is None) == (conn is None):
+            raise ValueError("pass exactly one of db_path or conn")
+        self.db_path = db_path
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.commit_seconds = commit_seconds
+        self._adopted = conn
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=self.max_queue)
+        self._error: BaseException | None = None
+        self._closed = False
+        self._listeners: list[WriteListener] = []
+        self.stats = {"jobs": 0, "errors": 0, "commits": 0, "largest_group": 0, "queue_full_waits": 0}
+        self.commit_seconds_total = 0.0
+        self._ready: Future[None] = Future()
+        self._thread = threading.Thread(target=self._run, name="efda-sqlite-writer", daemon=True)
+        self._thread.start()
+        self._ready.result()
+
+    # -- producer side ---------------------------------------------------
+
+    def _job(self, fn: Callable[..., Any], args: tuple[Any, ...]) -> tuple[Future[Any], Callable[..., Any], tuple]:
+        if self._closed:
+            raise RuntimeError("SQLiteWriter is closed")
+        return Future(), fn, args
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any) -> Future[Any]:
+        job = self._job(fn, args)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.stats["queue_full_waits"] += 1
+            self._queue.put(job)
+        return job[0]
+
+    async def asubmit(self, fn: Callable[..., Any], /, *args: Any) -> Future[Any]:
+        job = self._job(fn, args)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.stats["queue_full_waits"] += 1
+            await asyncio.to_thread(self._queue.put, job)
+        return job[0]
+
+    def add_listener(self, listener: WriteListener) -> None:
+        """Register `listener`; do it before submitting jobs that touch its state."""
+        self._listeners.append(listener)
+
+    def execute(self, sql: str, params: Iterable[Any] = ()) -> Future[Any]:
+        return self.submit(_execute, sql, tuple(params))
+
+    def flush(self) -> None:
+        barrier = _Barrier()
+        self._queue.put(barrier)
+        barrier.done.result()
+        self._raise_pending()
+
+    async def aflush(self) -> None:
+        barrier = _Barrier()
+        try:
+            self._queue.put_nowait(barrier)
+        except queue.Full:
+            await asyncio.to_thread(self._queue.put, barrier)
+        await asyncio.wrap_future(barrier.done)
+        self._raise_pending()
+
+    def _raise_pending(self) -> None:
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def close(self) -> None:
+        """Commit what is queued and stop the thread. Idempotent; logs instead of raising."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._error is not None:
+            logger.error("SQLite writer closed with an unreported write error: %s", self._error)
+            self._error = None
+
+    def __enter__(self) -> SQLiteWriter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            **self.stats,
+            "batch_size": self.batch_size,
+            "commit_seconds": round(self.commit_seconds_total, 3),
+        }
+
+    # -- writer thread ---------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._adopted is not None:
+            return self._adopted
+        conn = sqlite3.connect(str(self.db_path), timeout=30.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _run(self) -> None:
+        try:
+            conn = self._connect()
+        except BaseException as exc:
+            self._ready.set_exception(exc)
+            return
+        self._ready.set_result(None)
+
+        group: list[tuple[Future[Any], Any]] = []
+        deadline = 0.0
+        stopping = False
+        while not stopping:
+            timeout = max(deadline - time.monotonic(), 0.0) if group else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._commit(conn, group)
+                continue
+
+            if item is _STOP:
+                stopping = True
+            elif isinstance(item, _Barrier):
+                self._commit(conn, group)
+                item.done.set_result(None)
+            else:
+                future, fn, args = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if not group:
+                    deadline = time.monotonic() + self.commit_seconds
+                group.append((future, self._apply(conn, fn, args)))
+                if len(group) >= self.batch_size:
+                    self._commit(conn, group)
+
+        self._commit(conn, group)
+        if self._adopted is None:
+            conn.close()
+
+    def _apply(self, conn: sqlite3.Connection, fn: Callable[..., Any], args: tuple) -> Any:
+        self.stats["jobs"] += 1
+        # Open the group's transaction explicitly: a SAVEPOINT outside one
+        # starts its own, and releasing it would commit every job alone.
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        conn.execute("SAVEPOINT writer_job")
+        for listener in self._listeners:
+            listener.job_started()
+        try:
+            result = fn(conn, *args)
+        except Exception as exc:
+            self.stats["errors"] += 1
+            if conn.in_transaction:
+                conn.execute("ROLLBACK TO writer_job")
+                conn.execute("RELEASE writer_job")
+            for listener in self._listeners:
+                listener.job_finished(False)
+            logger.warning("SQLite write job %s failed: %s", getattr(fn, "__name__", fn), exc)
+            if self._error is None:
+                self._error = exc
+            return _Failed(exc)
+        if conn.in_transaction:
+            conn.execute("RELEASE writer_job")
+        for listener in self._listeners:
+            listener.job_finished(True)
+        return result
+
+    def _commit(self, conn: sqlite3.Connection, group: list[tuple[Future[Any], Any]]) -> None:
+        if not group:
+            return
+        started = time.perf_counter()
+        try:
+            conn.commit()
+        except sqlite3.Error as exc:
+            logger.error("SQLite group commit of %d jobs failed: %s", len(group), exc)
+            conn.rollback()
+            for listener in self._listeners:
+                listener.group_finished(False)
+            if self._error is None:
+                self._error = exc
+            for future, _ in group:
+                future.set_exception(exc)
+        else:
+            for listener in self._listeners:
+                listener.group_finished(True)
+            for future, result in group:
+                if isinstance(result, _Failed):
+                    future.set_exception(result.error)
+                else:
+                    future.set_result(result)
+        self.commit_seconds_total += time.perf_counter() - started
+        self.stats["commits"] += 1
+        self.stats["largest_group"] = max(self.stats["largest_group"], len(group))
+        group.clear()
+
+
+class _Failed:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+def _execute(conn: sqlite3.Connection, sql: str, params: tuple[Any, ...]) -> int:
+    return conn.execute(sql, params).rowcount
+
+
+def settled_results(futures: Iterable[Future[Any]]) -> list[Any]:
+    """Results of the futures that completed successfully so far (e.g. for error reports)."""
+    return [future.result() for future in futures if future.done() and future.exception() is None]
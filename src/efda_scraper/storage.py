@@ -1,12 +1,24 @@
 from __future__ import annotations
 
 import json
+import logging
 import sqlite3
+from collections.abc import Iterable
 from datetime import UTC, datetime
 from pathlib import Path
 from typing import Any
 
-from efda_scraper.models import MedicineImportRecord
+from efda_scraper.changelog import install_changelog
+from efda_scraper.config import Settings
+from efda_scraper.jsonstream import dumps
+from efda_scraper.metrics import ensure_metrics_column
+from efda_scraper.models import MedicineImportRecord, stable_record_id
+from efda_scraper.sqlite_writer import SQLiteWriter
+
+logger = logging.getLogger(__name__)
+
+# Bump when init_schema() gains a one-time migration.
+SCHEMA_VERSION = 1
 
 
 def _utc_now_iso() -> str:
@@ -45,7 +57,8 @@ class SQLiteStore:
                     records_seen INTEGER NOT NULL DEFAULT 0,
                     records_upserted INTEGER NOT NULL DEFAULT 0,
                     status TEXT NOT NULL,
-                    message TEXT
+                    message TEXT,
+                    metrics_json TEXT
                 );
 
                 CREATE TABLE IF NOT EXISTS imports_ui (
@@ -85,6 +98,13 @@ class SQLiteStore:
                 );
                 """
             )
+            ensure_metrics_column(conn, "scrape_runs")
+            install_changelog(conn)
+            # One-time migrations, recorded in the database's user_version
+            # so later runs skip their table scans.
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                migrate_record_ids(conn)
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
     def start_run(self) -> int:
         with sqlite3.connect(self.db_path) as conn:
@@ -102,67 +122,30 @@ class SQLiteStore:
         records_seen: int,
         records_upserted: int,
         message: str | None = None,
+        metrics: dict[str, Any] | None = None,
     ) -> None:
         with sqlite3.connect(self.db_path) as conn:
             conn.execute(
                 """
                 UPDATE scrape_runs
-                SET finished_at = ?, status = ?, records_seen = ?, records_upserted = ?, message = ?
+                SET finished_at = ?, status = ?, records_seen = ?, records_upserted = ?, message = ?,
+                    metrics_json = ?
                 WHERE run_id = ?
                 """,
-                (_utc_now_iso(), status, records_seen, records_upserted, message, run_id),
+                (
+                    _utc_now_iso(),
+                    status,
+                    records_seen,
+                    records_upserted,
+                    message,
+                    json.dumps(metrics, ensure_ascii=True) if metrics is not None else None,
+                    run_id,
+                ),
             )
 
     def upsert_record(self, record: MedicineImportRecord) -> int:
-        now = _utc_now_iso()
         with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(
-                """
-                INSERT INTO imports (
-                    source_record_id,
-                    permit_number,
-                    importer_name,
-                    product_name,
-                    quantity,
-                    quantity_unit,
-                    origin_country,
-                    status,
-                    imported_at,
-                    updated_at,
-                    raw_json,
-                    first_seen_at,
-                    last_seen_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(source_record_id) DO UPDATE SET
-                    permit_number = excluded.permit_number,
-                    importer_name = excluded.importer_name,
-                    product_name = excluded.product_name,
-                    quantity = excluded.quantity,
-                    quantity_unit = excluded.quantity_unit,
-                    origin_country = excluded.origin_country,
-                    status = excluded.status,
-                    imported_at = excluded.imported_at,
-                    updated_at = excluded.updated_at,
-                    raw_json = excluded.raw_json,
-                    last_seen_at = excluded.last_seen_at
-                """,
-                (
-                    record.source_record_id,
-                    record.permit_number,
-                    record.importer_name,
-                    record.product_name,
-                    record.quantity,
-                    record.quantity_unit,
-                    record.origin_country,
-                    record.status,
-                    record.imported_at.isoformat() if record.imported_at else None,
-                    record.updated_at.isoformat() if record.updated_at else None,
-                    json.dumps(record.raw, ensure_ascii=True),
-                    now,
-                    now,
-                ),
-            )
-            return cursor.rowcount
+            return write_record(conn, record)
 
     def upsert_browser_import(
         self,
@@ -171,30 +154,8 @@ class SQLiteStore:
         detail_url: str | None,
         payload: dict[str, Any],
     ) -> None:
-        now = _utc_now_iso()
         with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                """
-                INSERT INTO imports_ui (
-                    import_reference,
-                    detail_url,
-                    raw_json,
-                    first_seen_at,
-                    last_seen_at
-                ) VALUES (?, ?, ?, ?, ?)
-                ON CONFLICT(import_reference) DO UPDATE SET
-                    detail_url = excluded.detail_url,
-                    raw_json = excluded.raw_json,
-                    last_seen_at = excluded.last_seen_at
-                """,
-                (
-                    import_reference,
-                    detail_url,
-                    json.dumps(payload, ensure_ascii=True),
-                    now,
-                    now,
-                ),
-            )
+            write_browser_import(conn, import_reference, detail_url, payload)
 
     def replace_browser_detail(
         self,
@@ -204,70 +165,249 @@ class SQLiteStore:
         suppliers: list[dict[str, Any]],
         links: list[dict[str, Any]],
     ) -> None:
-        now = _utc_now_iso()
         with sqlite3.connect(self.db_path) as conn:
-            conn.execute("DELETE FROM import_products WHERE import_reference = ?", (import_reference,))
-            conn.execute("DELETE FROM import_suppliers WHERE import_reference = ?", (import_reference,))
-            conn.execute("DELETE FROM product_supplier_links WHERE import_reference = ?", (import_reference,))
+            write_browser_detail(conn, import_reference, products, suppliers, links)
+
+    def open_writer(self, settings: Settings) -> SQLiteWriter:
+        """Background writer for a run's bulk writes; submit the `write_*` functions to it."""
+        return SQLiteWriter(
+            self.db_path,
+            max_queue=settings.db_queue_size,
+            batch_size=settings.db_batch_size,
+            commit_seconds=settings.db_commit_seconds,
+        )
 
-            for row in products:
-                conn.execute(
-                    """
-                    INSERT INTO import_products (
-                        import_reference,
-                        product_name,
-                        supplier_name,
-                        raw_json,
-                        created_at
-                    ) VALUES (?, ?, ?, ?, ?)
-                    """,
-                    (
-                        import_reference,
-                        row.get("product_name"),
-                        row.get("supplier_name"),
-                        json.dumps(row, ensure_ascii=True),
-                        now,
-                    ),
-                )
 
-            for row in suppliers:
+_UPSERT_IMPORT_SQL = """
+    INSERT INTO imports (
+        source_record_id,
+        permit_number,
+        importer_name,
+        product_name,
+        quantity,
+        quantity_unit,
+        origin_country,
+        status,
+        imported_at,
+        updated_at,
+        raw_json,
+        first_seen_at,
+        last_seen_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(source_record_id) DO UPDATE SET
+        permit_number = excluded.permit_number,
+        importer_name = excluded.importer_name,
+        product_name = excluded.product_name,
+        quantity = excluded.quantity,
+        quantity_unit = excluded.quantity_unit,
+        origin_country = excluded.origin_country,
+        status = excluded.status,
+        imported_at = excluded.imported_at,
+        updated_at = excluded.updated_at,
+        raw_json = excluded.raw_json,
+        last_seen_at = excluded.last_seen_at
+"""
+
+
+_IMPORT_COLUMNS = (
+    "source_record_id",
+    "permit_number",
+    "importer_name",
+    "product_name",
+    "quantity",
+    "quantity_unit",
+    "origin_country",
+    "status",
+    "imported_at",
+    "updated_at",
+    "raw_json",
+    "first_seen_at",
+    "last_seen_at",
+)
+
+
+def migrate_record_ids(conn: sqlite3.Connection) -> int:
+    """Re-key `imports` rows hashed with the old fallback id (64-char sha256 of a repr).
+
+    Each row gets `stable_record_id` of its stored payload.  Rows that were
+    duplicates under the old order-sensitive hash collapse onto one id; the
+    most recently seen one's values win and the earliest first_seen_at is
+    kept.  Rows are moved by insert + delete so the changelog sees both.
+    Returns the number of rows re-keyed.
+    """
+    columns = ", ".join(_IMPORT_COLUMNS)
+    moved = 0
+    legacy = conn.execute(
+        f"SELECT {columns} FROM imports WHERE length(source_record_id) = 64"
+    ).fetchall()
+    for row in legacy:
+        old_id, raw_json = row[0], row[10]
+        try:
+            new_id = stable_record_id(json.loads(raw_json))
+        except (TypeError, ValueError):
+            continue
+        if new_id == old_id:
+            continue
+        existing = conn.execute(
+            "SELECT first_seen_at, last_seen_at FROM imports WHERE source_record_id = ?", (new_id,)
+        ).fetchone()
+        if existing is None:
+            conn.execute(
+                f"INSERT INTO imports ({columns}) VALUES ({', '.join('?' * len(_IMPORT_COLUMNS))})",
+                (new_id, *row[1:]),
+            )
+        else:
+            first_seen = min(existing[0], row[11])
+            if row[12] > existing[1]:
+                assignments = ", ".join(f"{name} = ?" for name in _IMPORT_COLUMNS[1:])
                 conn.execute(
-                    """
-                    INSERT INTO import_suppliers (
-                        import_reference,
-                        supplier_name,
-                        raw_json,
-                        created_at
-                    ) VALUES (?, ?, ?, ?)
-                    """,
-                    (
-                        import_reference,
-                        row.get("supplier_name"),
-                        json.dumps(row, ensure_ascii=True),
-                        now,
-                    ),
+                    f"UPDATE imports SET {assignments} WHERE source_record_id = ?",
+                    (*row[1:11], first_seen, row[12], new_id),
                 )
-
-            for row in links:
+            else:
                 conn.execute(
-                    """
-                    INSERT INTO product_supplier_links (
-                        import_reference,
-                        product_name,
-                        supplier_name,
-                        confidence,
-                        source,
-                        raw_json,
-                        created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        import_reference,
-                        row.get("product_name"),
-                        row.get("supplier_name"),
-                        row.get("confidence"),
-                        row.get("source"),
-                        json.dumps(row, ensure_ascii=True),
-                        now,
-                    ),
+                    "UPDATE imports SET first_seen_at = ? WHERE source_record_id = ?", (first_seen, new_id)
                 )
+        conn.execute("DELETE FROM imports WHERE source_record_id = ?", (old_id,))
+        moved += 1
+    conn.commit()
+    if moved:
+        logger.info("Re-keyed %d imports rows to canonical record ids", moved)
+    return moved
+
+
+def write_record(conn: sqlite3.Connection, record: MedicineImportRecord) -> int:
+    return write_records(conn, (record,))
+
+
+def write_records(conn: sqlite3.Connection, records: Iterable[MedicineImportRecord]) -> int:
+    """Upsert `records` with one prepared statement. Returns the number of rows written."""
+    now = _utc_now_iso()
+    cursor = conn.executemany(
+        _UPSERT_IMPORT_SQL,
+        (
+            (
+                record.source_record_id,
+                record.permit_number,
+                record.importer_name,
+                record.product_name,
+                record.quantity,
+                record.quantity_unit,
+                record.origin_country,
+                record.status,
+                record.imported_at.isoformat() if record.imported_at else None,
+                record.updated_at.isoformat() if record.updated_at else None,
+                dumps(record.raw),
+                now,
+                now,
+            )
+            for record in records
+        ),
+    )
+    return cursor.rowcount
+
+
+def write_browser_import(
+    conn: sqlite3.Connection,
+    import_reference: str,
+    detail_url: str | None,
+    payload: dict[str, Any],
+) -> None:
+    now = _utc_now_iso()
+    conn.execute(
+        """
+        INSERT INTO imports_ui (
+            import_reference,
+            detail_url,
+            raw_json,
+            first_seen_at,
+            last_seen_at
+        ) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(import_reference) DO UPDATE SET
+            detail_url = excluded.detail_url,
+            raw_json = excluded.raw_json,
+            last_seen_at = excluded.last_seen_at
+        """,
+        (
+            import_reference,
+            detail_url,
+            json.dumps(payload, ensure_ascii=True),
+            now,
+            now,
+        ),
+    )
+
+
+def write_browser_detail(
+    conn: sqlite3.Connection,
+    import_reference: str,
+    products: list[dict[str, Any]],
+    suppliers: list[dict[str, Any]],
+    links: list[dict[str, Any]],
+) -> None:
+    now = _utc_now_iso()
+    conn.execute("DELETE FROM import_products WHERE import_reference = ?", (import_reference,))
+    conn.execute("DELETE FROM import_suppliers WHERE import_reference = ?", (import_reference,))
+    conn.execute("DELETE FROM product_supplier_links WHERE import_reference = ?", (import_reference,))
+
+    for row in products:
+        conn.execute(
+            """
+            INSERT INTO import_products (
+                import_reference,
+                product_name,
+                supplier_name,
+                raw_json,
+                created_at
+            ) VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                import_reference,
+                row.get("product_name"),
+                row.get("supplier_name"),
+                json.dumps(row, ensure_ascii=True),
+                now,
+            ),
+        )
+
+    for row in suppliers:
+        conn.execute(
+            """
+            INSERT INTO import_suppliers (
+                import_reference,
+                supplier_name,
+                raw_json,
+                created_at
+            ) VALUES (?, ?, ?, ?)
+            """,
+            (
+                import_reference,
+                row.get("supplier_name"),
+                json.dumps(row, ensure_ascii=True),
+                now,
+            ),
+        )
+
+    for row in links:
+        conn.execute(
+            """
+            INSERT INTO product_supplier_links (
+                import_reference,
+                product_name,
+                supplier_name,
+                confidence,
+                source,
+                raw_json,
+                created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                import_reference,
+                row.get("product_name"),
+                row.get("supplier_name"),
+                row.get("confidence"),
+                row.get("source"),
+                json.dumps(row, ensure_ascii=True),
+                now,
+            ),
+        )